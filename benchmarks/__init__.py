@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de rendimiento de las consultas del tablero."""
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Mide las consultas del tablero sobre una contabilidad (real o sintética).
+
+Para cada consulta reporta percentiles de latencia, memoria pico de Python
+al traer el resultado y páginas de la base leídas en frío, y lo guarda en
+JSON para comparar versiones. Las vistas del tablero se miden además a
+través de qqa.datos.Datos (pool, caché vacía y paso a DataFrame), como las
+pide el tablero; si alguna falla, la corrida termina con error.
+
+Uso:
+    python -m benchmarks.bench_consultas --generar 1000000 --socios 10000 --salida base.json
+    python -m benchmarks.bench_consultas --db sintetica.db --comparar base.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from qqa import conexiones, consultas, cxc, ledger, sync
+
+from . import generar_ledger
+
+
+def _bytes_leidos():
+    """Bytes leídos por el proceso (Linux); None si no se puede medir."""
+    try:
+        with open("/proc/self/io") as archivo:
+            for linea in archivo:
+                if linea.startswith("rchar:"):
+                    return int(linea.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    bajo = int(k)
+    alto = min(bajo + 1, len(ordenados) - 1)
+    return ordenados[bajo] + (ordenados[alto] - ordenados[bajo]) * (k - bajo)
+
+
+def rangos(conn):
+    """Año, semestre e historia hasta la última fecha de la base, y el socio con más movimientos."""
+    ultima = conn.execute(f"SELECT MAX(fecha) FROM {ledger.TABLA_MOVIMIENTOS}").fetchone()[0]
+    fin = date.fromisoformat(ultima) if ultima else date.today()
+    anio = (fin - timedelta(days=365)).isoformat(), fin.isoformat()
+    semestre = (fin - timedelta(days=180)).isoformat(), fin.isoformat()
+    todo = "2000-01-01", fin.isoformat()
+    socio = conn.execute(f"""
+        SELECT codigo_socio FROM {cxc.TABLA_CXC}
+        WHERE codigo_socio IS NOT NULL
+        GROUP BY codigo_socio ORDER BY COUNT(*) DESC LIMIT 1
+    """).fetchone()
+    return anio, semestre, todo, socio[0] if socio else 0
+
+
+def casos(conn):
+    """Consultas a medir."""
+    anio, semestre, todo, socio = rangos(conn)
+    return {
+        "caja_mensual_anio": consultas.consulta_caja_mensual(*anio),
+        "caja_mensual_historia": consultas.consulta_caja_mensual(*todo),
+        "top_egresos_semestre": consultas.consulta_egresos_por_concepto(*semestre),
+        "top_egresos_historia": consultas.consulta_egresos_por_concepto(*todo),
+        "ingresos_todos_anio": consultas.consulta_ingresos_socio(*anio),
+        "resumen_socios_anio": consultas.consulta_resumen_socios(*anio),
+        "buscar_socios": consultas.consulta_buscar_socios("an"),
+        "ingresos_socio_historia": consultas.consulta_ingresos_socio(*todo, socio),
+        "socios": consultas.consulta_socios(),
+        "tablero_por_defecto": consultas.consulta_tablero(anio, semestre, anio + ("Todos",)),
+    }
+
+
+def casos_datos(conn):
+    """Vistas del tablero por Datos: {nombre: función que recibe un Datos}."""
+    anio, semestre, _, _ = rangos(conn)
+    return {
+        "datos_caja_mensual_anio": lambda d: d.caja_mensual(*anio),
+        "datos_top_egresos_semestre": lambda d: d.top_egresos(*semestre)[0],
+        "datos_pagina_socios_anio": lambda d: d.pagina_socios(*anio),
+        "datos_tablero_por_defecto": lambda d: d.tablero(anio, semestre, anio + ("Todos",)),
+    }
+
+
+def medir_datos(ruta, casos, repeticiones):
+    """
+    Latencias de cada caso por Datos, vaciando la caché antes de cada repetición.
+
+    Un caso que lanza una excepción queda con su "error" en lugar de las medidas.
+    """
+    from qqa import asociaciones, datos
+
+    asociacion = asociaciones.Asociacion("benchmark", ruta)
+    d = datos.Datos(asociacion, parquet=False)
+    resultados = {}
+    try:
+        for nombre, caso in casos.items():
+            tiempos = []
+            try:
+                for _ in range(repeticiones):
+                    asociacion.cache().invalidar()
+                    inicio = time.perf_counter()
+                    resultado = caso(d)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+            except Exception as e:
+                resultados[nombre] = {"error": f"{type(e).__name__}: {e}"}
+                continue
+            filas = (sum(len(v) for v in resultado.values()) if isinstance(resultado, dict)
+                     else len(resultado))
+            resultados[nombre] = {
+                "filas": filas,
+                "p50_ms": round(percentil(tiempos, 50), 3),
+                "p95_ms": round(percentil(tiempos, 95), 3),
+                "p99_ms": round(percentil(tiempos, 99), 3),
+                "max_ms": round(max(tiempos), 3),
+                "media_ms": round(statistics.mean(tiempos), 3),
+            }
+    finally:
+        asociacion.cerrar()
+    return resultados
+
+
+def fallidos(resultado):
+    """Nombres de los casos que terminaron con error."""
+    return [nombre for nombre, medida in resultado["resultados"].items() if "error" in medida]
+
+
+def comprobar_tablero(ruta, conn):
+    """
+    Verifica que Datos.tablero devuelve lo mismo que la consulta de cada vista.
+
+    Prueba las ventanas por defecto con "Todos" y con el socio de más
+    movimientos; lanza AssertionError con la vista que no coincide.
+    """
+    import pandas as pd
+
+    from qqa import asociaciones, datos
+
+    anio, semestre, _, socio = rangos(conn)
+    asociacion = asociaciones.Asociacion("benchmark", ruta)
+    d = datos.Datos(asociacion, parquet=False)
+    try:
+        for socios in (anio + ("Todos",), anio + (socio,)):
+            vistas = d.tablero(anio, semestre, socios)
+            esperadas = {
+                "caja": d.leer_sql(*consultas.consulta_caja_mensual(*anio)),
+                "egresos": d.leer_sql(*consultas.consulta_egresos_por_concepto(*semestre)),
+                consultas.vista_socios(socios[2]): d.leer_sql(*consultas.consulta_ingresos_socio(*socios)),
+            }
+            for vista, esperada in esperadas.items():
+                try:
+                    pd.testing.assert_frame_equal(vistas[vista], esperada)
+                except AssertionError as e:
+                    raise AssertionError(f"tablero: la vista {vista} de {socios} no coincide\n{e}") from None
+    finally:
+        asociacion.cerrar()
+
+
+def medir(ruta, query, params, repeticiones):
+    # Primera ejecución en frío, sin mmap y con caché mínima, para contar páginas
+    conn = conexiones.abrir_solo_lectura(ruta, mmap_mb=0, cache_mb=1)
+    tamano_pagina = conn.execute("PRAGMA page_size").fetchone()[0]
+    antes = _bytes_leidos()
+    tracemalloc.start()
+    filas = len(conn.execute(query, params).fetchall())
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    despues = _bytes_leidos()
+    conn.close()
+
+    # Latencias en caliente con la configuración normal del pool
+    conn = conexiones.abrir_solo_lectura(ruta)
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        conn.execute(query, params).fetchall()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    conn.close()
+
+    return {
+        "filas": filas,
+        "p50_ms": round(percentil(tiempos, 50), 3),
+        "p95_ms": round(percentil(tiempos, 95), 3),
+        "p99_ms": round(percentil(tiempos, 99), 3),
+        "max_ms": round(max(tiempos), 3),
+        "media_ms": round(statistics.mean(tiempos), 3),
+        "memoria_pico_kb": round(pico / 1024, 1),
+        "paginas_leidas": None if antes is None else (despues - antes) // tamano_pagina,
+    }
+
+
+def ejecutar(ruta, repeticiones=20):
+    with sqlite3.connect(ruta) as conn:
+        inicio = time.perf_counter()
+        sync.refrescar(conn)
+        construccion_ms = (time.perf_counter() - inicio) * 1000
+        inicio = time.perf_counter()
+        sync.refrescar(conn)
+        refresco_ms = (time.perf_counter() - inicio) * 1000
+        movimientos = conn.execute(f"SELECT COUNT(*) FROM {ledger.TABLA_MOVIMIENTOS}").fetchone()[0]
+        cuentas = conn.execute(f"SELECT COUNT(*) FROM {cxc.TABLA_CXC}").fetchone()[0]
+        socios = conn.execute(f"SELECT COUNT(*) FROM {cxc.TABLA_SOCIOS}").fetchone()[0]
+        a_medir = casos(conn)
+        a_medir_datos = casos_datos(conn)
+        comprobar_tablero(ruta, conn)
+
+    resultados = {
+        nombre: medir(ruta, query, params, repeticiones)
+        for nombre, (query, params) in a_medir.items()
+    }
+    resultados.update(medir_datos(ruta, a_medir_datos, repeticiones))
+    return {
+        "meta": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "base": os.path.basename(ruta),
+            "bytes_base": os.path.getsize(ruta),
+            "movimientos_caja": movimientos,
+            "movimientos_cxc": cuentas,
+            "socios": socios,
+            "repeticiones": repeticiones,
+            "sync_completo_ms": round(construccion_ms, 3),
+            "sync_sin_cambios_ms": round(refresco_ms, 3),
+        },
+        "resultados": resultados,
+    }
+
+
+def comparar(actual, base, tolerancia):
+    """Imprime la comparación con una corrida anterior; devuelve True si hay regresiones."""
+    regresion = False
+    print(f"{'consulta':28} {'base p50':>10} {'actual p50':>11} {'razón':>7}")
+    for nombre, medida in actual["resultados"].items():
+        anterior = base.get("resultados", {}).get(nombre)
+        if "error" in medida:
+            print(f"{nombre:28} {medida['error']}")
+            continue
+        if anterior is None or "error" in anterior:
+            print(f"{nombre:28} {'-':>10} {medida['p50_ms']:>11.3f} {'nueva':>7}")
+            continue
+        razon = medida["p50_ms"] / anterior["p50_ms"] if anterior["p50_ms"] else float("inf")
+        marca = ""
+        if razon > 1 + tolerancia:
+            regresion = True
+            marca = "  <- regresión"
+        print(f"{nombre:28} {anterior['p50_ms']:>10.3f} {medida['p50_ms']:>11.3f} {razon:>7.2f}{marca}")
+    return regresion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", help="base a medir (se le agregan las tablas derivadas)")
+    parser.add_argument("--generar", type=int, metavar="MOVIMIENTOS",
+                        help="genera una base sintética con este número de movimientos de caja")
+    parser.add_argument("--socios", type=int, default=100)
+    parser.add_argument("--semilla", type=int, default=2025)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--salida", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="aumento relativo de p50 que cuenta como regresión")
+    args = parser.parse_args()
+
+    if args.generar:
+        ruta = args.db or os.path.join(tempfile.mkdtemp(), "sintetica.db")
+        generar_ledger.generar(ruta, args.generar, args.socios, semilla=args.semilla)
+    elif args.db:
+        ruta = args.db
+    else:
+        parser.error("indique --db o --generar")
+
+    resultado = ejecutar(ruta, args.repeticiones)
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto)
+    else:
+        print(texto)
+
+    regresion = False
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            base = json.load(archivo)
+        regresion = comparar(resultado, base, args.tolerancia)
+    errores = fallidos(resultado)
+    for nombre in errores:
+        print(f"{nombre}: {resultado['resultados'][nombre]['error']}", file=sys.stderr)
+    if errores or regresion:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Generador de una contabilidad sintética con los mismos esquemas por año
+que contabilidad.db (caja20XX, cxc20XX, socios20XX), para medir las
+consultas a 10x-10.000x el volumen actual.
+
+Uso:
+    python -m benchmarks.generar_ledger sintetica.db --movimientos 1000000 --socios 10000
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+LOTE = 50_000
+
+# Esquemas reales de cada año; los años sin esquema propio usan el de 2025
+ESQUEMAS_CAJA = {
+    2020: ("fecha TEXT, detalle TEXT, entrada INTEGER, salida INTEGER, saldo INTEGER",
+           ["fecha", "detalle", "entrada", "salida", "saldo"]),
+    2022: ("fecha TIMESTAMP, detalle TEXT, entrada INTEGER, salida INTEGER, saldo INTEGER",
+           ["fecha", "detalle", "entrada", "salida", "saldo"]),
+    2023: ("fecha TIMESTAMP, codigo INTEGER, detalle TEXT, entrada INTEGER, salida INTEGER, saldo INTEGER",
+           ["fecha", "codigo", "detalle", "entrada", "salida", "saldo"]),
+    2024: ("socio INTEGER, fecha TIMESTAMP, detalle TEXT, entrada INTEGER, salida INTEGER, saldo INTEGER",
+           ["socio", "fecha", "detalle", "entrada", "salida", "saldo"]),
+    2025: ("codigo_cliente REAL, fecha TIMESTAMP, categoria TEXT, detalle TEXT, prestamo INTEGER, abono INTEGER, saldo INTEGER",
+           ["codigo_cliente", "fecha", "categoria", "detalle", "prestamo", "abono", "saldo"]),
+}
+ESQUEMAS_CXC = {
+    2024: ("socio INTEGER, fecha TIMESTAMP, detalle TEXT, entrada INTEGER, salida INTEGER, saldo INTEGER",
+           ["socio", "fecha", "detalle", "entrada", "salida", "saldo"]),
+    2025: ("codigo_cliente INTEGER, fecha TIMESTAMP, detalle TEXT, entrada INTEGER, salida INTEGER, saldo INTEGER",
+           ["codigo_cliente", "fecha", "detalle", "entrada", "salida", "saldo"]),
+}
+ESQUEMAS_SOCIOS = {
+    2022: ("codigo INTEGER, socio TEXT", ["codigo", "socio"]),
+    2023: ("codigo INTEGER, nombre TEXT", ["codigo", "nombre"]),
+    2024: ("codigo INTEGER, nombre TEXT", ["codigo", "nombre"]),
+}
+
+NOMBRES = ["amanda", "amparo", "maria", "luz mary", "yamile", "german", "omar",
+           "ruben", "paula", "santiago", "sergio", "luis", "gloria", "fernando",
+           "gabriel", "uriel", "nidia", "felipe", "julieth", "marcial"]
+APELLIDOS = ["murillas", "cano", "vera", "saenz", "lopez", "borja", "maldonado",
+             "madrid", "granada", "horta", "montoya", "estrada", "torres", "aya",
+             "arenas", "chivata", "panesso", "hernandez"]
+PROVEEDORES = ["el copion", "camara y comercio", "agroquimbaya sas", "super inter",
+               "sistecopias sas", "talsa sas", "autopistas del café",
+               "plasticos y agricolas del q", "secretaria de hacienda",
+               "trading de colombia sas", "el vaquero", "imvima"]
+CONCEPTOS_INGRESO = ["rbo de caja {n} {socio}", "recibo de caja {n} {socio}",
+                     "venta {k}k pescado {socio}", "aportes {socio}",
+                     "alquiler congelador {socio}"]
+CONCEPTOS_EGRESO = ["fra {ref} {prov}", "factura {ref} {prov}", "rbo {ref} {prov}",
+                    "compra alevinos", "concentrado", "transporte {ref} {prov}",
+                    "comprob egreso {n} {prov}", "intereses cxp {socio}"]
+
+
+def _nombre(rnd):
+    return f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}"
+
+
+def _elegir_socios(rnd, socios, k):
+    """Códigos 1..socios con distribución tipo Zipf: pocos socios muy activos."""
+    acumulado = list(itertools.accumulate(1.0 / (i + 1) for i in range(socios)))
+    return [c + 1 for c in rnd.choices(range(socios), cum_weights=acumulado, k=k)]
+
+
+def _fechas_del_anio(rnd, anio, n):
+    inicio = date(anio, 1, 1)
+    dias = (date(anio, 12, 31) - inicio).days
+    return sorted(inicio + timedelta(days=rnd.randint(0, dias)) for _ in range(n))
+
+
+def _formato_fecha(anio, dia):
+    if anio == 2020:
+        return dia.strftime("%d/%m/%Y")
+    return dia.strftime("%Y-%m-%d 00:00:00")
+
+
+def _detalle(rnd, es_ingreso, socio, n):
+    plantilla = rnd.choice(CONCEPTOS_INGRESO if es_ingreso else CONCEPTOS_EGRESO)
+    return plantilla.format(
+        n=n, socio=socio, prov=rnd.choice(PROVEEDORES),
+        ref=f"{rnd.choice('abcfip')}{rnd.randint(100, 99999)}", k=rnd.randint(1, 9),
+    )
+
+
+def _repartir(total, anios):
+    base, resto = divmod(total, len(anios))
+    return {anio: base + (1 if i < resto else 0) for i, anio in enumerate(anios)}
+
+
+def _insertar(conn, tabla, columnas, filas):
+    marcas = ", ".join("?" * len(columnas))
+    nombres = ", ".join(columnas)
+    conn.executemany(f'INSERT INTO "{tabla}" ({nombres}) VALUES ({marcas})', filas)
+
+
+def generar_socios(conn, rnd, socios):
+    nombres = [_nombre(rnd) for _ in range(socios)]
+    for anio, (esquema, columnas) in ESQUEMAS_SOCIOS.items():
+        conn.execute(f'CREATE TABLE "socios{anio}" ({esquema})')
+        # Cada año falta alguno; el roster crece con el tiempo
+        filas = [(codigo + 1, nombre) for codigo, nombre in enumerate(nombres)
+                 if rnd.random() < 0.7 + 0.1 * (anio - 2022)]
+        _insertar(conn, f"socios{anio}", columnas, filas)
+    return nombres
+
+
+def generar_caja(conn, rnd, anio, n, nombres):
+    esquema, columnas = ESQUEMAS_CAJA.get(anio, ESQUEMAS_CAJA[2025])
+    tabla = f"caja{anio}"
+    conn.execute(f'CREATE TABLE "{tabla}" ({esquema})')
+    codigos = _elegir_socios(rnd, len(nombres), n)
+    saldo, filas = 0, []
+    for i, (dia, codigo) in enumerate(zip(_fechas_del_anio(rnd, anio, n), codigos)):
+        es_ingreso = rnd.random() < 0.45
+        monto = int(rnd.lognormvariate(12, 1.2))
+        ingreso, egreso = (monto, 0) if es_ingreso else (0, monto)
+        saldo += ingreso - egreso
+        valores = {
+            "fecha": _formato_fecha(anio, dia),
+            "detalle": _detalle(rnd, es_ingreso, nombres[codigo - 1], i),
+            "entrada": ingreso, "salida": egreso,
+            "abono": ingreso, "prestamo": egreso,
+            "saldo": saldo,
+            "codigo": 0, "socio": codigo,
+            "codigo_cliente": float(codigo) if es_ingreso else None,
+            "categoria": "ingresos operacionales" if es_ingreso else "gastos operacionales",
+        }
+        filas.append(tuple(valores[c] for c in columnas))
+        if len(filas) >= LOTE:
+            _insertar(conn, tabla, columnas, filas)
+            filas = []
+    _insertar(conn, tabla, columnas, filas)
+
+
+def generar_cxc(conn, rnd, anio, n, nombres):
+    esquema, columnas = ESQUEMAS_CXC.get(anio, ESQUEMAS_CXC[2025])
+    tabla = f"cxc{anio}"
+    conn.execute(f'CREATE TABLE "{tabla}" ({esquema})')
+    codigos = _elegir_socios(rnd, len(nombres), n)
+    saldos, filas = {}, []
+    for i, (dia, codigo) in enumerate(zip(_fechas_del_anio(rnd, anio, n), codigos)):
+        cargo = rnd.random() < 0.3
+        monto = int(rnd.lognormvariate(12.5, 1))
+        entrada, salida = (monto, 0) if cargo else (0, monto)
+        saldos[codigo] = saldos.get(codigo, 0) + entrada - salida
+        valores = {
+            "fecha": dia.strftime("%Y-%m-%d 00:00:00"),
+            "detalle": f"rbo de caja {i} cuota" if not cargo else "venta",
+            "entrada": entrada, "salida": salida, "saldo": saldos[codigo],
+            "socio": codigo, "codigo_cliente": codigo,
+        }
+        filas.append(tuple(valores[c] for c in columnas))
+        if len(filas) >= LOTE:
+            _insertar(conn, tabla, columnas, filas)
+            filas = []
+    _insertar(conn, tabla, columnas, filas)
+
+
+def generar(ruta, movimientos=10_000, socios=100, anios_caja=(2020, 2022, 2023, 2024, 2025),
+            anios_cxc=(2024, 2025), proporcion_cxc=0.5, semilla=2025):
+    """Crea en `ruta` una contabilidad sintética reproducible (misma semilla, mismos datos)."""
+    if os.path.exists(ruta):
+        os.remove(ruta)
+    rnd = random.Random(semilla)
+    conn = sqlite3.connect(ruta)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    with conn:
+        nombres = generar_socios(conn, rnd, socios)
+        for anio, n in _repartir(movimientos, list(anios_caja)).items():
+            generar_caja(conn, rnd, anio, n, nombres)
+        for anio, n in _repartir(int(movimientos * proporcion_cxc), list(anios_cxc)).items():
+            generar_cxc(conn, rnd, anio, n, nombres)
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("ruta")
+    parser.add_argument("--movimientos", type=int, default=10_000)
+    parser.add_argument("--socios", type=int, default=100)
+    parser.add_argument("--proporcion-cxc", type=float, default=0.5)
+    parser.add_argument("--semilla", type=int, default=2025)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    generar(args.ruta, args.movimientos, args.socios,
+            proporcion_cxc=args.proporcion_cxc, semilla=args.semilla)
+    print(f"{args.ruta}: {args.movimientos} movimientos, {args.socios} socios "
+          f"en {time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,13 +7,22 @@ author:
     satehortuh@eafit.edu.co
 """
 
-# Importamos las liberías necesarias:
+# Importamos las liberías necesarias (el reporte de arranque va primero para
+# medir también las importaciones; Plotly se importa al dibujar, ver graficos()):
+from qqa import arranque
+import logging
+import os
 import streamlit as st
-import sqlite3
 import pandas as pd
-import plotly.express as px
 from datetime import datetime, timedelta
 
+from qqa import asociaciones, cache, consultas, datos, egresos, formato, instrumentacion, series, socios_mensual
+from qqa.instrumentacion import INSTRUMENTACION, etapa
+
+arranque.REPORTE.marcar("importar módulos")
+
+logger = logging.getLogger("qqa.tablero")
+
 
 # Configuramos la página principal
 st.set_page_config(
@@ -23,261 +32,206 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Título principal logo incrustado en Imgur:
+# Logo: el archivo local de assets/ si existe, así el tablero no depende de la
+# red; si no, la copia en Imgur (salvo con QQA_SIN_RED=1, donde no hay a quién pedirla)
+RUTA_LOGO = os.environ.get("QQA_LOGO", os.path.join("assets", "logo.png"))
+URL_LOGO = "https://i.imgur.com/0ltt70t.png"
+
+# Título principal con el logo:
 col_logo, col_title = st.columns([1, 4])
 with col_logo:
-        st.image("https://i.imgur.com/0ltt70t.png",
-                 width=175)
+    if os.path.exists(RUTA_LOGO):
+        st.image(RUTA_LOGO, width=175)
+    elif os.environ.get("QQA_SIN_RED") != "1":
+        st.image(URL_LOGO, width=175)
+    else:
+        st.markdown("# 🐟")
+
+# Plotly tarda en importarse: se carga al dibujar el primer gráfico y el hilo
+# de calentamiento lo adelanta al arrancar el servidor
+def graficos():
+    return arranque.importar("plotly.express")
+
+# Registro de asociaciones (asociaciones.json): un solo proceso atiende varias
+# contabilidades, cada una con su pool de conexiones y su caché con cuota propia
+@st.cache_resource
+def get_registro():
+    presupuesto_mb = int(os.environ.get("QQA_CACHE_MB", cache.PRESUPUESTO_MB))
+    return asociaciones.Registro.cargar(cache_mb=presupuesto_mb)
+
+# Calentamiento al arrancar el servidor (una vez por proceso, en otros hilos):
+# importa Plotly y deja corriendo el calentador, que cada vez que cambia la
+# base o la fecha sincroniza las derivadas de cada asociación y precalcula
+# las ventanas por defecto y de calendario. Se desactiva con QQA_CALENTAR=0
+@st.cache_resource
+def iniciar_calentamiento():
+    if os.environ.get("QQA_CALENTAR", "1") != "0":
+        return arranque.iniciar_calentamiento(get_registro())
+
+iniciar_calentamiento()
+
+# La asociación se elige con ?asociacion=<id> en la URL o en la barra lateral
+def elegir_asociacion():
+    registro = get_registro()
+    pedida = st.query_params.get("asociacion")
+    if pedida is not None:
+        if pedida not in registro:
+            st.error(f"No existe la asociación '{pedida}'")
+            st.stop()
+        elegida = pedida
+    elif len(registro) > 1:
+        elegida = st.sidebar.selectbox("Asociación", registro.ids(),
+                                       format_func=lambda id: registro[id].nombre,
+                                       key="asociacion")
+    else:
+        elegida = registro.ids()[0]
+    # Al cambiar de asociación se olvidan el socio elegido y las páginas vistas
+    if st.session_state.get("asociacion_activa") != elegida:
+        for clave in ("socio_seleccionado", "socio_busqueda", "socios_padron", "socios_ranking"):
+            st.session_state.pop(clave, None)
+        st.session_state["asociacion_activa"] = elegida
+    return registro[elegida]
+
+ASOCIACION = elegir_asociacion()
+
 with col_title:
-    st.title("📊 Dashboard Financiero - Asociación QuimQuinAgro")
+    st.title(f"📊 Dashboard Financiero - Asociación {ASOCIACION.nombre}")
 
 st.markdown("---")
 
-# Declaramos la función para ejecutar las consultas
-@st.cache_data
-def run_query(query, params=()):
+# Ponemos al día las tablas derivadas cada vez que cambia el archivo de la base;
+# aquí solo se miran las tablas con filas nuevas o borradas (las ediciones las
+# detecta el calentador) y se recalculan los meses que cambiaron
+arranque.REPORTE.marcar("encabezado y registro")
+ASOCIACION.preparar()
+arranque.REPORTE.marcar(f"{ASOCIACION.id}: sincronizar derivadas")
+
+# Diagnóstico opcional (QQA_DIAGNOSTICO=1): tiempos por etapa y planes de consulta
+if instrumentacion.ACTIVO:
+    INSTRUMENTACION.iniciar_ejecucion()
+
+# Consultas de la asociación (qqa.datos): pool, caché, backend e instrumentación
+# viven fuera del script y las comparte la API HTTP (python -m qqa.api)
+DATOS = datos.Datos(ASOCIACION)
+
+# Caché de resultados de la asociación; se invalida sola cuando cambia su base
+def get_cache():
+    return ASOCIACION.cache()
+
+# Ejecuta una consulta de DATOS; si falla muestra el error y devuelve `vacio`
+def con_aviso(consulta, *args, vacio=None):
     try:
-        with sqlite3.connect('contabilidad.db') as conn:  # abre y cierra automáticamente
-            df = pd.read_sql_query(query, conn, params=params)
-        return df
+        return consulta(*args)
     except Exception as e:
         st.error(f"Error en la consulta: {e}")
-        return pd.DataFrame()
+        return pd.DataFrame() if vacio is None else vacio
 
 
-# Consulta 1: Caja mensual
+# Consulta 1: Caja mensual (meses completos desde el cubo caja_mensual)
 def query_caja_mensual(fecha_inicio, fecha_fin):
-    query = """
-    WITH caja_unificada AS (
-        -- caja2020
-        SELECT 
-            date(substr(fecha, 7, 4) || '-' || substr(fecha, 4, 2) || '-' || substr(fecha, 1, 2)) as fecha,
-            entrada as ingreso,
-            salida as egreso,
-            detalle
-        FROM caja2020
-        WHERE fecha IS NOT NULL
-        
-        UNION ALL
-        
-        -- caja2022
-        SELECT 
-            date(fecha) as fecha,
-            entrada as ingreso,
-            salida as egreso,
-            detalle
-        FROM caja2022
-        WHERE fecha IS NOT NULL
-        
-        UNION ALL
-        
-        -- caja2023
-        SELECT 
-            date(fecha) as fecha,
-            entrada as ingreso,
-            salida as egreso,
-            detalle
-        FROM caja2023
-        WHERE fecha IS NOT NULL
-        
-        UNION ALL
-        
-        -- caja2024
-        SELECT 
-            date(fecha) as fecha,
-            entrada as ingreso,
-            salida as egreso,
-            detalle
-        FROM caja2024
-        WHERE fecha IS NOT NULL
-        
-        UNION ALL
-        
-        -- caja2025
-        SELECT 
-            date(fecha) as fecha,
-            abono as ingreso,
-            prestamo as egreso,
-            detalle
-        FROM caja2025
-        WHERE fecha IS NOT NULL
-    )
-    
-    SELECT 
-        strftime('%Y-%m', fecha) as mes,
-        SUM(COALESCE(ingreso, 0)) as total_ingresos,
-        SUM(COALESCE(egreso, 0)) as total_egresos,
-        SUM(COALESCE(ingreso, 0) - COALESCE(egreso, 0)) as neto
-    FROM caja_unificada
-    WHERE fecha BETWEEN ? AND ?
-    GROUP BY mes
-    ORDER BY mes
-    """
-    
-    return run_query(query, (fecha_inicio, fecha_fin))
+    return con_aviso(DATOS.caja_mensual, fecha_inicio, fecha_fin)
 
-# Consulta 2: Top 10 egresos
+# Consulta 2: Top 10 egresos. La consulta (desde el cubo egresos_mensuales) trae
+# solo los 10 conceptos con más egreso y una fila con lo que suman los demás.
+# Devuelve (DataFrame del top, total de "Otros").
 def query_top_egresos(fecha_inicio, fecha_fin):
-    query = """
-    WITH caja_unificada AS (
-        -- caja2020
-        SELECT 
-            date(substr(fecha, 7, 4) || '-' || substr(fecha, 4, 2) || '-' || substr(fecha, 1, 2)) as fecha,
-            entrada as ingreso,
-            salida as egreso,
-            detalle
-        FROM caja2020
-        WHERE fecha IS NOT NULL
-        
-        UNION ALL
-        
-        -- caja2022
-        SELECT 
-            date(fecha) as fecha,
-            entrada as ingreso,
-            salida as egreso,
-            detalle
-        FROM caja2022
-        WHERE fecha IS NOT NULL
-        
-        UNION ALL
-        
-        -- caja2023
-        SELECT 
-            date(fecha) as fecha,
-            entrada as ingreso,
-            salida as egreso,
-            detalle
-        FROM caja2023
-        WHERE fecha IS NOT NULL
-        
-        UNION ALL
-        
-        -- caja2024
-        SELECT 
-            date(fecha) as fecha,
-            entrada as ingreso,
-            salida as egreso,
-            detalle
-        FROM caja2024
-        WHERE fecha IS NOT NULL
-        
-        UNION ALL
-        
-        -- caja2025
-        SELECT 
-            date(fecha) as fecha,
-            abono as ingreso,
-            prestamo as egreso,
-            detalle
-        FROM caja2025
-        WHERE fecha IS NOT NULL
-    )
-    
-    SELECT 
-        detalle,
-        SUM(COALESCE(egreso, 0)) as total_egreso
-    FROM caja_unificada
-    WHERE fecha BETWEEN ? AND ?
-        AND egreso > 0
-    GROUP BY detalle
-    ORDER BY total_egreso DESC
-    LIMIT 10
-    """
-    
-    return run_query(query, (fecha_inicio, fecha_fin))
+    return con_aviso(DATOS.top_egresos, fecha_inicio, fecha_fin, vacio=(pd.DataFrame(), 0))
 
 # Consulta 3: Ingresos por socio
 def query_ingresos_socio(fecha_inicio, fecha_fin, socio_codigo=None):
-    if socio_codigo == "Todos" or socio_codigo is None:
-        query = """
-        WITH ingresos_socios AS (
-            -- cxc2024
-            SELECT 
-                c.socio as codigo_socio,
-                s.nombre,
-                SUM(c.entrada) as total_ingresos
-            FROM cxc2024 c
-            LEFT JOIN socios2024 s ON c.socio = s.codigo
-            WHERE c.fecha BETWEEN ? AND ?
-                AND c.entrada > 0
-            GROUP BY c.socio, s.nombre
-            
-            UNION ALL
-            
-            -- cxc2025
-            SELECT 
-                c.codigo_cliente as codigo_socio,
-                s.nombre,
-                SUM(c.entrada) as total_ingresos
-            FROM cxc2025 c
-            LEFT JOIN socios2024 s ON c.codigo_cliente = s.codigo
-            WHERE c.fecha BETWEEN ? AND ?
-                AND c.entrada > 0
-            GROUP BY c.codigo_cliente, s.nombre
-        )
-        
-        SELECT 
-            COALESCE(nombre, 'Socio ' || codigo_socio) as socio,
-            SUM(total_ingresos) as total_ingresos
-        FROM ingresos_socios
-        GROUP BY codigo_socio, socio
-        ORDER BY total_ingresos DESC
-        """
-        return run_query(query, (fecha_inicio, fecha_fin, fecha_inicio, fecha_fin))
-    else:
-        query = """
-        WITH ingresos_temporales AS (
-            -- cxc2024
-            SELECT 
-                date(c.fecha) as fecha,
-                c.entrada as ingreso
-            FROM cxc2024 c
-            WHERE c.socio = ? 
-                AND c.fecha BETWEEN ? AND ?
-                AND c.entrada > 0
-            
-            UNION ALL
-            
-            -- cxc2025
-            SELECT 
-                date(c.fecha) as fecha,
-                c.entrada as ingreso
-            FROM cxc2025 c
-            WHERE c.codigo_cliente = ? 
-                AND c.fecha BETWEEN ? AND ?
-                AND c.entrada > 0
-        )
-        
-        SELECT 
-            strftime('%Y-%m-%d', fecha) as fecha,
-            SUM(ingreso) as total_ingreso
-        FROM ingresos_temporales
-        GROUP BY fecha
-        ORDER BY fecha
-        """
-        return run_query(query, (socio_codigo, fecha_inicio, fecha_fin, socio_codigo, fecha_inicio, fecha_fin))
-
-# Obtener lista de socios
-@st.cache_data
-def get_socios():
-    query = """
-    SELECT codigo, nombre 
-    FROM socios2024 
-    WHERE nombre IS NOT NULL 
-    ORDER BY nombre
-    """
-    return run_query(query)
+    return con_aviso(DATOS.ingresos_socio, fecha_inicio, fecha_fin, socio_codigo)
+
+# Ranking de socios por páginas (keyset) y sus totales calculados en SQL
+def query_pagina_socios(fecha_inicio, fecha_fin, despues=None):
+    return con_aviso(DATOS.pagina_socios, fecha_inicio, fecha_fin, despues)
+
+def query_resumen_socios(fecha_inicio, fecha_fin):
+    return con_aviso(DATOS.resumen_socios, fecha_inicio, fecha_fin)
+
+# Momentos de los ingresos diarios de un socio (tabla socios_mensual)
+def query_estadisticas_socio(fecha_inicio, fecha_fin, socio_codigo):
+    return con_aviso(DATOS.estadisticas_socio, fecha_inicio, fecha_fin, socio_codigo)
+
+# Saldo de caja al inicio y al final del rango (cortes mensuales de qqa.conciliacion)
+def query_saldos_caja(fecha_inicio, fecha_fin):
+    return con_aviso(DATOS.saldos, "caja", fecha_inicio, fecha_fin)
+
+# Buscar socios en el padrón, una página a la vez
+def buscar_socios(texto="", despues=None):
+    return con_aviso(DATOS.buscar_socios, texto, despues)
+
+# Consulta 4: movimientos de todas las tablas por su detalle (índice FTS5)
+def query_buscar_movimientos(texto, fecha_inicio=None, fecha_fin=None, socio_codigo=None, despues=None):
+    return con_aviso(DATOS.buscar_movimientos, texto, fecha_inicio, fecha_fin, socio_codigo, despues)
+
+# Paginación por keyset: en la sesión se guarda el cursor con que empieza cada
+# página visitada; "Anterior" vuelve al cursor previo y "Siguiente" parte de la
+# última fila mostrada. Si cambia el contexto (fechas, búsqueda) se vuelve a la 1.
+def cursores_pagina(clave, contexto):
+    estado = st.session_state.setdefault(clave, {"contexto": None, "cursores": [None]})
+    if estado["contexto"] != contexto:
+        estado["contexto"] = contexto
+        estado["cursores"] = [None]
+    return estado["cursores"]
+
+def controles_pagina(clave, cursores, hay_mas, siguiente):
+    col_ant, col_pag, col_sig = st.columns([1, 1, 1])
+    with col_ant:
+        st.button("◀ Anterior", key=f"{clave}_anterior", disabled=len(cursores) == 1,
+                  on_click=cursores.pop)
+    with col_pag:
+        st.caption(f"Página {len(cursores)}")
+    with col_sig:
+        st.button("Siguiente ▶", key=f"{clave}_siguiente", disabled=not hay_mas,
+                  on_click=cursores.append, args=(siguiente,))
+
+def codigo_socio(seleccion):
+    if seleccion == "Todos":
+        return "Todos"
+    return int(seleccion.split(" - ")[0])
+
+# En una recarga completa calculamos juntas las vistas que aún no están en caché,
+# con los parámetros que cada pestaña tiene en pantalla; las pestañas las
+# encuentran luego en la caché. Al mover un filtro solo se recarga su pestaña.
+def precargar_tablero():
+    hoy = datetime.now().date()
+    estado = st.session_state
+    defecto = arranque.rangos_por_defecto(hoy)
+    caja = (estado.get("caja_start", defecto['caja'][0]), estado.get("caja_end", hoy))
+    egresos = (estado.get("egresos_start", defecto['egresos'][0]), estado.get("egresos_end", hoy))
+    socios = (estado.get("socios_start", defecto['socios'][0]), estado.get("socios_end", hoy))
+    socio = codigo_socio(estado.get("socio_seleccionado", "Todos"))
+
+    pedidos = {}
+    if caja[0] <= caja[1]:
+        pedidos['caja'] = tuple(f.strftime('%Y-%m-%d') for f in caja)
+    if egresos[0] <= egresos[1]:
+        pedidos['egresos'] = tuple(f.strftime('%Y-%m-%d') for f in egresos)
+    if socios[0] <= socios[1]:
+        pedidos['socios'] = tuple(f.strftime('%Y-%m-%d') for f in socios) + (socio,)
+    try:
+        DATOS.precargar(pedidos)
+    except Exception:
+        # Cada pestaña consultará por su cuenta y mostrará el error
+        logger.exception("No se pudieron precargar las vistas del tablero")
+
+precargar_tablero()
+arranque.REPORTE.marcar("precarga de vistas")
 
 # Creamos las pestañas del tablero interactivo
-tab1, tab2, tab3 = st.tabs([
+tab1, tab2, tab3, tab4 = st.tabs([
     "Caja mensual", 
     "Top de 10 egresos", 
-    "Ingresos por asociado (CxC)"
+    "Ingresos por asociado (CxC)",
+    "Búsqueda de movimientos"
 ])
 
+# Cada pestaña es un fragmento: al cambiar sus filtros solo se vuelve a
+# ejecutar esa pestaña y no las demás.
+
 # Pestaña 1: Caja Mensual
-with tab1:
+@st.fragment
+def pestana_caja():
     st.header("Análisis de Caja Mensual")
     
     col1, col2 = st.columns([1, 3])
@@ -289,14 +243,16 @@ with tab1:
         # Selector de rango de fechas
         fecha_inicio = st.date_input(
             "Fecha de inicio",
-            value=fecha_actual - timedelta(days=365),
-            max_value=fecha_actual
+            value=fecha_actual - timedelta(days=arranque.DIAS_POR_DEFECTO['caja']),
+            max_value=fecha_actual,
+            key="caja_start"
         )
         
         fecha_fin = st.date_input(
             "Fecha de fin",
             value=fecha_actual,
-            max_value=fecha_actual
+            max_value=fecha_actual,
+            key="caja_end"
         )
         
         # Validar fechas
@@ -308,7 +264,8 @@ with tab1:
     with col2:
         if fecha_inicio <= fecha_fin:
             # Ejecutar consulta
-            df_caja = query_caja_mensual(fecha_inicio.strftime('%Y-%m-%d'), fecha_fin.strftime('%Y-%m-%d'))
+            with etapa("caja.consulta"):
+                df_caja = query_caja_mensual(fecha_inicio.strftime('%Y-%m-%d'), fecha_fin.strftime('%Y-%m-%d'))
             
             if not df_caja.empty:
                 # Mostrar métricas principales
@@ -326,6 +283,17 @@ with tab1:
                     st.metric("Neto", f"${neto_total:,.0f}", 
                              delta=f"{((neto_total/total_ingresos)*100 if total_ingresos > 0 else 0):.1f}%")
                 
+                # Saldo de la caja calculado desde los movimientos, no desde la columna saldo
+                with etapa("caja.saldos"):
+                    saldos = query_saldos_caja(fecha_inicio.strftime('%Y-%m-%d'), fecha_fin.strftime('%Y-%m-%d'))
+                if not saldos.empty:
+                    col_sal1, col_sal2 = st.columns(2)
+                    with col_sal1:
+                        st.metric("Saldo Inicial", f"${saldos['apertura'].iloc[0]:,.0f}")
+                    with col_sal2:
+                        st.metric("Saldo Final", f"${saldos['cierre'].iloc[0]:,.0f}",
+                                  delta=f"${saldos['cierre'].iloc[0] - saldos['apertura'].iloc[0]:,.0f}")
+                
                 # Gráfico de barras agrupadas
                 st.subheader("Flujo de Caja Mensual")
                 
@@ -340,26 +308,24 @@ with tab1:
                     'total_egresos': 'Egresos'
                 })
                 
-                fig = px.bar(df_melted, 
-                            x='mes', 
-                            y='monto', 
-                            color='tipo',
-                            barmode='group',
-                            title='Ingresos vs Egresos por Mes',
-                            labels={'mes': 'Mes', 'monto': 'Monto ($)', 'tipo': 'Tipo'},
-                            color_discrete_map={'Ingresos': '#2E8B57', 'Egresos': '#DC143C'})
+                with etapa("caja.grafico"):
+                    fig = graficos().bar(df_melted, 
+                                x='mes', 
+                                y='monto', 
+                                color='tipo',
+                                barmode='group',
+                                title='Ingresos vs Egresos por Mes',
+                                labels={'mes': 'Mes', 'monto': 'Monto ($)', 'tipo': 'Tipo'},
+                                color_discrete_map={'Ingresos': '#2E8B57', 'Egresos': '#DC143C'})
                 
-                fig.update_layout(xaxis_tickangle=-45)
-                st.plotly_chart(fig, use_container_width=True)
+                    fig.update_layout(xaxis_tickangle=-45)
+                with etapa("caja.envio_grafico"):
+                    st.plotly_chart(fig, use_container_width=True)
                 
                 # Tabla de datos
                 st.subheader("Detalle por Mes")
-                df_display = df_caja.copy()
-                df_display['total_ingresos'] = df_display['total_ingresos'].apply(lambda x: f"${x:,.0f}")
-                df_display['total_egresos'] = df_display['total_egresos'].apply(lambda x: f"${x:,.0f}")
-                df_display['neto'] = df_display['neto'].apply(lambda x: f"${x:,.0f}")
-                
-                st.dataframe(df_display, use_container_width=True)
+                with etapa("caja.tabla"):
+                    formato.mostrar_tabla(df_caja, moneda=['total_ingresos', 'total_egresos', 'neto'])
                 
                 # Conclusiones
                 st.subheader("📈 Conclusiones")
@@ -375,8 +341,12 @@ with tab1:
             else:
                 st.warning("No se encontraron datos para el período seleccionado")
 
+with tab1:
+    pestana_caja()
+
 # Pestaña 2: Top 10 Egresos
-with tab2:
+@st.fragment
+def pestana_egresos():
     st.header("Top 10 Conceptos de Egresos")
     
     col1, col2 = st.columns([1, 3])
@@ -387,7 +357,7 @@ with tab2:
         
         fecha_inicio = st.date_input(
             "Fecha de inicio",
-            value=fecha_actual - timedelta(days=180),
+            value=fecha_actual - timedelta(days=arranque.DIAS_POR_DEFECTO['egresos']),
             max_value=fecha_actual,
             key="egresos_start"
         )
@@ -401,18 +371,22 @@ with tab2:
     
     with col2:
         if fecha_inicio <= fecha_fin:
-            df_egresos = query_top_egresos(fecha_inicio.strftime('%Y-%m-%d'), fecha_fin.strftime('%Y-%m-%d'))
+            with etapa("egresos.consulta"):
+                df_egresos, otros_egresos = query_top_egresos(fecha_inicio.strftime('%Y-%m-%d'),
+                                                              fecha_fin.strftime('%Y-%m-%d'))
             
             if not df_egresos.empty:
-                # Métricas
+                # Métricas (los porcentajes son sobre el total de egresos, con "Otros")
                 st.subheader("Resumen de Egresos")
-                total_egresos = df_egresos['total_egreso'].sum()
+                total_top = df_egresos['total_egreso'].sum()
+                total_egresos = total_top + otros_egresos
                 egreso_promedio = df_egresos['total_egreso'].mean()
                 max_egreso = df_egresos['total_egreso'].max()
                 
                 col_met1, col_met2, col_met3 = st.columns(3)
                 with col_met1:
-                    st.metric("Total Egresos Top 10", f"${total_egresos:,.0f}")
+                    st.metric("Total Egresos", f"${total_egresos:,.0f}",
+                              f"Top 10: {total_top / total_egresos * 100:.1f}%", delta_color="off")
                 with col_met2:
                     st.metric("Egreso Promedio", f"${egreso_promedio:,.0f}")
                 with col_met3:
@@ -421,25 +395,30 @@ with tab2:
                 # Gráfico de barras horizontales
                 st.subheader("Distribución de Egresos")
                 
-                fig = px.bar(df_egresos,
-                            x='total_egreso',
-                            y='detalle',
-                            orientation='h',
-                            title='Top 10 Conceptos con Mayor Egreso',
-                            labels={'total_egreso': 'Monto ($)', 'detalle': 'Concepto'},
-                            color='total_egreso',
-                            color_continuous_scale='Reds')
+                with etapa("egresos.grafico"):
+                    fig = graficos().bar(df_egresos,
+                                x='total_egreso',
+                                y='detalle',
+                                orientation='h',
+                                title='Top 10 Conceptos con Mayor Egreso',
+                                labels={'total_egreso': 'Monto ($)', 'detalle': 'Concepto'},
+                                color='total_egreso',
+                                color_continuous_scale='Reds')
                 
-                fig.update_layout(yaxis={'categoryorder':'total ascending'})
-                st.plotly_chart(fig, use_container_width=True)
+                    fig.update_layout(yaxis={'categoryorder':'total ascending'})
+                with etapa("egresos.envio_grafico"):
+                    st.plotly_chart(fig, use_container_width=True)
                 
                 # Tabla de datos
                 st.subheader("Detalle de Egresos")
-                df_display = df_egresos.copy()
-                df_display['total_egreso'] = df_display['total_egreso'].apply(lambda x: f"${x:,.0f}")
-                df_display['porcentaje'] = (df_egresos['total_egreso'] / total_egresos * 100).apply(lambda x: f"{x:.1f}%")
-                
-                st.dataframe(df_display, use_container_width=True)
+                with etapa("egresos.tabla"):
+                    tabla_egresos = df_egresos
+                    if otros_egresos:
+                        tabla_egresos = pd.concat([df_egresos, pd.DataFrame(
+                            [{'detalle': egresos.ETIQUETA_OTROS, 'total_egreso': otros_egresos}]
+                        )], ignore_index=True)
+                    formato.mostrar_tabla(formato.con_porcentaje(tabla_egresos, 'total_egreso'),
+                                          moneda=['total_egreso'], porcentaje=['porcentaje'])
                 
                 # Análisis de concentración
                 st.subheader("📊 Análisis de Concentración")
@@ -454,8 +433,12 @@ with tab2:
             else:
                 st.warning("No se encontraron egresos para el período seleccionado")
 
+with tab2:
+    pestana_egresos()
+
 # Pestaña 3: Ingresos por Socio
-with tab3:
+@st.fragment
+def pestana_socios():
     st.header("Análisis de Ingresos por Socio")
     
     col1, col2 = st.columns([1, 3])
@@ -466,7 +449,7 @@ with tab3:
         
         fecha_inicio = st.date_input(
             "Fecha de inicio",
-            value=fecha_actual - timedelta(days=365),
+            value=fecha_actual - timedelta(days=arranque.DIAS_POR_DEFECTO['socios']),
             max_value=fecha_actual,
             key="socios_start"
         )
@@ -478,52 +461,80 @@ with tab3:
             key="socios_end"
         )
         
-        # Selector de socio
-        socios_df = get_socios()
-        opciones_socios = ["Todos"] + [f"{row['codigo']} - {row['nombre']}" for _, row in socios_df.iterrows()]
+        # Selector de socio: se busca por nombre o código y se recorre el padrón
+        # por páginas, sin cargarlo entero
+        busqueda = st.text_input("Buscar socio", key="socio_busqueda",
+                                 placeholder="Nombre o código")
+        cursores_socios = cursores_pagina("socios_padron", busqueda)
+        socios_df = buscar_socios(busqueda, cursores_socios[-1])
+        opciones_socios = ["Todos"] + [f"{codigo} - {nombre}"
+                                       for codigo, nombre in zip(socios_df['codigo'], socios_df['nombre'])]
+        # La selección actual se conserva aunque no esté en la página visible
+        actual = st.session_state.get("socio_seleccionado", "Todos")
+        if actual not in opciones_socios:
+            opciones_socios.insert(1, actual)
         
         socio_seleccionado = st.selectbox(
             "Seleccionar Socio",
             options=opciones_socios,
-            index=0
+            index=0,
+            key="socio_seleccionado"
         )
         
-        if socio_seleccionado != "Todos":
-            socio_codigo = int(socio_seleccionado.split(" - ")[0])
-        else:
-            socio_codigo = "Todos"
+        socio_codigo = codigo_socio(socio_seleccionado)
+        
+        if not socios_df.empty:
+            controles_pagina("socios_padron", cursores_socios,
+                             len(socios_df) == consultas.TAMANO_PAGINA,
+                             (socios_df['nombre'].iloc[-1], int(socios_df['codigo'].iloc[-1])))
     
     with col2:
         if fecha_inicio <= fecha_fin:
-            df_ingresos_socio = query_ingresos_socio(
-                fecha_inicio.strftime('%Y-%m-%d'), 
-                fecha_fin.strftime('%Y-%m-%d'),
-                socio_codigo
-            )
+            with etapa("socios.consulta"):
+                df_ingresos_socio = query_ingresos_socio(
+                    fecha_inicio.strftime('%Y-%m-%d'), 
+                    fecha_fin.strftime('%Y-%m-%d'),
+                    socio_codigo
+                )
             
             if not df_ingresos_socio.empty:
                 if socio_codigo == "Todos":
-                    # Gráfico de barras para todos los socios
-                    st.subheader("Distribución de Ingresos por Socio")
+                    # df_ingresos_socio es la primera página del ranking; los
+                    # totales del ranking completo salen de SQL
+                    rango_socios = (fecha_inicio.strftime('%Y-%m-%d'), fecha_fin.strftime('%Y-%m-%d'))
+                    resumen = query_resumen_socios(*rango_socios)
+                    if resumen.empty:
+                        # La consulta falló (con_aviso ya mostró el error): los
+                        # totales quedan sobre la primera página del ranking
+                        resumen = pd.DataFrame([{
+                            'total_ingresos': df_ingresos_socio['total_ingresos'].sum(),
+                            'socios_activos': len(df_ingresos_socio),
+                            'total_top': df_ingresos_socio['total_ingresos'].head(3).sum(),
+                        }])
+                    total_ingresos = resumen['total_ingresos'].iloc[0]
+                    socios_activos = int(resumen['socios_activos'].iloc[0])
                     
-                    total_ingresos = df_ingresos_socio['total_ingresos'].sum()
+                    # Gráfico de barras para los socios principales
+                    st.subheader("Distribución de Ingresos por Socio")
                     
-                    fig = px.bar(df_ingresos_socio,
-                                x='total_ingresos',
-                                y='socio',
-                                orientation='h',
-                                title='Ingresos por Socio (Todos)',
-                                labels={'total_ingresos': 'Ingresos ($)', 'socio': 'Socio'},
-                                color='total_ingresos',
-                                color_continuous_scale='Greens')
+                    with etapa("socios.grafico"):
+                        fig = graficos().bar(df_ingresos_socio,
+                                    x='total_ingresos',
+                                    y='socio',
+                                    orientation='h',
+                                    title=f'Ingresos por Socio (Top {len(df_ingresos_socio)} de {socios_activos})',
+                                    labels={'total_ingresos': 'Ingresos ($)', 'socio': 'Socio'},
+                                    color='total_ingresos',
+                                    color_continuous_scale='Greens')
                     
-                    fig.update_layout(yaxis={'categoryorder':'total ascending'})
-                    st.plotly_chart(fig, use_container_width=True)
+                        fig.update_layout(yaxis={'categoryorder':'total ascending'})
+                    with etapa("socios.envio_grafico"):
+                        st.plotly_chart(fig, use_container_width=True)
                     
                     # Métricas
                     st.subheader("Métricas de Concentración")
                     top_socio = df_ingresos_socio.iloc[0]
-                    top3_ingresos = df_ingresos_socio.head(3)['total_ingresos'].sum()
+                    top3_ingresos = resumen['total_top'].iloc[0]
                     porcentaje_top3 = (top3_ingresos / total_ingresos) * 100
                     
                     col_met1, col_met2, col_met3 = st.columns(3)
@@ -534,30 +545,45 @@ with tab3:
                     with col_met3:
                         st.metric("Concentración Top 3", f"{porcentaje_top3:.1f}%")
                     
-                    # Tabla de datos
+                    # Tabla de datos, por páginas
                     st.subheader("Detalle por Socio")
-                    df_display = df_ingresos_socio.copy()
-                    df_display['total_ingresos'] = df_display['total_ingresos'].apply(lambda x: f"${x:,.0f}")
-                    df_display['porcentaje'] = (df_ingresos_socio['total_ingresos'] / total_ingresos * 100).apply(lambda x: f"{x:.1f}%")
-                    
-                    st.dataframe(df_display, use_container_width=True)
+                    cursores_ranking = cursores_pagina("socios_ranking", rango_socios)
+                    if cursores_ranking[-1] is None:
+                        pagina = df_ingresos_socio
+                    else:
+                        pagina = query_pagina_socios(*rango_socios, cursores_ranking[-1])
+                    with etapa("socios.tabla"):
+                        formato.mostrar_tabla(
+                            formato.con_porcentaje(pagina, 'total_ingresos', total=total_ingresos)
+                                .drop(columns='codigo'),
+                            moneda=['total_ingresos'], porcentaje=['porcentaje'])
+                    if not pagina.empty:
+                        controles_pagina("socios_ranking", cursores_ranking,
+                                         len(pagina) == consultas.TAMANO_PAGINA,
+                                         tuple(pagina[['total_ingresos', 'codigo']].iloc[-1].tolist()))
                     
                     # Conclusiones
                     st.subheader("👥 Conclusiones - Todos los Socios")
                     st.write(f"""
                     - **Socio líder**: {top_socio['socio']} con {(top_socio['total_ingresos']/total_ingresos*100):.1f}% del total
                     - **Distribución**: {'Concentrada' if porcentaje_top3 > 60 else 'Balanceada' if porcentaje_top3 > 40 else 'Diversificada'}
-                    - **Número de socios activos**: {len(df_ingresos_socio)} socios generaron ingresos
-                    - **Ingreso promedio por socio**: ${(total_ingresos/len(df_ingresos_socio)):,.0f}
+                    - **Número de socios activos**: {socios_activos} socios generaron ingresos
+                    - **Ingreso promedio por socio**: ${(total_ingresos/socios_activos):,.0f}
                     """)
                     
                 else:
                     # Gráfico de línea para un socio específico
                     st.subheader(f"Evolución Temporal de Ingresos - {socio_seleccionado}")
                     
+                    # La consulta ya viene agrupada por día, semana o mes según el rango
+                    resolucion = series.elegir_resolucion(fecha_inicio, fecha_fin)
+                    etiqueta = series.ETIQUETAS[resolucion]
+                    
                     # Convertir fecha a datetime para ordenamiento
-                    df_ingresos_socio['fecha'] = pd.to_datetime(df_ingresos_socio['fecha'])
-                    df_ingresos_socio = df_ingresos_socio.sort_values('fecha')
+                    # (assign crea una copia: el resultado en caché no se modifica)
+                    df_ingresos_socio = df_ingresos_socio.assign(
+                        fecha=pd.to_datetime(df_ingresos_socio['fecha'])
+                    ).sort_values('fecha')
                     
                     total_ingresos = df_ingresos_socio['total_ingreso'].sum()
                     ingreso_promedio = df_ingresos_socio['total_ingreso'].mean()
@@ -567,46 +593,144 @@ with tab3:
                     with col_met1:
                         st.metric("Total Período", f"${total_ingresos:,.0f}")
                     with col_met2:
-                        st.metric("Promedio Diario", f"${ingreso_promedio:,.0f}")
+                        st.metric(f"Promedio {etiqueta}", f"${ingreso_promedio:,.0f}")
                     with col_met3:
-                        st.metric("Máximo Diario", f"${max_ingreso:,.0f}")
+                        st.metric(f"Máximo {etiqueta}", f"${max_ingreso:,.0f}")
                     
-                    # Gráfico de línea
-                    fig = px.line(df_ingresos_socio,
-                                x='fecha',
-                                y='total_ingreso',
-                                title=f'Ingresos Diarios - {socio_seleccionado}',
-                                labels={'fecha': 'Fecha', 'total_ingreso': 'Ingreso ($)'},
-                                markers=True)
+                    # Gráfico de línea (LTTB si hay más puntos de los que caben)
+                    with etapa("socio.grafico"):
+                        fig = graficos().line(series.reducir(df_ingresos_socio, 'fecha', 'total_ingreso'),
+                                    x='fecha',
+                                    y='total_ingreso',
+                                    title=f'Ingresos por {series.PERIODOS[resolucion].lower()} - {socio_seleccionado}',
+                                    labels={'fecha': 'Fecha', 'total_ingreso': 'Ingreso ($)'},
+                                    markers=True)
                     
-                    fig.update_traces(line=dict(color='#2E8B57', width=3),
-                                    marker=dict(size=6, color='#228B22'))
+                        fig.update_traces(line=dict(color='#2E8B57', width=3),
+                                        marker=dict(size=6, color='#228B22'))
                     
-                    st.plotly_chart(fig, use_container_width=True)
+                    with etapa("socio.envio_grafico"):
+                        st.plotly_chart(fig, use_container_width=True)
                     
                     # Tabla de datos
-                    st.subheader("Detalle por Fecha")
-                    df_display = df_ingresos_socio.copy()
-                    df_display['total_ingreso'] = df_display['total_ingreso'].apply(lambda x: f"${x:,.0f}")
-                    df_display['fecha'] = df_display['fecha'].dt.strftime('%Y-%m-%d')
-                    
-                    st.dataframe(df_display, use_container_width=True)
+                    st.subheader(f"Detalle por {series.PERIODOS[resolucion]}")
+                    with etapa("socio.tabla"):
+                        formato.mostrar_tabla(df_ingresos_socio, moneda=['total_ingreso'], fecha=['fecha'])
                     
-                    # Análisis de tendencia
+                    # Análisis de tendencia: sale de los momentos diarios que guarda
+                    # socios_mensual, sin traer los movimientos del socio
                     st.subheader("📈 Análisis de Tendencia")
-                    if len(df_ingresos_socio) > 1:
-                        crecimiento = ((df_ingresos_socio['total_ingreso'].iloc[-1] - df_ingresos_socio['total_ingreso'].iloc[0]) / 
-                                     df_ingresos_socio['total_ingreso'].iloc[0] * 100)
+                    estadisticas = query_estadisticas_socio(fecha_inicio.strftime('%Y-%m-%d'),
+                                                            fecha_fin.strftime('%Y-%m-%d'), socio_codigo)
+                    if not estadisticas.empty and estadisticas['dias'].iloc[0] > 1:
+                        est = estadisticas.iloc[0]
+                        promedio_dia, desviacion_dia = socios_mensual.media_y_desviacion(
+                            est['dias'], est['total'], est['suma_cuadrados'])
+                        crecimiento = (est['ultimo_ingreso'] - est['primer_ingreso']) / est['primer_ingreso'] * 100
+                        dias_periodo = (fecha_fin - fecha_inicio).days + 1
                         
                         st.write(f"""
-                        - **Tendencia**: {'Positiva' if crecimiento > 0 else 'Negativa'} ({crecimiento:.1f}%)
-                        - **Consistencia**: {'Alta' if df_ingresos_socio['total_ingreso'].std() < ingreso_promedio else 'Media'}
-                        - **Frecuencia**: {len(df_ingresos_socio)} días con ingresos en el período
-                        - **Perfil**: {'Frecuente' if len(df_ingresos_socio) > (len(pd.date_range(fecha_inicio, fecha_fin)) * 0.3) else 'Esporádico'}
+                        - **Tendencia**: {'Positiva' if crecimiento > 0 else 'Negativa'} ({crecimiento:.1f}%) entre el {est['primera_fecha']} y el {est['ultima_fecha']}
+                        - **Consistencia**: {'Alta' if desviacion_dia < promedio_dia else 'Media'}
+                        - **Frecuencia**: {int(est['dias'])} días con ingresos en el período
+                        - **Perfil**: {'Frecuente' if est['dias'] > dias_periodo * 0.3 else 'Esporádico'}
                         """)
             else:
                 st.warning("No se encontraron ingresos para los parámetros seleccionados")
 
+with tab3:
+    pestana_socios()
+
+# Pestaña 4: Búsqueda de movimientos por detalle
+@st.fragment
+def pestana_busqueda():
+    st.header("Búsqueda de Movimientos")
+    
+    col1, col2 = st.columns([1, 3])
+    
+    with col1:
+        st.subheader("Parámetros de Consulta")
+        texto = st.text_input("Buscar en el detalle", key="busqueda_texto",
+                              placeholder="Ej.: recibo de caja cuota")
+        st.caption("Sin importar tildes ni mayúsculas; cada palabra puede ir incompleta")
+        
+        # Sin filtro de fechas se busca en todos los años cargados
+        rango = None
+        if st.checkbox("Filtrar por fechas", key="busqueda_filtrar_fechas"):
+            fecha_actual = datetime.now()
+            fecha_inicio = st.date_input(
+                "Fecha de inicio",
+                value=fecha_actual - timedelta(days=arranque.DIAS_POR_DEFECTO['caja']),
+                max_value=fecha_actual,
+                key="busqueda_start"
+            )
+            fecha_fin = st.date_input(
+                "Fecha de fin",
+                value=fecha_actual,
+                max_value=fecha_actual,
+                key="busqueda_end"
+            )
+            if fecha_inicio > fecha_fin:
+                st.error("La fecha de inicio debe ser anterior a la fecha de fin")
+            rango = (fecha_inicio.strftime('%Y-%m-%d'), fecha_fin.strftime('%Y-%m-%d'))
+        
+        socio_texto = st.text_input("Código de socio (opcional)", key="busqueda_socio")
+        socio_codigo = int(socio_texto) if socio_texto.strip().isdigit() else None
+        if socio_texto.strip() and socio_codigo is None:
+            st.error("El código de socio debe ser un número")
+    
+    with col2:
+        if not any(c.isalnum() for c in texto):
+            st.info("Escriba una o más palabras para buscar en los movimientos de caja, CxC, CxP y estados de resultados")
+        elif rango is None or rango[0] <= rango[1]:
+            filtros = (texto, *(rango or (None, None)), socio_codigo)
+            cursores = cursores_pagina("busqueda_movimientos", filtros)
+            with etapa("busqueda.consulta"):
+                resultados = query_buscar_movimientos(*filtros, cursores[-1])
+            
+            if not resultados.empty:
+                with etapa("busqueda.tabla"):
+                    formato.mostrar_tabla(resultados.drop(columns=['rango', 'id']),
+                                          moneda=['entrada', 'salida'])
+                controles_pagina("busqueda_movimientos", cursores,
+                                 len(resultados) == consultas.TAMANO_PAGINA,
+                                 (float(resultados['rango'].iloc[-1]), int(resultados['id'].iloc[-1])))
+            else:
+                st.warning("No se encontraron movimientos para los parámetros seleccionados")
+
+with tab4:
+    pestana_busqueda()
+
+# Fin de la primera ejecución del proceso: el reporte de arranque queda en el log
+arranque.REPORTE.marcar("pestañas")
+arranque.REPORTE.completar()
+
+# Panel de diagnóstico: solo con QQA_DIAGNOSTICO=1 y ?diagnostico=1 en la URL
+@st.cache_resource
+def iniciar_metricas():
+    puerto = os.environ.get("QQA_METRICAS_PUERTO")
+    if puerto:
+        return instrumentacion.iniciar_servidor_metricas(int(puerto), get_registro())
+
+if instrumentacion.ACTIVO:
+    iniciar_metricas()
+    if "diagnostico" in st.query_params:
+        with st.sidebar.expander("🔧 Diagnóstico", expanded=True):
+            st.caption("Última ejecución")
+            st.dataframe(pd.DataFrame(INSTRUMENTACION.ejecucion_actual()), use_container_width=True)
+            st.caption("Caché de consultas")
+            st.json(get_cache().estadisticas())
+            st.caption("Planes de consulta")
+            for sentencia, plan in INSTRUMENTACION.planes.items():
+                st.code(sentencia + "\n\n" + "\n".join(plan), language="sql")
+            st.caption("Métricas (formato Prometheus)")
+            st.code(INSTRUMENTACION.a_prometheus(get_cache()))
+            st.caption("Arranque del proceso")
+            st.code(arranque.REPORTE.texto())
+            if iniciar_calentamiento() is not None:
+                st.caption("Calentador de ventanas")
+                st.json(iniciar_calentamiento().estado())
+
 # Pie de página
 st.markdown("---")
 st.markdown(
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""
+Capa de datos del Dashboard Financiero - QuimQuinAgro.
+
+Aquí viven las tablas derivadas que construimos a partir de las hojas
+contables anuales (caja20XX, cxc20XX, ...) de contabilidad.db.
+"""
+
+DB_PATH = "contabilidad.db"
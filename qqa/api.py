@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+"""
+API HTTP de solo lectura con las consultas del tablero en JSON.
+
+    python -m qqa.api --puerto 8600
+
+Sirve las mismas consultas que las pestañas de caja_asociados_QQA.py (vía
+qqa.datos) sin levantar Streamlit ni serializar gráficos:
+
+    GET /caja?desde=2025-01-01&hasta=2025-06-30
+    GET /egresos?desde=...&hasta=...[&k=10]
+    GET /socios?desde=...&hasta=...[&despues_total=...&despues_codigo=...]
+    GET /socios?desde=...&hasta=...&socio=<codigo>[&resolucion=dia|semana|mes]
+    GET /socios/resumen?desde=...&hasta=...
+    GET /padron[?texto=...&despues_nombre=...&despues_codigo=...]
+    GET /busqueda?texto=...[&desde=...&hasta=...&socio=...&despues_rango=...&despues_id=...]
+    GET /saldos?cuenta=caja|cxc|cxp&desde=...&hasta=...[&socio=<codigo>|Todos]
+    GET /saldos/movimientos?cuenta=...&desde=...&hasta=...[&socio=<codigo>]
+    GET /conciliacion[?cuenta=caja|cxc|cxp]
+    GET /salud
+
+Con varias asociaciones (asociaciones.json) se elige con ?asociacion=<id>.
+Cada respuesta lleva un ETag calculado con la versión de la base, así que
+un cliente que repite la petición con If-None-Match recibe 304 sin que se
+ejecute la consulta mientras nadie escriba en la base.
+
+El servidor es asyncio de la biblioteca estándar (HTTP/1.1 con keep-alive);
+las consultas corren en un pool de hilos para no bloquear el bucle.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+from datetime import date, datetime
+from urllib.parse import parse_qsl, urlsplit
+
+from . import busqueda, cache, columnar, conciliacion, consultas, datos, series
+from .asociaciones import Registro
+
+logger = logging.getLogger(__name__)
+
+PUERTO = int(os.environ.get("QQA_API_PUERTO", 8600))
+MAX_CABECERAS = 64
+MAX_CUERPO = 64 * 1024  # bytes de cuerpo que se leen y descartan (la API no usa cuerpos)
+TIEMPO_ESPERA = 30  # segundos de una conexión inactiva antes de cerrarla
+
+ESTADOS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Content Too Large",
+    500: "Internal Server Error",
+}
+
+
+class ErrorPeticion(Exception):
+    """Parámetros inválidos: se responde 400 (o el estado indicado) con el mensaje."""
+
+    def __init__(self, mensaje, estado=400):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+def _fecha(params, nombre):
+    valor = params.get(nombre)
+    if valor is None:
+        raise ErrorPeticion(f"Falta el parámetro '{nombre}' (AAAA-MM-DD)")
+    try:
+        return date.fromisoformat(valor).isoformat()
+    except ValueError:
+        raise ErrorPeticion(f"'{nombre}' debe tener el formato AAAA-MM-DD") from None
+
+
+def _rango(params):
+    desde, hasta = _fecha(params, "desde"), _fecha(params, "hasta")
+    if desde > hasta:
+        raise ErrorPeticion("'desde' debe ser anterior a 'hasta'")
+    return desde, hasta
+
+
+def _numero(valor, nombre):
+    try:
+        return int(valor)
+    except ValueError:
+        try:
+            return float(valor)
+        except ValueError:
+            raise ErrorPeticion(f"'{nombre}' debe ser un número") from None
+
+
+def _cursor(params, *nombres):
+    """Cursor keyset de la página anterior: todos los parámetros o ninguno."""
+    valores = [params.get(n) for n in nombres]
+    if all(v is None for v in valores):
+        return None
+    if any(v is None for v in valores):
+        raise ErrorPeticion(f"El cursor necesita {', '.join(nombres)}")
+    return valores
+
+
+def _registros(df):
+    # Los NULL llegan como NaN, que no es JSON válido: se pasan a None (null)
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def _pagina(df, *columnas):
+    """Filas de una página y el cursor de la siguiente (None si es la última)."""
+    siguiente = None
+    if len(df) == consultas.TAMANO_PAGINA:
+        siguiente = {c: df[c].iloc[-1] for c in columnas}
+    return {"filas": _registros(df), "siguiente": siguiente}
+
+
+# Cada ruta recibe (Datos, parámetros) y devuelve algo serializable a JSON.
+# Corren en el pool de hilos del bucle.
+
+def ruta_caja(d, params):
+    return {"filas": _registros(d.caja_mensual(*_rango(params)))}
+
+
+def ruta_egresos(d, params):
+    k = _numero(params.get("k", consultas.TOP_EGRESOS), "k")
+    df, otros = d.top_egresos(*_rango(params), int(k))
+    return {"filas": _registros(df), "otros": otros}
+
+
+def ruta_socios(d, params):
+    desde, hasta = _rango(params)
+    socio = params.get("socio")
+    if socio is None or socio == "Todos":
+        despues = _cursor(params, "despues_total", "despues_codigo")
+        if despues is not None:
+            despues = (_numero(despues[0], "despues_total"), int(_numero(despues[1], "despues_codigo")))
+        return _pagina(d.pagina_socios(desde, hasta, despues), "total_ingresos", "codigo")
+
+    resolucion = params.get("resolucion") or series.elegir_resolucion(
+        date.fromisoformat(desde), date.fromisoformat(hasta)
+    )
+    if resolucion not in series.RESOLUCIONES:
+        raise ErrorPeticion(f"'resolucion' debe ser una de {', '.join(series.RESOLUCIONES)}")
+    codigo = int(_numero(socio, "socio"))
+    df = d.ingresos_socio(desde, hasta, codigo, resolucion)
+    estadisticas = _registros(d.estadisticas_socio(desde, hasta, codigo))
+    return {"resolucion": resolucion, "filas": _registros(df),
+            "estadisticas": estadisticas[0] if estadisticas else None}
+
+
+def ruta_resumen_socios(d, params):
+    df = d.resumen_socios(*_rango(params))
+    return _registros(df)[0] if not df.empty else {}
+
+
+def ruta_padron(d, params):
+    despues = _cursor(params, "despues_nombre", "despues_codigo")
+    if despues is not None:
+        despues = (despues[0], int(_numero(despues[1], "despues_codigo")))
+    return _pagina(d.buscar_socios(params.get("texto", ""), despues), "nombre", "codigo")
+
+
+def ruta_busqueda(d, params):
+    texto = params.get("texto", "")
+    if busqueda.expresion_fts(texto) is None:
+        raise ErrorPeticion("Falta el parámetro 'texto' con al menos una palabra")
+    # El rango es opcional: sin él se busca en todos los años
+    desde = _fecha(params, "desde") if "desde" in params else None
+    hasta = _fecha(params, "hasta") if "hasta" in params else None
+    socio = params.get("socio")
+    socio = int(_numero(socio, "socio")) if socio not in (None, "Todos") else None
+    despues = _cursor(params, "despues_rango", "despues_id")
+    if despues is not None:
+        despues = (float(_numero(despues[0], "despues_rango")), int(_numero(despues[1], "despues_id")))
+    return _pagina(d.buscar_movimientos(texto, desde, hasta, socio, despues), "rango", "id")
+
+
+def _cuenta(params, requerida=True):
+    cuenta = params.get("cuenta")
+    if cuenta is None and not requerida:
+        return None
+    if cuenta not in conciliacion.CUENTAS:
+        raise ErrorPeticion(f"'cuenta' debe ser una de {', '.join(conciliacion.CUENTAS)}")
+    return cuenta
+
+
+def _socio_saldos(cuenta, params):
+    socio = params.get("socio")
+    if socio is not None and cuenta not in conciliacion.CUENTAS_POR_SOCIO:
+        raise ErrorPeticion(f"La cuenta {cuenta} no lleva saldos por socio")
+    return socio
+
+
+def ruta_saldos(d, params):
+    cuenta = _cuenta(params)
+    desde, hasta = _rango(params)
+    socio = _socio_saldos(cuenta, params)
+    if socio == "Todos":
+        return {"filas": _registros(d.saldos_socios(cuenta, desde, hasta))}
+    codigo = None if socio is None else int(_numero(socio, "socio"))
+    df = d.saldos(cuenta, desde, hasta, codigo)
+    return _registros(df)[0] if not df.empty else {}
+
+
+def ruta_saldos_movimientos(d, params):
+    cuenta = _cuenta(params)
+    desde, hasta = _rango(params)
+    socio = _socio_saldos(cuenta, params)
+    codigo = None if socio is None else int(_numero(socio, "socio"))
+    return {"filas": _registros(d.saldos_corridos(cuenta, desde, hasta, codigo))}
+
+
+def ruta_conciliacion(d, params):
+    return {"filas": _registros(d.discrepancias(_cuenta(params, requerida=False)))}
+
+
+RUTAS = {
+    "/caja": ruta_caja,
+    "/egresos": ruta_egresos,
+    "/socios": ruta_socios,
+    "/socios/resumen": ruta_resumen_socios,
+    "/padron": ruta_padron,
+    "/busqueda": ruta_busqueda,
+    "/saldos": ruta_saldos,
+    "/saldos/movimientos": ruta_saldos_movimientos,
+    "/conciliacion": ruta_conciliacion,
+}
+
+
+def _a_json(valor):
+    """Convierte los valores de numpy y las fechas que trae un DataFrame."""
+    if hasattr(valor, "item"):
+        valor = valor.item()
+        return None if isinstance(valor, float) and math.isnan(valor) else valor
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"{type(valor).__name__} no es serializable a JSON")
+
+
+def etag(asociacion, parquet, ruta, consulta):
+    """ETag de una respuesta: cambia con la base, el backend y la petición."""
+    version = cache.version_base(asociacion.db)
+    if parquet:
+        # La instantánea solo cambia al volver a exportarla
+        version += cache.version_base(os.path.join(asociacion.parquet, columnar.MANIFIESTO))
+    base = repr((version, parquet, ruta, consulta))
+    return '"' + hashlib.sha1(base.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+class ServidorAPI:
+    """Atiende las peticiones HTTP con un Datos por asociación."""
+
+    def __init__(self, registro, parquet=datos.BACKEND_PARQUET):
+        self.registro = registro
+        self.parquet = parquet
+        self._datos = {}
+
+    def datos(self, id):
+        if id not in self._datos:
+            self._datos[id] = datos.Datos(self.registro[id], self.parquet)
+        return self._datos[id]
+
+    async def responder(self, metodo, destino, cabeceras):
+        """(estado, cabeceras extra, cuerpo) de una petición."""
+        if metodo not in ("GET", "HEAD"):
+            return 405, {"Allow": "GET, HEAD"}, {"error": "Solo se admiten GET y HEAD"}
+        partes = urlsplit(destino)
+        ruta = partes.path.rstrip("/") or "/"
+        params = dict(parse_qsl(partes.query))
+
+        if ruta == "/salud":
+            return 200, {}, {"estado": "ok", "asociaciones": self.registro.ids()}
+        if ruta not in RUTAS:
+            return 404, {}, {"error": f"No existe la ruta {ruta}", "rutas": sorted(RUTAS)}
+
+        id = params.pop("asociacion", self.registro.ids()[0])
+        if id not in self.registro:
+            return 404, {}, {"error": f"No existe la asociación '{id}'"}
+        asociacion = self.registro[id]
+        bucle = asyncio.get_running_loop()
+        # Primero se ponen al día las derivadas: la sincronización cambia la versión
+        await bucle.run_in_executor(None, asociacion.preparar)
+
+        marca = etag(asociacion, self.parquet, ruta, sorted(params.items()))
+        if marca in (e.strip() for e in cabeceras.get("if-none-match", "").split(",")):
+            return 304, {"ETag": marca}, None
+        try:
+            cuerpo = await bucle.run_in_executor(None, RUTAS[ruta], self.datos(id), params)
+        except ErrorPeticion as e:
+            return e.estado, {}, {"error": str(e)}
+        except Exception as e:
+            logger.exception("Error en %s", destino)
+            return 500, {}, {"error": f"Error en la consulta: {e}"}
+        return 200, {"ETag": marca, "Cache-Control": "no-cache"}, cuerpo
+
+    async def atender(self, lector, escritor):
+        """Una conexión: peticiones seguidas mientras el cliente la mantenga abierta."""
+        try:
+            while True:
+                try:
+                    linea = await asyncio.wait_for(lector.readline(), TIEMPO_ESPERA)
+                except asyncio.TimeoutError:
+                    break
+                if not linea.strip():
+                    break
+                try:
+                    metodo, destino, version = linea.decode("latin-1").split()
+                except ValueError:
+                    await self._escribir(escritor, "GET", 400, {}, {"error": "Petición mal formada"}, False)
+                    break
+                cabeceras = {}
+                while True:
+                    linea = await lector.readline()
+                    if linea in (b"\r\n", b"\n", b""):
+                        break
+                    if len(cabeceras) >= MAX_CABECERAS:
+                        continue
+                    nombre, _, valor = linea.decode("latin-1").partition(":")
+                    cabeceras[nombre.strip().lower()] = valor.strip()
+
+                # El cuerpo se descarta, pero hay que consumirlo: si quedara en el
+                # socket, la siguiente petición de la conexión empezaría a mitad de él
+                rechazo = await self._descartar_cuerpo(lector, cabeceras)
+                if rechazo is not None:
+                    estado, cuerpo = rechazo
+                    await self._escribir(escritor, metodo, estado, {}, cuerpo, False)
+                    break
+
+                conexion = cabeceras.get("connection", "").lower()
+                seguir = conexion != "close" if version == "HTTP/1.1" else conexion == "keep-alive"
+                estado, extra, cuerpo = await self.responder(metodo, destino, cabeceras)
+                await self._escribir(escritor, metodo, estado, extra, cuerpo, seguir)
+                if not seguir:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    @staticmethod
+    async def _descartar_cuerpo(lector, cabeceras):
+        """Lee y descarta el cuerpo de la petición; (estado, cuerpo) si hay que rechazarla."""
+        if "transfer-encoding" in cabeceras:
+            return 411, {"error": "Se necesita Content-Length; no se admite Transfer-Encoding"}
+        try:
+            largo = int(cabeceras.get("content-length", "0"))
+        except ValueError:
+            largo = -1
+        if largo < 0:
+            return 400, {"error": "Content-Length inválido"}
+        if largo > MAX_CUERPO:
+            return 413, {"error": f"El cuerpo no puede pasar de {MAX_CUERPO} bytes"}
+        if largo:
+            await lector.readexactly(largo)
+        return None
+
+    async def _escribir(self, escritor, metodo, estado, extra, cuerpo, seguir):
+        datos_cuerpo = b""
+        if cuerpo is not None:
+            # allow_nan=False: un NaN que se escape hace fallar la respuesta, no al cliente
+            datos_cuerpo = json.dumps(cuerpo, default=_a_json, ensure_ascii=False,
+                                      allow_nan=False).encode("utf-8")
+        lineas = [f"HTTP/1.1 {estado} {ESTADOS[estado]}"]
+        if estado != 304:
+            lineas.append("Content-Type: application/json; charset=utf-8")
+            lineas.append(f"Content-Length: {len(datos_cuerpo)}")
+        lineas.append("Connection: " + ("keep-alive" if seguir else "close"))
+        lineas.extend(f"{nombre}: {valor}" for nombre, valor in extra.items())
+        escritor.write(("\r\n".join(lineas) + "\r\n\r\n").encode("latin-1"))
+        if metodo != "HEAD" and estado != 304:
+            escritor.write(datos_cuerpo)
+        await escritor.drain()
+
+
+async def servir(host="127.0.0.1", puerto=PUERTO, registro=None):
+    api = ServidorAPI(registro or Registro.cargar())
+    servidor = await asyncio.start_server(api.atender, host, puerto)
+    logger.info("API de QuimQuinAgro en http://%s:%s", host, puerto)
+    async with servidor:
+        await servidor.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API JSON de solo lectura del tablero.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(servir(args.host, args.puerto))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
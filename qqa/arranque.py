@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Arranque en frío del tablero.
+
+La primera sesión de un proceso paga todo: importar Plotly, sincronizar las
+tablas derivadas y calcular las vistas por defecto. Este módulo lo adelanta
+en hilos que arrancan apenas el servidor carga el script: uno importa los
+módulos pesados y el otro es el calentador (qqa.calentador), que pone al
+día las derivadas de cada asociación y deja en su caché las vistas de las
+ventanas de fechas más usadas.
+
+Desde la terminal deja sincronizadas las derivadas antes de levantar el
+servidor y muestra cuánto tardó cada etapa:
+
+    python -m qqa.arranque
+
+Termina con código 1 si alguna asociación no quedó lista.
+
+El reporte de tiempos (REPORTE) cubre la primera ejecución del script y el
+hilo de calentamiento; se escribe en el log y se ve en el panel de diagnóstico.
+"""
+
+import importlib
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Rango por defecto de cada pestaña, en días hacia atrás desde hoy
+DIAS_POR_DEFECTO = {"caja": 365, "egresos": 180, "socios": 365}
+
+# Módulos que solo hacen falta al dibujar; se importan en el hilo de calentamiento
+MODULOS_PESADOS = ["plotly.express"]
+
+
+class ReporteArranque:
+    """Tiempos de las etapas del arranque, desde que se importa este módulo."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas = []
+        self.completo = False
+        self._ultima_marca = self.inicio
+        self._lock = threading.Lock()
+
+    def registrar(self, nombre, segundos, hilo="principal"):
+        # Las ejecuciones siguientes del script no son arranque
+        if self.completo and hilo == "principal":
+            return
+        with self._lock:
+            self.etapas.append({
+                "etapa": nombre,
+                "hilo": hilo,
+                "ms": round(segundos * 1000, 1),
+                "desde_inicio_ms": round((time.perf_counter() - self.inicio) * 1000, 1),
+            })
+
+    @contextmanager
+    def etapa(self, nombre, hilo="principal"):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nombre, time.perf_counter() - inicio, hilo)
+
+    def marcar(self, nombre):
+        """Registra lo que tardó el script desde la marca anterior (o desde el inicio)."""
+        ahora = time.perf_counter()
+        self.registrar(nombre, ahora - self._ultima_marca)
+        self._ultima_marca = ahora
+
+    def completar(self):
+        """Cierra el reporte al terminar la primera ejecución del script."""
+        if not self.completo:
+            self.completo = True
+            logger.info("Primera ejecución del tablero:\n%s", self.texto())
+
+    def filas(self):
+        with self._lock:
+            return list(self.etapas)
+
+    def texto(self):
+        return "\n".join(
+            f"{f['desde_inicio_ms']:>9.1f} ms  {f['ms']:>9.1f} ms  [{f['hilo']}] {f['etapa']}"
+            for f in self.filas()
+        )
+
+
+REPORTE = ReporteArranque()
+
+
+def importar(nombre):
+    """Importa un módulo pesado la primera vez que se usa (luego sale de sys.modules)."""
+    return importlib.import_module(nombre)
+
+
+def rangos_por_defecto(hoy=None):
+    """{vista: (inicio, fin)} con los rangos que muestran las pestañas al abrir."""
+    hoy = hoy or date.today()
+    return {vista: (hoy - timedelta(days=dias), hoy) for vista, dias in DIAS_POR_DEFECTO.items()}
+
+
+def importar_pesados(hilo="principal"):
+    """Importa MODULOS_PESADOS para que el primer gráfico no espere."""
+    for nombre in MODULOS_PESADOS:
+        try:
+            with REPORTE.etapa(f"importar {nombre}", hilo):
+                importar(nombre)
+        except ImportError:
+            logger.warning("No se pudo importar %s", nombre)
+
+
+def iniciar_calentamiento(registro):
+    """
+    Importa los módulos pesados en un hilo y deja corriendo el calentador.
+
+    Devuelve el qqa.calentador.Calentador, que en su primera pasada
+    sincroniza las derivadas y precalcula las ventanas de cada asociación.
+    """
+    from .calentador import Calentador
+
+    threading.Thread(target=importar_pesados, args=("calentamiento",),
+                     name="qqa-importaciones", daemon=True).start()
+    return Calentador(registro).iniciar()
+
+
+def main():
+    from .asociaciones import Registro
+    from .calentador import Calentador
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    registro = Registro.cargar()
+    calentador = Calentador(registro, hilo="principal")
+    try:
+        importar_pesados()
+        calentador.revisar()
+    finally:
+        registro.cerrar()
+    logger.info("Arranque:\n%s", REPORTE.texto())
+    fallidas = calentador.fallidas()
+    if fallidas:
+        estado = calentador.estado()
+        for id in fallidas:
+            logger.error("La asociación %s no quedó lista: %s", id, estado[id]["error"])
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    # Con -m este archivo es __main__; el calentador registra en el REPORTE de qqa.arranque
+    from qqa import arranque
+
+    arranque.main()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Registro de asociaciones: un proceso del tablero para varias contabilidades.
+
+asociaciones.json (o el archivo en QQA_ASOCIACIONES) asigna a cada id de
+asociación su base y, opcionalmente, su cuota de caché, el tamaño de su
+pool y la carpeta de su instantánea Parquet:
+    {
+        "quimquinagro": {"nombre": "QuimQuinAgro", "db": "contabilidad.db", "cache_mb": 64},
+        "lapaz": {"nombre": "La Paz", "db": "bases/lapaz.db", "cache_mb": 16}
+    }
+Sin el archivo hay una sola asociación con contabilidad.db.
+
+Cada asociación tiene su propio pool de conexiones y su propia caché de
+resultados con su cuota de memoria, así las consultas de una nunca se
+sirven desde la caché de otra; todo vive en el mismo proceso y se crea la
+primera vez que alguien abre esa asociación.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+from . import DB_PATH, cache, columnar, conexiones, sync
+
+RUTA_REGISTRO = os.environ.get("QQA_ASOCIACIONES", "asociaciones.json")
+ID_POR_DEFECTO = "quimquinagro"
+
+
+class Asociacion:
+    """Una contabilidad con su pool, su caché y su instantánea Parquet."""
+
+    def __init__(self, id, db, nombre=None, cache_mb=cache.PRESUPUESTO_MB,
+                 pool=conexiones.TAMANO_POOL, parquet=None):
+        self.id = id
+        self.db = db
+        self.nombre = nombre or id
+        self.cache_mb = cache_mb
+        self.tamano_pool = pool
+        self.parquet = parquet or os.path.join(columnar.DIRECTORIO, id)
+        self._lock = threading.Lock()
+        self._lock_sync = threading.Lock()
+        self._pool = None
+        self._cache = None
+        self._parquet = None
+        self._preparada = None
+        self._verificada = None
+
+    def preparar(self, verificar_contenido=False):
+        """
+        Pone al día las tablas derivadas si la base cambió desde la última vez.
+
+        Por defecto solo relee las tablas fuente cuyo máximo rowid o número
+        de filas cambió: es lo que corre en cada ejecución del tablero y en
+        cada petición de la API. Con verificar_contenido=True también compara
+        los hashes por mes de todas las tablas, lo que detecta ediciones pero
+        lee toda la historia; lo usan el calentador y los comandos de terminal.
+
+        Devuelve True si sincronizó. Solo espera quien prepara la misma asociación.
+        """
+        with self._lock_sync:
+            vigente = self._verificada if verificar_contenido else self._preparada
+            if cache.version_base(self.db) == vigente:
+                return False
+            conn = sqlite3.connect(self.db)
+            try:
+                conexiones.activar_wal(conn)
+                sync.refrescar(conn, verificar_contenido=verificar_contenido)
+            finally:
+                conn.close()
+            # La versión se toma después: la sincronización también escribe
+            self._preparada = cache.version_base(self.db)
+            if verificar_contenido:
+                self._verificada = self._preparada
+            return True
+
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = conexiones.PoolConexiones(self.db, tamano=self.tamano_pool)
+            return self._pool
+
+    def cache(self):
+        with self._lock:
+            if self._cache is None:
+                self._cache = cache.CacheConsultas(self.db, max_bytes=self.cache_mb * 1024 * 1024)
+            return self._cache
+
+    def backend_parquet(self):
+        with self._lock:
+            if self._parquet is None:
+                self._parquet = columnar.BackendParquet(self.parquet)
+            return self._parquet
+
+    def estadisticas(self):
+        """Estadísticas de la caché; vacío si todavía no se creó."""
+        return {} if self._cache is None else self._cache.estadisticas()
+
+    def cerrar(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.cerrar()
+            if self._parquet is not None:
+                self._parquet.cerrar()
+            self._pool = self._cache = self._parquet = None
+
+
+class Registro:
+    """Asociaciones disponibles por id, en el orden del archivo."""
+
+    def __init__(self, asociaciones):
+        self._asociaciones = {a.id: a for a in asociaciones}
+
+    @classmethod
+    def cargar(cls, ruta=RUTA_REGISTRO, cache_mb=cache.PRESUPUESTO_MB):
+        """Lee el registro; cache_mb es la cuota de las asociaciones que no la indican."""
+        try:
+            with open(ruta, encoding="utf-8") as archivo:
+                datos = json.load(archivo)
+        except FileNotFoundError:
+            return cls([Asociacion(ID_POR_DEFECTO, DB_PATH, "QuimQuinAgro", cache_mb,
+                                   parquet=columnar.DIRECTORIO)])
+
+        asociaciones = []
+        for id, conf in datos.items():
+            if "db" not in conf:
+                raise ValueError(f"La asociación {id} de {ruta} no indica su base ('db')")
+            asociaciones.append(Asociacion(
+                id,
+                conf["db"],
+                conf.get("nombre"),
+                conf.get("cache_mb", cache_mb),
+                conf.get("pool", conexiones.TAMANO_POOL),
+                conf.get("parquet"),
+            ))
+        if not asociaciones:
+            raise ValueError(f"{ruta} no tiene asociaciones")
+        return cls(asociaciones)
+
+    def __contains__(self, id):
+        return id in self._asociaciones
+
+    def __getitem__(self, id):
+        return self._asociaciones[id]
+
+    def __len__(self):
+        return len(self._asociaciones)
+
+    def ids(self):
+        return list(self._asociaciones)
+
+    def estadisticas(self):
+        """Suma de las estadísticas de las cachés ya creadas (para /metrics)."""
+        total = {}
+        for asociacion in self._asociaciones.values():
+            for clave, valor in asociacion.estadisticas().items():
+                total[clave] = total.get(clave, 0) + valor
+        return total
+
+    def cerrar(self):
+        for asociacion in self._asociaciones.values():
+            asociacion.cerrar()
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Búsqueda de movimientos por su descripción.
+
+busqueda_documentos reúne una fila por movimiento de las tablas caja, cxc,
+cxp, er y edr (fecha ISO, socio, entrada, salida y el texto de detalle,
+concepto o comentario) y busqueda_fts es un índice FTS5 sobre ese texto,
+sin tildes ni mayúsculas y con índices de prefijo. Ambas se mantienen con
+qqa.sync, así que lo que se carga con qqa.ingesta queda buscable en la
+misma sincronización.
+
+Los resultados se ordenan por relevancia (bm25) y se paginan por keyset
+sobre (rango, id); los filtros de fecha y socio se aplican a las filas que
+ya calzaron con el texto.
+"""
+
+import re
+
+from . import conceptos, cxc, ledger
+from .conceptos import plegar
+
+TABLA_DOCUMENTOS = "busqueda_documentos"
+TABLA_FTS = "busqueda_fts"
+VERSION = 2
+
+
+def fuentes(conn):
+    return conceptos.fuentes(conn) + cxc.fuentes_socios(conn)
+
+
+def crear_busqueda(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLA_DOCUMENTOS} (
+        id INTEGER PRIMARY KEY,
+        fuente TEXT NOT NULL,
+        fila INTEGER NOT NULL,
+        mes TEXT NOT NULL,
+        fecha TEXT,
+        codigo_socio INTEGER,
+        socio_nombre TEXT,
+        entrada INTEGER,
+        salida INTEGER,
+        detalle TEXT NOT NULL
+    )
+    """)
+    # Para borrar los meses que cambian de una fuente
+    conn.execute(f"""
+    CREATE INDEX IF NOT EXISTS idx_busqueda_fuente_mes
+        ON {TABLA_DOCUMENTOS} (fuente, mes)
+    """)
+    # Índice externo: el texto vive en busqueda_documentos, FTS5 solo guarda el índice
+    conn.execute(f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5(
+        detalle,
+        content='{TABLA_DOCUMENTOS}',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """)
+
+
+def select_fuente_busqueda(conn, tabla):
+    """SELECT que lleva una tabla fuente al esquema de busqueda_documentos."""
+    columnas = ledger.columnas_tabla(conn, tabla)
+    detalle = conceptos.columna_detalle(columnas)
+    if detalle is None:
+        return None
+    fecha = ledger.expr_fecha_iso() if "fecha" in columnas else "NULL"
+
+    socio = next((c for c in (ledger.columna(columnas, n) for n in cxc.COLUMNAS_SOCIO) if c), None)
+    codigo, nombre = ("NULL", "NULL") if socio is None else cxc.expr_socio(f'"{socio}"')
+    montos = ledger.columnas_montos(columnas)
+    entrada, salida = [f'"{c}"' for c in montos] if montos else ["NULL", "NULL"]
+
+    return f"""
+    SELECT
+        '{tabla}' as fuente,
+        rowid as fila,
+        COALESCE(substr({fecha}, 1, 7), '') as mes,
+        {fecha} as fecha,
+        {codigo} as codigo_socio,
+        {nombre} as socio_nombre,
+        {entrada} as entrada,
+        {salida} as salida,
+        trim("{detalle}") as detalle
+    FROM "{tabla}"
+    WHERE trim(COALESCE("{detalle}", '')) <> ''
+    """
+
+
+def refrescar_busqueda(conn, tabla, meses=None):
+    """
+    Sincroniza los documentos y el índice de una tabla fuente.
+
+    Si la tabla es de socios, solo vuelve a resolver los códigos de los
+    movimientos que vienen identificados por nombre.
+    """
+    if cxc.PATRON_SOCIOS.match(tabla):
+        conn.execute(f"""
+        UPDATE {TABLA_DOCUMENTOS}
+        SET codigo_socio = (
+            SELECT s.codigo FROM {cxc.TABLA_SOCIOS} s
+            WHERE s.clave = {cxc.clave_nombre(TABLA_DOCUMENTOS + '.socio_nombre')}
+        )
+        WHERE socio_nombre IS NOT NULL
+        """)
+        return
+
+    select = select_fuente_busqueda(conn, tabla) if ledger.tabla_existe(conn, tabla) else None
+    if meses is None:
+        _borrar(conn, "fuente = ?", (tabla,))
+        if select is not None:
+            _insertar(conn, select, "1", ())
+        return
+
+    for bloque in ledger.bloques(list(meses)):
+        marcas = ", ".join("?" * len(bloque))
+        _borrar(conn, f"fuente = ? AND mes IN ({marcas})", (tabla, *bloque))
+        if select is not None:
+            _insertar(conn, select, f"mes IN ({marcas})", bloque)
+
+
+def _borrar(conn, filtro, params):
+    # Con contenido externo, FTS5 necesita el texto viejo para sacarlo del índice
+    conn.execute(f"""
+    INSERT INTO {TABLA_FTS} ({TABLA_FTS}, rowid, detalle)
+    SELECT 'delete', id, detalle FROM {TABLA_DOCUMENTOS} WHERE {filtro}
+    """, params)
+    conn.execute(f"DELETE FROM {TABLA_DOCUMENTOS} WHERE {filtro}", params)
+
+
+def _insertar(conn, select, filtro, params):
+    desde = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {TABLA_DOCUMENTOS}").fetchone()[0]
+    conn.execute(f"""
+    INSERT INTO {TABLA_DOCUMENTOS}
+        (fuente, fila, mes, fecha, codigo_socio, socio_nombre, entrada, salida, detalle)
+    SELECT * FROM ({select}) WHERE {filtro}
+    """, params)
+    conn.execute(f"""
+    INSERT INTO {TABLA_FTS} (rowid, detalle)
+    SELECT id, detalle FROM {TABLA_DOCUMENTOS} WHERE id > ?
+    """, (desde,))
+
+
+def expresion_fts(texto):
+    """
+    Consulta FTS5 a partir de lo que escribe el usuario.
+
+    Cada palabra se busca como prefijo y todas deben aparecer: 'recib amanda'
+    -> '"recib"* "amanda"*'. Las comillas evitan que la sintaxis de FTS5
+    (AND, NEAR, guiones) se interprete. Devuelve None si no quedan palabras.
+    """
+    palabras = re.findall(r"\w+", plegar(texto or ""))
+    if not palabras:
+        return None
+    return " ".join(f'"{p}"*' for p in palabras)
+
+
+def consulta_buscar_movimientos(texto, limite, fecha_inicio=None, fecha_fin=None, socio_codigo=None,
+                                despues=None):
+    """
+    Página de movimientos cuyo detalle calza con `texto`, del más relevante al menos.
+
+    `despues` es (rango, id) de la última fila de la página anterior. Las
+    columnas son fecha, fuente, socio, detalle, entrada, salida, rango e id.
+    """
+    expresion = expresion_fts(texto)
+    if expresion is None:
+        raise ValueError("La búsqueda necesita al menos una palabra")
+    filtros, params = [f"{TABLA_FTS} MATCH ?"], [expresion]
+    if fecha_inicio is not None:
+        filtros.append("d.fecha >= ?")
+        params.append(fecha_inicio)
+    if fecha_fin is not None:
+        filtros.append("d.fecha <= ?")
+        params.append(fecha_fin)
+    if socio_codigo is not None:
+        filtros.append("d.codigo_socio = ?")
+        params.append(socio_codigo)
+    cursor = ""
+    if despues is not None:
+        cursor = "WHERE (rango, id) > (?, ?)"
+        params.extend(despues)
+
+    query = f"""
+    SELECT * FROM (
+        SELECT
+            d.fecha,
+            d.fuente,
+            COALESCE(s.nombre, d.socio_nombre, 'Socio ' || d.codigo_socio) as socio,
+            d.detalle,
+            d.entrada,
+            d.salida,
+            bm25({TABLA_FTS}) as rango,
+            d.id
+        FROM {TABLA_FTS}
+        JOIN {TABLA_DOCUMENTOS} d ON d.id = {TABLA_FTS}.rowid
+        LEFT JOIN {cxc.TABLA_SOCIOS} s ON s.codigo = d.codigo_socio
+        WHERE {' AND '.join(filtros)}
+    )
+    {cursor}
+    ORDER BY rango, id
+    LIMIT {int(limite)}
+    """
+    return query, tuple(params)
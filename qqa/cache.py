@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Caché de resultados de consultas atada a la versión de la base.
+
+Cada resultado se guarda con la consulta, sus parámetros y una marca de
+versión de contabilidad.db (fecha de modificación y tamaño del archivo y
+de su WAL). Cuando se carga información nueva la marca cambia y los
+resultados viejos se descartan sin reiniciar el servidor. La memoria se
+limita con un presupuesto en bytes y se desalojan primero los resultados
+usados hace más tiempo (LRU).
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from . import DB_PATH
+
+PRESUPUESTO_MB = 64
+
+
+def version_base(ruta=DB_PATH):
+    """Marca que cambia cada vez que alguien escribe en la base."""
+    marca = []
+    for archivo in (ruta, ruta + "-wal"):
+        try:
+            info = os.stat(archivo)
+        except FileNotFoundError:
+            marca.append(None)
+        else:
+            # El primer lector crea un WAL vacío: equivale a no tenerlo
+            marca.append((info.st_mtime_ns, info.st_size) if info.st_size else None)
+    return tuple(marca)
+
+
+def tamano_resultado(valor):
+    """Bytes aproximados que ocupa un resultado (DataFrame u otro objeto)."""
+    if hasattr(valor, "memory_usage"):
+        return int(valor.memory_usage(index=True, deep=True).sum())
+    return sys.getsizeof(valor)
+
+
+class CacheConsultas:
+    """
+    Caché LRU con presupuesto en bytes y contadores de aciertos/fallos.
+
+    Los valores se comparten entre sesiones: quien los reciba no debe
+    modificarlos en sitio.
+    """
+
+    def __init__(self, ruta=DB_PATH, max_bytes=PRESUPUESTO_MB * 1024 * 1024,
+                 version=None, tamano=tamano_resultado):
+        self.max_bytes = max_bytes
+        self._version = version or (lambda: version_base(ruta))
+        self._tamano = tamano
+        self._datos = OrderedDict()
+        self._version_actual = None
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.invalidaciones = 0
+
+    def obtener(self, query, params, calcular):
+        """Devuelve el resultado en caché o lo calcula con calcular() y lo guarda."""
+        version = self._version()
+        clave = (query, tuple(params))
+        with self._lock:
+            if version != self._version_actual:
+                self._vaciar()
+                self._version_actual = version
+            if clave in self._datos:
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                return self._datos[clave][0]
+            self.fallos += 1
+
+        # La consulta corre fuera del candado para no frenar a otras sesiones
+        valor = calcular()
+        self.guardar(query, params, valor, version)
+        return valor
+
+    def contiene(self, query, params):
+        """True si el resultado ya está en caché para la versión actual de la base."""
+        version = self._version()
+        with self._lock:
+            return version == self._version_actual and (query, tuple(params)) in self._datos
+
+    def guardar(self, query, params, valor, version=None):
+        """Guarda un resultado ya calculado (si cabe en el presupuesto)."""
+        version = self._version() if version is None else version
+        clave = (query, tuple(params))
+        tamano = self._tamano(valor)
+        if tamano > self.max_bytes:
+            return
+        with self._lock:
+            if version != self._version_actual:
+                # Solo adoptamos la versión si es la vigente; si no, el dato ya es viejo
+                if version != self._version():
+                    return
+                self._vaciar()
+                self._version_actual = version
+            if clave in self._datos:
+                self.bytes -= self._datos.pop(clave)[1]
+            self._datos[clave] = (valor, tamano)
+            self.bytes += tamano
+            while self.bytes > self.max_bytes:
+                _, (_, liberado) = self._datos.popitem(last=False)
+                self.bytes -= liberado
+                self.desalojos += 1
+
+    def _vaciar(self):
+        if self._datos:
+            self.invalidaciones += 1
+        self._datos.clear()
+        self.bytes = 0
+
+    def invalidar(self):
+        with self._lock:
+            self._vaciar()
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "entradas": len(self._datos),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "desalojos": self.desalojos,
+                "invalidaciones": self.invalidaciones,
+            }
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Calentador de la caché para las ventanas de fechas más consultadas.
+
+Un hilo del proceso del tablero revisa cada cierto tiempo (QQA_CALENTAR_CADA
+segundos, 60 por defecto) la versión de la base de cada asociación y la
+fecha de hoy. Si alguna cambió, pone al día las derivadas y deja en la
+caché de la asociación la caja, los egresos, el ranking y el resumen de
+socios de cada ventana: las de las pestañas al abrir (últimos 365 y 180
+días) y las de calendario (mes, trimestre y año en curso, y los últimos
+doce meses calendario). Así el primer usuario de la mañana, o el primero
+después de cargar datos, encuentra esas vistas calculadas.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+from . import arranque, cache
+
+logger = logging.getLogger(__name__)
+
+INTERVALO = int(os.environ.get("QQA_CALENTAR_CADA", 60))
+# Tope de la espera antes de reintentar una asociación que falló (se duplica en cada fallo)
+ESPERA_MAXIMA = int(os.environ.get("QQA_CALENTAR_ESPERA_MAX", 3600))
+
+
+def ventanas(hoy=None):
+    """{nombre: (inicio, fin)} de las ventanas que se precalculan."""
+    hoy = hoy or date.today()
+    resultado = {
+        f"ultimos_{dias}_dias": (hoy - timedelta(days=dias), hoy)
+        for dias in sorted(set(arranque.DIAS_POR_DEFECTO.values()))
+    }
+    mes = hoy.replace(day=1)
+    # Primer día del mes de hace once meses: doce meses calendario con el actual
+    anio, indice = divmod(hoy.year * 12 + hoy.month - 1 - 11, 12)
+    resultado.update({
+        "mes": (mes, hoy),
+        "trimestre": (mes.replace(month=3 * ((hoy.month - 1) // 3) + 1), hoy),
+        "anio": (mes.replace(month=1), hoy),
+        "doce_meses": (date(anio, indice + 1, 1), hoy),
+    })
+    return resultado
+
+
+def calentar_ventanas(consultas_datos, hoy=None):
+    """Precalcula las vistas de todas las ventanas con un Datos; devuelve cuántas."""
+    rangos = {tuple(f.strftime("%Y-%m-%d") for f in r) for r in ventanas(hoy).values()}
+    for inicio, fin in sorted(rangos):
+        consultas_datos.precargar({
+            "caja": (inicio, fin),
+            "egresos": (inicio, fin),
+            "socios": (inicio, fin, "Todos"),
+        })
+        consultas_datos.resumen_socios(inicio, fin)
+    return len(rangos)
+
+
+class Calentador:
+    """Mantiene calientes las ventanas de cada asociación del registro."""
+
+    def __init__(self, registro, intervalo=INTERVALO, hilo="calentamiento"):
+        self.registro = registro
+        self.intervalo = intervalo
+        self.hilo = hilo
+        self._marcas = {}
+        self._fallos = {}
+        self._estado = {}
+        self._primera = True
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def revisar(self, hoy=None):
+        """Calienta las asociaciones cuya base o fecha cambió; devuelve sus ids."""
+        from . import datos  # trae pandas; ver qqa.arranque
+
+        hoy = hoy or date.today()
+        # Solo la primera pasada es parte del arranque
+        reporte = arranque.REPORTE if self._primera else None
+        self._primera = False
+        calentadas = []
+        for id in self.registro.ids():
+            asociacion = self.registro[id]
+            marca = (cache.version_base(asociacion.db), hoy)
+            if self._marcas.get(id) == marca:
+                continue
+            fallo = self._fallos.get(id)
+            if fallo is not None and fallo["marca"] == marca and time.time() < fallo["reintento"]:
+                continue
+            inicio = time.perf_counter()
+            try:
+                asociacion.preparar(verificar_contenido=True)
+                n = calentar_ventanas(datos.Datos(asociacion), hoy)
+            except Exception as e:
+                self._registrar_fallo(id, asociacion, hoy, fallo, e)
+                continue
+            segundos = time.perf_counter() - inicio
+            # La versión se toma después: preparar() también escribe en la base
+            self._marcas[id] = (cache.version_base(asociacion.db), hoy)
+            self._fallos.pop(id, None)
+            self._estado[id] = {"fecha": hoy.isoformat(), "ventanas": n,
+                                "segundos": round(segundos, 3), "calentada": time.time()}
+            if reporte is not None:
+                reporte.registrar(f"{id}: derivadas y {n} ventanas", segundos, self.hilo)
+            calentadas.append(id)
+        return calentadas
+
+    def _registrar_fallo(self, id, asociacion, hoy, fallo, error):
+        """
+        Deja la asociación en espera antes del siguiente intento.
+
+        Con la misma base y fecha el error se repetiría, así que la espera
+        se duplica en cada fallo hasta ESPERA_MAXIMA y el traceback solo se
+        registra la primera vez. Si la base o la fecha cambian se reintenta
+        en la siguiente revisión.
+        """
+        marca = (cache.version_base(asociacion.db), hoy)
+        intentos = fallo["intentos"] + 1 if fallo is not None and fallo["marca"] == marca else 1
+        espera = min(self.intervalo * 2 ** (intentos - 1), ESPERA_MAXIMA)
+        if intentos == 1:
+            logger.exception("No se pudo calentar la asociación %s; se reintentará en %d s", id, espera)
+        else:
+            logger.warning("La asociación %s sigue sin calentarse (intento %d: %s); se reintentará en %d s",
+                           id, intentos, error, espera)
+        self._fallos[id] = {"marca": marca, "intentos": intentos, "reintento": time.time() + espera}
+        self._estado[id] = {"fecha": hoy.isoformat(), "error": f"{type(error).__name__}: {error}",
+                            "intentos": intentos, "reintento": time.time() + espera}
+
+    def fallidas(self):
+        """Ids de las asociaciones cuyo último intento falló."""
+        return list(self._fallos)
+
+    def ejecutar(self):
+        """Revisa enseguida y luego cada `intervalo` segundos hasta detener()."""
+        while True:
+            try:
+                self.revisar()
+            except Exception:
+                logger.exception("Falló la revisión del calentador")
+            if self._detener.wait(self.intervalo):
+                return
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self.ejecutar, name="qqa-calentador", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+
+    def estado(self):
+        """Última pasada por asociación (para el panel de diagnóstico)."""
+        return dict(self._estado)
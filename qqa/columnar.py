@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Instantáneas Parquet de los movimientos y consultas sobre ellas con DuckDB.
+
+exportar() escribe movimientos_caja y cxc_movimientos en Parquet
+particionado al estilo Hive por año y mes de la fecha
+(movimientos_caja/anio=2024/mes=6/...), ordenado por fecha para que cada
+row group tenga estadísticas de fecha estrechas, más las dimensiones
+conceptos y socios en un archivo cada una.
+
+BackendParquet lee esas carpetas con DuckDB en el mismo proceso. Las
+funciones consulta_* tienen la misma firma y devuelven las mismas columnas
+que las de qqa.consultas, en el dialecto de DuckDB: el filtro por año
+descarta carpetas completas y el filtro por fecha se empuja a las
+estadísticas de cada row group. Se activa en el tablero con
+QQA_BACKEND=parquet.
+
+pyarrow (exportar) y duckdb (consultar) son opcionales:
+    pip install pyarrow duckdb
+
+Uso desde la terminal:
+    python -m qqa.columnar contabilidad.db --destino snapshots
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+
+from . import DB_PATH, cache, conceptos, conexiones, consultas, cxc, egresos, ledger, paginacion, series
+
+DIRECTORIO = os.environ.get("QQA_PARQUET", "snapshots")
+MANIFIESTO = "manifiesto.json"
+FILAS_POR_BLOQUE = 100_000
+
+# Columnas exportadas de cada tabla particionada: (nombre, tipo arrow, expresión SQLite).
+# anio y mes son el año y mes de la fecha; el año de la hoja fuente queda en anio_fuente.
+PARTICIONADAS = {
+    ledger.TABLA_MOVIMIENTOS: [
+        ("fuente", "string", "fuente"),
+        ("anio_fuente", "int32", "anio"),
+        ("fila", "int64", "fila"),
+        ("fecha", "string", "fecha"),
+        ("ingreso", "int64", "ingreso"),
+        ("egreso", "int64", "egreso"),
+        ("detalle", "string", "detalle"),
+        ("concepto_id", "int64", "concepto_id"),
+    ],
+    cxc.TABLA_CXC: [
+        ("fuente", "string", "fuente"),
+        ("anio_fuente", "int32", "anio"),
+        ("fila", "int64", "fila"),
+        ("codigo_socio", "int64", "codigo_socio"),
+        ("socio_nombre", "string", "socio_nombre"),
+        ("fecha", "string", "fecha"),
+        ("entrada", "int64", "entrada"),
+        ("salida", "int64", "salida"),
+        ("saldo", "int64", "saldo"),
+        ("detalle", "string", "detalle"),
+        ("concepto_id", "int64", "concepto_id"),
+    ],
+}
+# Las filas sin fecha (algunas de cxc) van a anio=0/mes=0
+PARTICIONES = [
+    ("anio", "int32", "COALESCE(CAST(substr(fecha, 1, 4) AS INTEGER), 0)"),
+    ("mes", "int32", "COALESCE(CAST(substr(fecha, 6, 2) AS INTEGER), 0)"),
+]
+DIMENSIONES = {
+    conceptos.TABLA_CONCEPTOS: [
+        ("id", "int64", "id"),
+        ("clave", "string", "clave"),
+        ("nombre", "string", "nombre"),
+    ],
+    cxc.TABLA_SOCIOS: [
+        ("codigo", "int64", "codigo"),
+        ("nombre", "string", "nombre"),
+        ("clave", "string", "clave"),
+        ("anio", "int32", "anio"),
+    ],
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("La exportación a Parquet necesita pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError("El backend Parquet necesita duckdb: pip install duckdb") from e
+    return duckdb
+
+
+# ---------------------------------------------------------------------------
+# Exportación
+# ---------------------------------------------------------------------------
+
+def _esquema(pa, columnas):
+    return pa.schema([(nombre, getattr(pa, tipo)()) for nombre, tipo, _ in columnas])
+
+
+def _lotes(pa, conn, query, esquema, tamano):
+    """RecordBatches de a `tamano` filas, sin cargar la tabla completa."""
+    for _, filas in paginacion.leer_por_bloques(conn, query, tamano=tamano):
+        valores = list(zip(*filas))
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(valores[i], type=campo.type) for i, campo in enumerate(esquema)],
+            schema=esquema,
+        )
+
+
+def exportar(ruta=DB_PATH, destino=DIRECTORIO, tamano=FILAS_POR_BLOQUE):
+    """
+    Escribe la instantánea completa en `destino` y devuelve el manifiesto.
+
+    Se escribe primero en una carpeta temporal y luego se reemplaza la
+    anterior, para que el tablero nunca lea una instantánea a medias.
+    """
+    pa = _pyarrow()
+    temporal = destino.rstrip("/\\") + ".tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+
+    conn = conexiones.abrir_solo_lectura(ruta)
+    filas = {}
+    try:
+        for tabla, columnas in PARTICIONADAS.items():
+            todas = columnas + PARTICIONES
+            esquema = _esquema(pa, todas)
+            query = (
+                f"SELECT {', '.join(f'{expr} as {nombre}' for nombre, _, expr in todas)} "
+                f"FROM {tabla} ORDER BY fecha"
+            )
+            pa.dataset.write_dataset(
+                _lotes(pa, conn, query, esquema, tamano),
+                os.path.join(temporal, tabla),
+                schema=esquema,
+                format="parquet",
+                partitioning=pa.dataset.partitioning(_esquema(pa, PARTICIONES), flavor="hive"),
+                existing_data_behavior="overwrite_or_ignore",
+                max_rows_per_group=tamano,
+            )
+            filas[tabla] = conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+
+        for tabla, columnas in DIMENSIONES.items():
+            esquema = _esquema(pa, columnas)
+            query = f"SELECT {', '.join(expr for _, _, expr in columnas)} FROM {tabla}"
+            pa.parquet.write_table(
+                pa.Table.from_batches(list(_lotes(pa, conn, query, esquema, tamano)), schema=esquema),
+                os.path.join(temporal, f"{tabla}.parquet"),
+            )
+            filas[tabla] = conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+    finally:
+        conn.close()
+
+    manifiesto = {
+        "exportado": datetime.now().isoformat(timespec="seconds"),
+        "base": os.path.abspath(ruta),
+        "version_base": cache.version_base(ruta),
+        "filas": filas,
+    }
+    with open(os.path.join(temporal, MANIFIESTO), "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, indent=2, ensure_ascii=False)
+
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(temporal, destino)
+    return manifiesto
+
+
+# ---------------------------------------------------------------------------
+# Consultas sobre la instantánea (dialecto DuckDB)
+# ---------------------------------------------------------------------------
+
+def _filtro_fecha(fecha_inicio, fecha_fin, alias=""):
+    """Filtro por partición (anio) y por fecha, con sus parámetros."""
+    filtro = f"{alias}anio BETWEEN ? AND ? AND {alias}fecha BETWEEN ? AND ?"
+    return filtro, [int(fecha_inicio[:4]), int(fecha_fin[:4]), fecha_inicio, fecha_fin]
+
+
+def consulta_caja_mensual(fecha_inicio, fecha_fin):
+    filtro, params = _filtro_fecha(fecha_inicio, fecha_fin)
+    query = f"""
+    SELECT
+        substr(fecha, 1, 7) as mes,
+        CAST(SUM(ingreso) AS BIGINT) as total_ingresos,
+        CAST(SUM(egreso) AS BIGINT) as total_egresos,
+        CAST(SUM(ingreso - egreso) AS BIGINT) as neto
+    FROM {ledger.TABLA_MOVIMIENTOS}
+    WHERE {filtro}
+    GROUP BY 1
+    ORDER BY 1
+    """
+    return query, tuple(params)
+
+
+def consulta_egresos_por_concepto(fecha_inicio, fecha_fin, k=consultas.TOP_EGRESOS):
+    filtro, params = _filtro_fecha(fecha_inicio, fecha_fin)
+    totales = f"""
+        SELECT COALESCE(concepto_id, 0) as concepto_id, CAST(SUM(egreso) AS BIGINT) as total_egreso
+        FROM {ledger.TABLA_MOVIMIENTOS}
+        WHERE {filtro}
+            AND egreso > 0
+        GROUP BY 1
+    """
+    return egresos.top_con_otros(totales, k), tuple(params)
+
+
+def expr_periodo(resolucion, columna="fecha"):
+    """Como series.expr_periodo, en funciones de DuckDB."""
+    if resolucion == "dia":
+        return columna
+    if resolucion == "semana":
+        return f"strftime(date_trunc('week', CAST({columna} AS DATE)), '%Y-%m-%d')"
+    if resolucion == "mes":
+        return f"substr({columna}, 1, 7) || '-01'"
+    raise ValueError(f"resolución desconocida: {resolucion}")
+
+
+def consulta_ingresos_socio(fecha_inicio, fecha_fin, socio_codigo=None, resolucion=None):
+    if consultas.es_todos(socio_codigo):
+        return consulta_pagina_socios(fecha_inicio, fecha_fin)
+
+    resolucion = resolucion or series.elegir_resolucion(fecha_inicio, fecha_fin)
+    filtro, params = _filtro_fecha(fecha_inicio, fecha_fin)
+    query = f"""
+    SELECT
+        {expr_periodo(resolucion)} as periodo,
+        CAST(SUM(entrada) AS BIGINT) as total_ingreso,
+        COUNT(DISTINCT fecha) as dias
+    FROM {cxc.TABLA_CXC}
+    WHERE codigo_socio = ?
+        AND {filtro}
+        AND entrada > 0
+    GROUP BY 1
+    ORDER BY 1
+    """
+    # DuckDB no deja reusar el alias fecha para el periodo: se renombra afuera
+    query = f"SELECT periodo as fecha, total_ingreso, dias FROM ({query})"
+    return query, (socio_codigo, *params)
+
+
+def consulta_pagina_socios(fecha_inicio, fecha_fin, despues=None, limite=consultas.TAMANO_PAGINA):
+    filtro, params = _filtro_fecha(fecha_inicio, fecha_fin, "c.")
+    having = ""
+    if despues is not None:
+        having = (
+            "HAVING SUM(c.entrada) < ? "
+            "OR (SUM(c.entrada) = ? AND COALESCE(c.codigo_socio, -1) > ?)"
+        )
+        params.extend([despues[0], despues[0], despues[1]])
+    query = f"""
+    SELECT
+        COALESCE(s.nombre, 'Socio ' || CAST(c.codigo_socio AS VARCHAR)) as socio,
+        CAST(SUM(c.entrada) AS BIGINT) as total_ingresos,
+        COALESCE(c.codigo_socio, -1) as codigo
+    FROM {cxc.TABLA_CXC} c
+    LEFT JOIN {cxc.TABLA_SOCIOS} s ON s.codigo = c.codigo_socio
+    WHERE {filtro}
+        AND c.entrada > 0
+    GROUP BY c.codigo_socio, s.nombre
+    {having}
+    ORDER BY total_ingresos DESC, codigo
+    LIMIT {int(limite)}
+    """
+    return query, tuple(params)
+
+
+def consulta_resumen_socios(fecha_inicio, fecha_fin, top=3):
+    filtro, params = _filtro_fecha(fecha_inicio, fecha_fin)
+    query = f"""
+    WITH totales AS (
+        SELECT SUM(entrada) as total
+        FROM {cxc.TABLA_CXC}
+        WHERE {filtro}
+            AND entrada > 0
+        GROUP BY codigo_socio
+    )
+    SELECT
+        CAST(COALESCE(SUM(total), 0) AS BIGINT) as total_ingresos,
+        COUNT(*) as socios_activos,
+        (SELECT CAST(COALESCE(SUM(total), 0) AS BIGINT)
+         FROM (SELECT total FROM totales ORDER BY total DESC LIMIT {int(top)})) as total_top
+    FROM totales
+    """
+    return query, tuple(params)
+
+
+class BackendParquet:
+    """Conexión DuckDB en memoria con vistas sobre la instantánea Parquet."""
+
+    def __init__(self, directorio=DIRECTORIO):
+        duckdb = _duckdb()
+        if not os.path.exists(os.path.join(directorio, MANIFIESTO)):
+            raise FileNotFoundError(
+                f"No hay instantánea en {directorio}; genérela con python -m qqa.columnar"
+            )
+        with open(os.path.join(directorio, MANIFIESTO), encoding="utf-8") as archivo:
+            self.manifiesto = json.load(archivo)
+        self.conn = duckdb.connect(database=":memory:")
+        self._lock = threading.Lock()
+        for tabla in PARTICIONADAS:
+            patron = os.path.join(directorio, tabla, "**", "*.parquet").replace("\\", "/")
+            self.conn.execute(
+                f"CREATE VIEW {tabla} AS "
+                f"SELECT * FROM read_parquet('{patron}', hive_partitioning = true)"
+            )
+        for tabla in DIMENSIONES:
+            archivo = os.path.join(directorio, f"{tabla}.parquet").replace("\\", "/")
+            self.conn.execute(f"CREATE VIEW {tabla} AS SELECT * FROM read_parquet('{archivo}')")
+
+    def leer(self, query, params=()):
+        """Ejecuta la consulta y devuelve un DataFrame."""
+        with self._lock:
+            cursor = self.conn.cursor()  # conexión propia para este hilo
+        try:
+            return cursor.execute(query, list(params)).df()
+        finally:
+            cursor.close()
+
+    def cerrar(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta los movimientos a Parquet particionado.")
+    parser.add_argument("db", nargs="?", default=DB_PATH)
+    parser.add_argument("--destino", default=DIRECTORIO)
+    parser.add_argument("--filas-por-bloque", type=int, default=FILAS_POR_BLOQUE)
+    args = parser.parse_args()
+    manifiesto = exportar(args.db, args.destino, args.filas_por_bloque)
+    for tabla, filas in manifiesto["filas"].items():
+        print(f"{tabla}: {filas} filas")
+
+
+if __name__ == "__main__":
+    main()
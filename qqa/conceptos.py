@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Diccionario de conceptos.
+
+Cada texto de detalle de las tablas caja, cxc, cxp, edr y er se lleva a una
+clave normalizada: sin tildes ni mayúsculas, sin signos, con abreviaturas
+expandidas, sin las palabras que calzan con los patrones a ignorar (números
+de recibo o factura) y pasada por el mapa de sinónimos. Cada clave recibe
+un id entero en la tabla conceptos y cada texto original queda apuntando a
+su id en conceptos_variantes, de modo que las tablas derivadas guardan el
+id y los agrupamientos por concepto se hacen sobre enteros. El nombre que
+se muestra de cada concepto es la forma más repetida entre sus textos
+originales una vez quitadas las palabras a ignorar: "Rbo de caja 154 Yamile
+Vera" y "Rbo de caja 169 Yamile Vera" se muestran como "Rbo de caja Yamile
+Vera", sin un número de recibo que solo es de una de las filas.
+
+Las reglas se leen de conceptos.json (o del archivo en QQA_CONCEPTOS):
+    {
+        "abreviaturas": {"rbo": "recibo"},
+        "ignorar": ["\\\\b\\\\w*\\\\d\\\\w*\\\\b"],
+        "sinonimos": {"saldo año anterior": ["vienen"]}
+    }
+Al cambiar el archivo cambia la versión del diccionario y en la siguiente
+sincronización se reconstruyen las tablas que guardan ids de concepto.
+"""
+
+import json
+import os
+import re
+import unicodedata
+import zlib
+from collections import Counter
+
+TABLA_CONCEPTOS = "conceptos"
+TABLA_VARIANTES = "conceptos_variantes"
+VERSION = 3
+
+RUTA_CONFIG = os.environ.get("QQA_CONCEPTOS", "conceptos.json")
+PATRON_FUENTES = re.compile(r"^(caja|cxc|cxp|edr|er)\d{4}$")
+# Nombre de la columna de texto libre según la tabla
+COLUMNAS_DETALLE = ["detalle", "comentario", "concepto"]
+
+
+def cargar_config(ruta=RUTA_CONFIG):
+    """Reglas de normalización; sin archivo solo se pliegan tildes y mayúsculas."""
+    try:
+        with open(ruta, encoding="utf-8") as archivo:
+            texto = archivo.read()
+    except FileNotFoundError:
+        texto = "{}"
+    return json.loads(texto)
+
+
+def plegar(texto):
+    """Minúsculas, sin tildes, sin signos y con un solo espacio entre palabras."""
+    descompuesto = unicodedata.normalize("NFKD", str(texto))
+    sin_tildes = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w]+", " ", sin_tildes.casefold()).split())
+
+
+def plegar_sql(texto):
+    """plegar() para SQL (qqa_plegar, la registra sync.refrescar); NULL sigue siendo NULL."""
+    return None if texto is None else plegar(texto)
+
+
+class Normalizador:
+    """Convierte un detalle en su clave de concepto según la configuración."""
+
+    def __init__(self, config=None):
+        config = {} if config is None else config
+        self.abreviaturas = {
+            plegar(corta): plegar(larga)
+            for corta, larga in config.get("abreviaturas", {}).items()
+        }
+        self.ignorar = [re.compile(patron) for patron in config.get("ignorar", [])]
+        self.sinonimos = {}
+        for canonico, variantes in config.get("sinonimos", {}).items():
+            for variante in variantes:
+                self.sinonimos[self._base(variante)] = self._base(canonico)
+        self.huella = zlib.crc32(json.dumps(config, sort_keys=True).encode("utf-8"))
+
+    def _base(self, texto):
+        palabras = [self.abreviaturas.get(p, p) for p in plegar(texto).split()]
+        resultado = " ".join(palabras)
+        for patron in self.ignorar:
+            resultado = patron.sub(" ", resultado)
+        return " ".join(resultado.split())
+
+    def etiqueta(self, texto):
+        """Texto original sin las palabras a ignorar, para mostrar."""
+        resultado = " ".join(str(texto).split())
+        for patron in self.ignorar:
+            resultado = patron.sub(" ", resultado)
+        # Quedan sueltos los signos que acompañaban al número ("#", "No.")
+        return " ".join(p for p in resultado.split() if any(c.isalnum() for c in p))
+
+    def __call__(self, texto):
+        if texto is None:
+            return None
+        base = self._base(texto)
+        return self.sinonimos.get(base, base) or None
+
+
+NORMALIZADOR = Normalizador(cargar_config())
+
+
+def clave(texto):
+    """Clave normalizada de un detalle; None si queda vacío."""
+    return NORMALIZADOR(texto)
+
+
+def version(base=VERSION):
+    """
+    Versión para sync que cambia con `base` y con las reglas de conceptos.
+
+    La usan el diccionario y las tablas que guardan ids de concepto, para
+    reconstruirse juntos cuando cambia conceptos.json o la VERSION del
+    diccionario.
+    """
+    return (base << 32) | zlib.crc32(str(VERSION).encode("ascii"), NORMALIZADOR.huella)
+
+
+def fuentes(conn):
+    nombres = [fila[0] for fila in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+    )]
+    return sorted(n for n in nombres if PATRON_FUENTES.match(n))
+
+
+def columna_detalle(columnas):
+    return next((c for c in COLUMNAS_DETALLE if c in columnas), None)
+
+
+def expr_id(columna="detalle"):
+    """Subconsulta SQL con el id del concepto de una columna de detalle."""
+    return f"(SELECT concepto_id FROM {TABLA_VARIANTES} WHERE texto = {columna})"
+
+
+def crear_conceptos(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLA_CONCEPTOS} (
+        id INTEGER PRIMARY KEY,
+        clave TEXT NOT NULL UNIQUE,
+        nombre TEXT NOT NULL
+    )
+    """)
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLA_VARIANTES} (
+        texto TEXT PRIMARY KEY,
+        concepto_id INTEGER
+    ) WITHOUT ROWID
+    """)
+
+
+def nombre_concepto(textos):
+    """
+    Nombre para mostrar de un concepto a partir de sus textos originales.
+
+    Es la etiqueta que más textos comparten; a igualdad, la más corta y
+    luego la primera en orden alfabético, para que no dependa del orden en
+    que llegaron los textos.
+    """
+    etiquetas = Counter(e for e in map(NORMALIZADOR.etiqueta, textos) if e)
+    return min(etiquetas, key=lambda e: (-etiquetas[e], len(e), e), default=None)
+
+
+def refrescar_conceptos(conn, tabla, meses=None):
+    """
+    Agrega al diccionario los textos nuevos de una tabla fuente.
+
+    Solo se normalizan los textos que aún no están en conceptos_variantes;
+    `meses` no se usa porque el diccionario nunca borra ids en uso. Los
+    conceptos que ganan textos recalculan su nombre con nombre_concepto.
+    """
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)
+    ).fetchone()
+    if not existe:
+        return
+    columna = columna_detalle([fila[1] for fila in conn.execute(f'PRAGMA table_info("{tabla}")')])
+    if columna is None:
+        return
+
+    nuevos = [fila[0] for fila in conn.execute(f"""
+    SELECT DISTINCT "{columna}" FROM "{tabla}"
+    WHERE "{columna}" IS NOT NULL
+        AND "{columna}" NOT IN (SELECT texto FROM {TABLA_VARIANTES})
+    """)]
+    ids = dict(conn.execute(f"SELECT clave, id FROM {TABLA_CONCEPTOS}"))
+    variantes = []
+    for texto in sorted(nuevos, key=str):
+        concepto = clave(texto)
+        # Los textos que quedan vacíos (solo números, signos) se guardan sin id
+        # para no volver a normalizarlos en cada sincronización
+        if concepto is not None and concepto not in ids:
+            ids[concepto] = conn.execute(
+                f"INSERT INTO {TABLA_CONCEPTOS} (clave, nombre) VALUES (?, ?)",
+                (concepto, concepto),
+            ).lastrowid
+        variantes.append((texto, ids.get(concepto)))
+    conn.executemany(
+        f"INSERT INTO {TABLA_VARIANTES} (texto, concepto_id) VALUES (?, ?)", variantes
+    )
+
+    tocados = {id for _, id in variantes if id is not None}
+    if not tocados:
+        return
+    textos = {}
+    for texto, id in conn.execute(f"SELECT texto, concepto_id FROM {TABLA_VARIANTES}"):
+        if id in tocados:
+            textos.setdefault(id, []).append(texto)
+    conn.executemany(
+        f"UPDATE {TABLA_CONCEPTOS} SET nombre = COALESCE(?, nombre) WHERE id = ?",
+        [(nombre_concepto(t), id) for id, t in textos.items()],
+    )
@@ -0,0 +1,554 @@
+# -*- coding: utf-8 -*-
+"""
+Saldos corridos y conciliación contra la columna saldo de las hojas.
+
+saldos_movimientos reúne las filas de caja, cxc y cxp con su entrada,
+salida y el saldo que trae la hoja. Con ellas:
+
+- los saldos corridos de cada cuenta (caja, cxc, cxp) y de cada socio en
+  cxc y cxp salen de SUM() OVER (...) en una sola pasada;
+- las discrepancias son las filas cuyo saldo no es el saldo de la fila
+  anterior (de la misma cuenta y socio, en el orden de las hojas) más la
+  entrada y menos la salida. Si la fila anterior es de otra hoja, lo que
+  no cuadra es la apertura del año;
+- saldos_mensuales guarda por cuenta, socio y mes la apertura, las
+  entradas, las salidas, los ajustes y el cierre. El saldo a una fecha es el cierre del
+  último mes anterior más las filas de su propio mes, así que no se vuelve
+  a sumar desde 2020.
+
+El saldo inicial de cada cuenta y socio es el que trae su primera fila
+(saldo menos su movimiento); se guarda como ajuste de esa fila. Las filas
+sin fecha entran en la conciliación pero no en los saldos por fecha.
+
+Uso desde la terminal:
+    python -m qqa.conciliacion contabilidad.db [--cuenta caja] [--desde ... --hasta ...]
+"""
+
+import argparse
+import re
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+from . import DB_PATH, cxc, ledger, rollup, socios_mensual
+
+TABLA_SALDOS_MOVIMIENTOS = "saldos_movimientos"
+TABLA_SALDOS_MENSUALES = "saldos_mensuales"
+VERSION = 3
+
+PATRON_CUENTAS = re.compile(r"^(caja|cxc|cxp)\d{4}$")
+CUENTAS = ["caja", "cxc", "cxp"]
+# En caja el saldo es de la cuenta; en cxc y cxp cada socio lleva el suyo
+CUENTAS_POR_SOCIO = ["cxc", "cxp"]
+
+# codigo_socio de los cortes de la cuenta completa y de las filas sin socio
+TOTAL = -2
+SIN_CODIGO = socios_mensual.SIN_CODIGO
+
+# Diferencia mínima (en pesos) que se reporta como discrepancia
+TOLERANCIA = 1
+
+
+def fuentes(conn):
+    nombres = [fila[0] for fila in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+    )]
+    return sorted(n for n in nombres if PATRON_CUENTAS.match(n)) + cxc.fuentes_socios(conn)
+
+
+def crear_saldos(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLA_SALDOS_MOVIMIENTOS} (
+        cuenta TEXT NOT NULL,
+        fuente TEXT NOT NULL,
+        fila INTEGER NOT NULL,
+        mes TEXT NOT NULL,
+        fecha TEXT,
+        codigo_socio INTEGER,
+        socio_nombre TEXT,
+        detalle TEXT,
+        entrada INTEGER NOT NULL,
+        salida INTEGER NOT NULL,
+        saldo INTEGER,
+        ajuste INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (fuente, fila)
+    )
+    """)
+    conn.execute(f"""
+    CREATE INDEX IF NOT EXISTS idx_saldos_movimientos_fuente_mes
+        ON {TABLA_SALDOS_MOVIMIENTOS} (fuente, mes)
+    """)
+    # Filas del mes de una fecha: de la cuenta completa o de un socio
+    conn.execute(f"""
+    CREATE INDEX IF NOT EXISTS idx_saldos_movimientos_fecha
+        ON {TABLA_SALDOS_MOVIMIENTOS} (cuenta, fecha)
+    """)
+    conn.execute(f"""
+    CREATE INDEX IF NOT EXISTS idx_saldos_movimientos_socio
+        ON {TABLA_SALDOS_MOVIMIENTOS} (cuenta, codigo_socio, fecha)
+    """)
+    # Primera fila de cada socio en el orden de las hojas (saldo inicial)
+    conn.execute(f"""
+    CREATE INDEX IF NOT EXISTS idx_saldos_movimientos_orden
+        ON {TABLA_SALDOS_MOVIMIENTOS} (cuenta, codigo_socio, fuente, fila)
+    """)
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLA_SALDOS_MENSUALES} (
+        cuenta TEXT NOT NULL,
+        codigo_socio INTEGER NOT NULL,
+        mes TEXT NOT NULL,
+        entradas INTEGER NOT NULL,
+        salidas INTEGER NOT NULL,
+        ajustes INTEGER NOT NULL,
+        apertura INTEGER NOT NULL,
+        cierre INTEGER NOT NULL,
+        PRIMARY KEY (cuenta, codigo_socio, mes)
+    )
+    """)
+
+
+def select_fuente_saldos(conn, tabla):
+    """
+    SELECT que lleva una hoja al esquema de saldos_movimientos.
+
+    Devuelve None si la hoja no trae saldo o no trae montos (cxc2020 y
+    cxp2022 solo listan saldos por socio): no hay nada que conciliar.
+    """
+    columnas = ledger.columnas_tabla(conn, tabla)
+    cuenta = PATRON_CUENTAS.match(tabla).group(1)
+    saldo = next((c for c in (ledger.columna(columnas, n) for n in ("saldo", "valor")) if c), None)
+    montos = ledger.columnas_montos(columnas)
+    movimiento = ledger.columna(columnas, "movimiento")
+    if saldo is None or (montos is None and movimiento is None):
+        return None
+
+    if montos is not None:
+        entrada, salida = [f'COALESCE("{c}", 0)' for c in montos]
+    else:
+        # cxp2023 trae un solo monto con signo
+        entrada = f'MAX(COALESCE("{movimiento}", 0), 0)'
+        salida = f'MAX(-COALESCE("{movimiento}", 0), 0)'
+
+    socio = None
+    if cuenta in CUENTAS_POR_SOCIO:
+        socio = next((c for c in (ledger.columna(columnas, n) for n in cxc.COLUMNAS_SOCIO) if c), None)
+    if socio is None:
+        codigo = "NULL" if cuenta not in CUENTAS_POR_SOCIO else str(SIN_CODIGO)
+        nombre = "NULL"
+    else:
+        codigo, nombre = cxc.expr_socio(f'"{socio}"')
+        codigo = f"COALESCE({codigo}, {SIN_CODIGO})"
+
+    fecha = ledger.expr_fecha_iso() if "fecha" in columnas else "NULL"
+    detalle = next((f'"{c}"' for c in ("detalle", "comentario", "concepto") if c in columnas), "NULL")
+    return f"""
+    SELECT
+        '{cuenta}' as cuenta,
+        '{tabla}' as fuente,
+        rowid as fila,
+        COALESCE(substr({fecha}, 1, 7), '') as mes,
+        {fecha} as fecha,
+        {codigo} as codigo_socio,
+        {nombre} as socio_nombre,
+        {detalle} as detalle,
+        {entrada} as entrada,
+        {salida} as salida,
+        "{saldo}" as saldo
+    FROM "{tabla}"
+    """
+
+
+def refrescar_saldos(conn, tabla, meses=None):
+    """
+    Sincroniza las filas de una hoja y los cortes mensuales de su cuenta.
+
+    Los cortes se recalculan desde el primer mes que cambió: el cierre de
+    un mes arrastra a todos los siguientes. Si cambió una tabla de socios,
+    se vuelven a cruzar los nombres y, si alguno cambió de código, se
+    recalculan cxc y cxp completas.
+    """
+    if cxc.PATRON_SOCIOS.match(tabla):
+        codigo = f"""COALESCE((
+            SELECT s.codigo FROM {cxc.TABLA_SOCIOS} s
+            WHERE s.clave = {cxc.clave_nombre(TABLA_SALDOS_MOVIMIENTOS + '.socio_nombre')}
+        ), {SIN_CODIGO})"""
+        cursor = conn.execute(f"""
+        UPDATE {TABLA_SALDOS_MOVIMIENTOS}
+        SET codigo_socio = {codigo}
+        WHERE socio_nombre IS NOT NULL AND codigo_socio <> {codigo}
+        """)
+        if cursor.rowcount == 0:
+            return
+        for cuenta in CUENTAS_POR_SOCIO:
+            _recalcular_ajustes(conn, cuenta)
+            _recalcular_cortes(conn, cuenta)
+        return
+
+    cuenta = PATRON_CUENTAS.match(tabla).group(1)
+    select = select_fuente_saldos(conn, tabla) if ledger.tabla_existe(conn, tabla) else None
+    insert = (
+        f"INSERT INTO {TABLA_SALDOS_MOVIMIENTOS} (cuenta, fuente, fila, mes, fecha, codigo_socio, "
+        f"socio_nombre, detalle, entrada, salida, saldo) "
+    )
+    if meses is None:
+        # Los cortes cambian desde el primer mes de la hoja, antes o después de cargarla
+        cambiados = {_primer_mes(conn, tabla)}
+        conn.execute(f"DELETE FROM {TABLA_SALDOS_MOVIMIENTOS} WHERE fuente = ?", (tabla,))
+        if select is not None:
+            conn.execute(insert + select)
+        cambiados.add(_primer_mes(conn, tabla))
+    else:
+        for bloque in ledger.bloques(list(meses)):
+            marcas = ", ".join("?" * len(bloque))
+            conn.execute(
+                f"DELETE FROM {TABLA_SALDOS_MOVIMIENTOS} WHERE fuente = ? AND mes IN ({marcas})",
+                (tabla, *bloque),
+            )
+            if select is not None:
+                conn.execute(insert + f"SELECT * FROM ({select}) WHERE mes IN ({marcas})", bloque)
+        cambiados = set(meses)
+    # Una fila nueva (o borrada) puede cambiar cuál es la primera de un socio
+    cambiados |= _recalcular_ajustes(conn, cuenta)
+    cambiados.discard(None)
+    cambiados.discard("")
+    if cambiados:
+        _recalcular_cortes(conn, cuenta, min(cambiados))
+
+
+def _primer_mes(conn, tabla):
+    return conn.execute(
+        f"SELECT MIN(mes) FROM {TABLA_SALDOS_MOVIMIENTOS} WHERE fuente = ? AND mes <> ''", (tabla,)
+    ).fetchone()[0]
+
+
+def _recalcular_ajustes(conn, cuenta):
+    """
+    Pone el saldo inicial como ajuste de la primera fila de cada socio (o de la cuenta).
+
+    Devuelve los meses de las filas cuyo ajuste cambió.
+    """
+    nuevos = {
+        (fuente, fila): (mes, ajuste)
+        for fuente, fila, mes, ajuste in conn.execute(f"""
+        SELECT m.fuente, m.fila, m.mes, m.saldo - (m.entrada - m.salida)
+        FROM (SELECT DISTINCT codigo_socio FROM {TABLA_SALDOS_MOVIMIENTOS} WHERE cuenta = :cuenta) s
+        JOIN {TABLA_SALDOS_MOVIMIENTOS} m ON m.rowid = (
+            SELECT rowid FROM {TABLA_SALDOS_MOVIMIENTOS}
+            WHERE cuenta = :cuenta AND codigo_socio IS s.codigo_socio AND saldo IS NOT NULL
+            ORDER BY fuente, fila
+            LIMIT 1
+        )
+        """, {"cuenta": cuenta})
+        if ajuste
+    }
+    viejos = {
+        (fuente, fila): (mes, ajuste)
+        for fuente, fila, mes, ajuste in conn.execute(f"""
+        SELECT fuente, fila, mes, ajuste FROM {TABLA_SALDOS_MOVIMIENTOS}
+        WHERE cuenta = ? AND ajuste <> 0
+        """, (cuenta,))
+    }
+    cambiados = set()
+    for clave in viejos.keys() - nuevos.keys():
+        conn.execute(
+            f"UPDATE {TABLA_SALDOS_MOVIMIENTOS} SET ajuste = 0 WHERE fuente = ? AND fila = ?", clave
+        )
+        cambiados.add(viejos[clave][0])
+    for clave, (mes, ajuste) in nuevos.items():
+        if viejos.get(clave) != (mes, ajuste):
+            conn.execute(
+                f"UPDATE {TABLA_SALDOS_MOVIMIENTOS} SET ajuste = ? WHERE fuente = ? AND fila = ?",
+                (ajuste, *clave),
+            )
+            cambiados.add(mes)
+    return cambiados
+
+
+def _recalcular_cortes(conn, cuenta, desde=None):
+    """
+    Recalcula los cortes de `cuenta` desde el mes `desde` (todos con None).
+
+    Cada corte parte del último cierre anterior a `desde` de su socio y
+    acumula los meses siguientes con SUM() OVER.
+    """
+    desde = desde or ""
+    conn.execute(
+        f"DELETE FROM {TABLA_SALDOS_MENSUALES} WHERE cuenta = ? AND mes >= ?", (cuenta, desde)
+    )
+    por_socio = ""
+    if cuenta in CUENTAS_POR_SOCIO:
+        por_socio = f"""
+            UNION ALL
+            SELECT codigo_socio, mes, entrada, salida, ajuste
+            FROM {TABLA_SALDOS_MOVIMIENTOS}
+            WHERE cuenta = :cuenta AND mes >= :desde AND mes <> ''
+        """
+    conn.execute(f"""
+    INSERT INTO {TABLA_SALDOS_MENSUALES}
+        (cuenta, codigo_socio, mes, entradas, salidas, ajustes, apertura, cierre)
+    WITH netos AS (
+        SELECT codigo, mes, SUM(entrada) as entradas, SUM(salida) as salidas, SUM(ajuste) as ajustes,
+            SUM(entrada - salida + ajuste) as neto
+        FROM (
+            SELECT {TOTAL} as codigo, mes, entrada, salida, ajuste
+            FROM {TABLA_SALDOS_MOVIMIENTOS}
+            WHERE cuenta = :cuenta AND mes >= :desde AND mes <> ''
+            {por_socio}
+        )
+        GROUP BY codigo, mes
+    ),
+    -- Los cortes que quedaron son anteriores a :desde; MAX(mes) elige el último
+    base AS (
+        SELECT codigo_socio as codigo, cierre, MAX(mes)
+        FROM {TABLA_SALDOS_MENSUALES}
+        WHERE cuenta = :cuenta
+        GROUP BY codigo_socio
+    )
+    SELECT
+        :cuenta,
+        n.codigo,
+        n.mes,
+        n.entradas,
+        n.salidas,
+        n.ajustes,
+        COALESCE(b.cierre, 0) + SUM(n.neto) OVER w - n.neto,
+        COALESCE(b.cierre, 0) + SUM(n.neto) OVER w
+    FROM netos n
+    LEFT JOIN base b ON b.codigo = n.codigo
+    WINDOW w AS (PARTITION BY n.codigo ORDER BY n.mes)
+    """, {"cuenta": cuenta, "desde": desde})
+
+
+# ---------------------------------------------------------------------------
+# Consultas
+# ---------------------------------------------------------------------------
+
+def _validar_cuenta(cuenta):
+    if cuenta not in CUENTAS:
+        raise ValueError(f"Cuenta desconocida: {cuenta} (use {', '.join(CUENTAS)})")
+
+
+def _saldo_al(cuenta, fecha, total):
+    """
+    Expresión y parámetros del saldo al cierre de `fecha` para el socio s.codigo.
+
+    Lee un corte por el índice de saldos_mensuales y las filas del mes de
+    la fecha hasta ese día: no depende de cuánta historia haya.
+    """
+    filtro = "" if total else " AND codigo_socio = s.codigo"
+    expresion = f"""(
+        COALESCE((
+            SELECT cierre FROM {TABLA_SALDOS_MENSUALES}
+            WHERE cuenta = ? AND codigo_socio = s.codigo AND mes < ?
+            ORDER BY mes DESC
+            LIMIT 1
+        ), 0)
+        + COALESCE((
+            SELECT SUM(entrada - salida + ajuste) FROM {TABLA_SALDOS_MOVIMIENTOS}
+            WHERE cuenta = ?{filtro} AND fecha BETWEEN ? AND ?
+        ), 0)
+    )"""
+    return expresion, [cuenta, fecha[:7], cuenta, fecha[:7] + "-01", fecha]
+
+
+def _flujo(cuenta, fecha_inicio, fecha_fin, columna, total):
+    """Suma de entradas, salidas o ajustes del rango: cortes en los meses completos, filas en los extremos."""
+    filtro = "" if total else " AND codigo_socio = s.codigo"
+    meses, tramos = rollup.partir_rango(fecha_inicio, fecha_fin)
+    partes, params = [], []
+    if meses:
+        partes.append(f"""COALESCE((
+            SELECT SUM({columna}s) FROM {TABLA_SALDOS_MENSUALES}
+            WHERE cuenta = ? AND codigo_socio = s.codigo AND mes BETWEEN ? AND ?
+        ), 0)""")
+        params.extend([cuenta, *meses])
+    for desde, hasta in tramos:
+        partes.append(f"""COALESCE((
+            SELECT SUM({columna}) FROM {TABLA_SALDOS_MOVIMIENTOS}
+            WHERE cuenta = ?{filtro} AND fecha BETWEEN ? AND ?
+        ), 0)""")
+        params.extend([cuenta, desde, hasta])
+    return "(" + (" + ".join(partes) or "0") + ")", params
+
+
+def _consulta_saldos(cuenta, fecha_inicio, fecha_fin, socios, params_socios, total):
+    _validar_cuenta(cuenta)
+    anterior = (date.fromisoformat(fecha_inicio) - timedelta(days=1)).isoformat()
+    columnas, params = [], list(params_socios)
+    for nombre, (expresion, valores) in [
+        ("apertura", _saldo_al(cuenta, anterior, total)),
+        ("ajustes", _flujo(cuenta, fecha_inicio, fecha_fin, "ajuste", total)),
+        ("entradas", _flujo(cuenta, fecha_inicio, fecha_fin, "entrada", total)),
+        ("salidas", _flujo(cuenta, fecha_inicio, fecha_fin, "salida", total)),
+        ("cierre", _saldo_al(cuenta, fecha_fin, total)),
+    ]:
+        columnas.append(f"{expresion} as {nombre}")
+        params.extend(valores)
+    query = f"""
+    WITH s(codigo) AS ({socios})
+    SELECT
+        s.codigo as codigo_socio,
+        so.nombre as socio,
+        {', '.join(columnas)}
+    FROM s
+    LEFT JOIN {cxc.TABLA_SOCIOS} so ON so.codigo = s.codigo
+    ORDER BY s.codigo
+    """
+    return query, tuple(params)
+
+
+def consulta_saldos(cuenta, fecha_inicio, fecha_fin, socio_codigo=None):
+    """
+    Apertura, ajustes, entradas, salidas y cierre de una cuenta en el rango (una fila).
+
+    La apertura es el saldo al cierre del día anterior a fecha_inicio y el
+    cierre el saldo al final de fecha_fin; ajustes es el saldo inicial de
+    las primeras filas que caen en el rango, así que apertura + ajustes +
+    entradas - salidas = cierre. Con socio_codigo son los de ese socio
+    (solo cxc y cxp).
+    """
+    if socio_codigo is not None and cuenta not in CUENTAS_POR_SOCIO:
+        raise ValueError(f"La cuenta {cuenta} no lleva saldos por socio")
+    total = socio_codigo is None
+    return _consulta_saldos(cuenta, fecha_inicio, fecha_fin, "SELECT ?",
+                            [TOTAL if total else socio_codigo], total)
+
+
+def consulta_saldos_socios(cuenta, fecha_inicio, fecha_fin):
+    """Apertura, ajustes, entradas, salidas y cierre de cada socio de cxc o cxp en el rango."""
+    if cuenta not in CUENTAS_POR_SOCIO:
+        raise ValueError(f"La cuenta {cuenta} no lleva saldos por socio")
+    socios = f"""
+        SELECT DISTINCT codigo_socio FROM {TABLA_SALDOS_MENSUALES}
+        WHERE cuenta = ? AND codigo_socio <> {TOTAL} AND mes <= ?
+    """
+    return _consulta_saldos(cuenta, fecha_inicio, fecha_fin, socios,
+                            [cuenta, fecha_fin[:7]], False)
+
+
+def consulta_saldos_corridos(cuenta, fecha_inicio, fecha_fin, socio_codigo=None):
+    """
+    Filas del rango con el saldo corrido calculado y el que trae la hoja.
+
+    El saldo corrido parte de la apertura del rango (desde los cortes) y
+    suma las filas en orden de fecha con SUM() OVER.
+    """
+    _validar_cuenta(cuenta)
+    total = socio_codigo is None
+    anterior = (date.fromisoformat(fecha_inicio) - timedelta(days=1)).isoformat()
+    apertura, params = _saldo_al(cuenta, anterior, total)
+    filtro = "" if total else " AND m.codigo_socio = ?"
+    query = f"""
+    WITH s(codigo) AS (SELECT ?),
+    inicio AS (SELECT {apertura} as apertura FROM s)
+    SELECT
+        m.fecha,
+        m.fuente,
+        m.fila,
+        m.codigo_socio,
+        m.detalle,
+        m.entrada,
+        m.salida,
+        m.saldo as saldo_hoja,
+        inicio.apertura + SUM(m.entrada - m.salida + m.ajuste)
+            OVER (ORDER BY m.fecha, m.fuente, m.fila) as saldo_calculado
+    FROM {TABLA_SALDOS_MOVIMIENTOS} m, inicio
+    WHERE m.cuenta = ?{filtro} AND m.fecha BETWEEN ? AND ?
+    ORDER BY m.fecha, m.fuente, m.fila
+    """
+    params = [TOTAL if total else socio_codigo, *params, cuenta]
+    if not total:
+        params.append(socio_codigo)
+    params.extend([fecha_inicio, fecha_fin])
+    return query, tuple(params)
+
+
+def consulta_discrepancias(cuenta=None):
+    """
+    Filas cuyo saldo no cuadra con la fila anterior de su cuenta y socio.
+
+    saldo_esperado es el saldo anterior más la entrada menos la salida;
+    descuadre es cuánto se ha alejado el saldo de la hoja del que resulta
+    de sumar los movimientos desde la primera fila. tipo es 'apertura'
+    cuando la fila anterior es de la hoja de otro año.
+    """
+    filtro, params = "", ()
+    if cuenta is not None:
+        _validar_cuenta(cuenta)
+        filtro, params = " AND cuenta = ?", (cuenta,)
+    query = f"""
+    SELECT
+        cuenta,
+        fuente,
+        fila,
+        fecha,
+        codigo_socio,
+        detalle,
+        entrada,
+        salida,
+        saldo as saldo_hoja,
+        saldo_esperado,
+        saldo - saldo_esperado as diferencia,
+        saldo - saldo_calculado as descuadre,
+        CASE WHEN fuente_anterior <> fuente THEN 'apertura' ELSE 'fila' END as tipo
+    FROM (
+        SELECT
+            *,
+            LAG(saldo) OVER w + entrada - salida as saldo_esperado,
+            LAG(fuente) OVER w as fuente_anterior,
+            SUM(entrada - salida + ajuste) OVER w as saldo_calculado
+        FROM {TABLA_SALDOS_MOVIMIENTOS}
+        WHERE saldo IS NOT NULL{filtro}
+        WINDOW w AS (PARTITION BY cuenta, codigo_socio ORDER BY fuente, fila)
+    )
+    WHERE ABS(saldo - saldo_esperado) >= {TOLERANCIA}
+    ORDER BY cuenta, fuente, fila
+    """
+    return query, params
+
+
+# ---------------------------------------------------------------------------
+# Terminal
+# ---------------------------------------------------------------------------
+
+def main():
+    from . import sync
+
+    parser = argparse.ArgumentParser(description="Conciliación de saldos de caja, cxc y cxp.")
+    parser.add_argument("db", nargs="?", default=DB_PATH)
+    parser.add_argument("--cuenta", choices=CUENTAS, help="solo esta cuenta")
+    parser.add_argument("--desde", help="inicio del rango de saldos (AAAA-MM-DD)")
+    parser.add_argument("--hasta", help="fin del rango de saldos (AAAA-MM-DD)")
+    parser.add_argument("--filas", type=int, default=20, help="discrepancias a mostrar por cuenta")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    descuadrados = []
+    try:
+        sync.refrescar(conn)
+        for cuenta in [args.cuenta] if args.cuenta else CUENTAS:
+            filas = conn.execute(*consulta_discrepancias(cuenta)).fetchall()
+            print(f"== {cuenta}: {len(filas)} discrepancias")
+            for fila in filas[:args.filas]:
+                _, fuente, numero, fecha, socio, detalle, _, _, hoja, esperado, diferencia, _, tipo = fila
+                socio = "" if socio is None else f" socio {socio}"
+                print(f"  {fuente} fila {numero} ({fecha or 'sin fecha'}{socio}) [{tipo}] "
+                      f"saldo {hoja:,} esperado {esperado:,} diferencia {diferencia:,}: {detalle}")
+            if args.desde and args.hasta:
+                apertura, ajustes, entradas, salidas, cierre = conn.execute(
+                    *consulta_saldos(cuenta, args.desde, args.hasta)
+                ).fetchone()[2:]
+                cuadra = apertura + ajustes + entradas - salidas == cierre
+                if not cuadra:
+                    descuadrados.append(cuenta)
+                print(f"  {args.desde} a {args.hasta}: apertura {apertura:,} + ajustes {ajustes:,} "
+                      f"+ entradas {entradas:,} - salidas {salidas:,} "
+                      f"{'=' if cuadra else '!='} cierre {cierre:,}")
+    finally:
+        conn.close()
+    if descuadrados:
+        sys.exit(f"Los saldos de {', '.join(descuadrados)} no cuadran con sus movimientos")
+
+
+if __name__ == "__main__":
+    main()
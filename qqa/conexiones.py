@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de conexiones de solo lectura a contabilidad.db.
+
+El tablero comparte un único pool entre todas las sesiones de Streamlit
+(st.cache_resource). Cada conexión se abre una sola vez con los pragmas
+ajustados y conserva su caché de páginas y de sentencias preparadas entre
+consultas, en lugar de abrir y cerrar la base en cada llamada.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+from . import DB_PATH
+
+TAMANO_POOL = 4
+MMAP_MB = 256
+CACHE_MB = 32
+# Sentencias preparadas que cada conexión guarda para reutilizar
+SENTENCIAS_EN_CACHE = 256
+
+
+def activar_wal(conn):
+    """
+    Pasa la base a modo WAL para que los lectores no se bloqueen con las cargas.
+
+    Requiere una conexión con permiso de escritura; el modo queda guardado
+    en el archivo, así que las conexiones de solo lectura lo heredan.
+    """
+    return conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+
+
+def abrir_solo_lectura(ruta=DB_PATH, mmap_mb=MMAP_MB, cache_mb=CACHE_MB):
+    uri = f"file:{pathname2url(os.path.abspath(ruta))}?mode=ro"
+    conn = sqlite3.connect(
+        uri,
+        uri=True,
+        check_same_thread=False,  # el pool garantiza un solo hilo a la vez
+        cached_statements=SENTENCIAS_EN_CACHE,
+    )
+    conn.execute(f"PRAGMA mmap_size={mmap_mb * 1024 * 1024}")
+    conn.execute(f"PRAGMA cache_size={-cache_mb * 1024}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+class PoolConexiones:
+    """Pool pequeño y seguro entre hilos de conexiones de solo lectura."""
+
+    def __init__(self, ruta=DB_PATH, tamano=TAMANO_POOL, mmap_mb=MMAP_MB,
+                 cache_mb=CACHE_MB, espera=30):
+        self.ruta = ruta
+        self.tamano = tamano
+        self.mmap_mb = mmap_mb
+        self.cache_mb = cache_mb
+        self.espera = espera
+        # LIFO: reutilizamos primero la conexión con la caché más caliente
+        self._libres = queue.LifoQueue()
+        self._abiertas = 0
+        self._lock = threading.Lock()
+
+    def _tomar(self):
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._abiertas < self.tamano:
+                self._abiertas += 1
+                crear = True
+            else:
+                crear = False
+        if not crear:
+            return self._libres.get(timeout=self.espera)
+        try:
+            return abrir_solo_lectura(self.ruta, self.mmap_mb, self.cache_mb)
+        except Exception:
+            with self._lock:
+                self._abiertas -= 1
+            raise
+
+    @contextmanager
+    def conexion(self):
+        """Presta una conexión del pool y la devuelve al terminar."""
+        conn = self._tomar()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._libres.put(conn)
+
+    def cerrar(self):
+        with self._lock:
+            while True:
+                try:
+                    self._libres.get_nowait().close()
+                except queue.Empty:
+                    break
+                self._abiertas -= 1
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+SQL de las tres vistas del tablero.
+
+Cada función devuelve (query, params) listos para run_query. Las vistas de
+caja pueden leer de otra tabla de movimientos (parámetro `movimientos`),
+lo que usa consulta_tablero para que las tres vistas salgan de una sola
+lectura de movimientos_caja.
+"""
+
+from . import busqueda, conceptos, cxc, egresos, ledger, rollup, series, socios_mensual
+
+TOP_EGRESOS = 10
+TAMANO_PAGINA = 25
+
+# Columnas de cada vista, en el orden en que las devuelve su consulta
+COLUMNAS = {
+    "caja": ["mes", "total_ingresos", "total_egresos", "neto"],
+    "egresos": ["detalle", "total_egreso", "otros"],
+    "socios": ["socio", "total_ingresos", "codigo"],
+    "socio": ["fecha", "total_ingreso", "dias"],
+}
+
+
+def consulta_caja_mensual(fecha_inicio, fecha_fin, movimientos=ledger.TABLA_MOVIMIENTOS):
+    return rollup.consulta_caja_mensual(fecha_inicio, fecha_fin, movimientos)
+
+
+def consulta_egresos_por_concepto(fecha_inicio, fecha_fin, k=TOP_EGRESOS, movimientos=ledger.TABLA_MOVIMIENTOS):
+    """Los k conceptos con más egreso y la fila "Otros" (ver egresos.top_con_otros)."""
+    return egresos.consulta_egresos_por_concepto(fecha_inicio, fecha_fin, k, movimientos)
+
+
+def es_todos(socio_codigo):
+    return socio_codigo == "Todos" or socio_codigo is None
+
+
+def consulta_ingresos_socio(fecha_inicio, fecha_fin, socio_codigo=None, resolucion=None):
+    """
+    Ingresos por socio, o la serie de un socio agrupada por día, semana o mes.
+
+    Sin `resolucion` se elige con series.elegir_resolucion, de modo que la
+    serie nunca trae más puntos de los que caben en el gráfico; `dias` cuenta
+    los días con ingresos de cada periodo. Para "Todos" devuelve la primera
+    página del ranking (ver consulta_pagina_socios).
+    """
+    if es_todos(socio_codigo):
+        return consulta_pagina_socios(fecha_inicio, fecha_fin)
+
+    resolucion = resolucion or series.elegir_resolucion(fecha_inicio, fecha_fin)
+    periodo = series.expr_periodo(resolucion)
+    # Búsqueda por rango en idx_cxc_socio_fecha
+    query = f"""
+    SELECT
+        {periodo} as fecha,
+        SUM(entrada) as total_ingreso,
+        COUNT(DISTINCT fecha) as dias
+    FROM {cxc.TABLA_CXC}
+    WHERE codigo_socio = ?
+        AND fecha BETWEEN ? AND ?
+        AND entrada > 0
+    GROUP BY 1
+    ORDER BY 1
+    """
+    return query, (socio_codigo, fecha_inicio, fecha_fin)
+
+
+def consulta_pagina_socios(fecha_inicio, fecha_fin, despues=None, limite=TAMANO_PAGINA):
+    """
+    Una página del ranking de socios por ingresos, paginada por keyset.
+
+    `despues` es (total_ingresos, codigo) de la última fila de la página
+    anterior. El orden es total descendente y código ascendente, así las
+    páginas no se solapan ni saltan filas aunque haya empates.
+    """
+    params = [fecha_inicio, fecha_fin]
+    having = ""
+    if despues is not None:
+        having = "HAVING total_ingresos < ? OR (total_ingresos = ? AND codigo > ?)"
+        params.extend([despues[0], despues[0], despues[1]])
+    query = f"""
+    SELECT
+        COALESCE(s.nombre, 'Socio ' || c.codigo_socio) as socio,
+        SUM(c.entrada) as total_ingresos,
+        COALESCE(c.codigo_socio, -1) as codigo
+    FROM {cxc.TABLA_CXC} c
+    LEFT JOIN {cxc.TABLA_SOCIOS} s ON s.codigo = c.codigo_socio
+    WHERE c.fecha BETWEEN ? AND ?
+        AND c.entrada > 0
+    GROUP BY c.codigo_socio
+    {having}
+    ORDER BY total_ingresos DESC, codigo
+    LIMIT {int(limite)}
+    """
+    return query, tuple(params)
+
+
+def consulta_resumen_socios(fecha_inicio, fecha_fin, top=3):
+    """
+    Totales del ranking completo (total, socios activos, suma del top) en una fila.
+
+    Los totales por socio salen de socios_mensual y de los tramos sueltos.
+    """
+    estadisticas, params = socios_mensual.consulta_estadisticas_socios(fecha_inicio, fecha_fin)
+    query = f"""
+    WITH totales AS (
+        SELECT total
+        FROM ({estadisticas})
+    )
+    SELECT
+        COALESCE(SUM(total), 0) as total_ingresos,
+        COUNT(*) as socios_activos,
+        (SELECT COALESCE(SUM(total), 0)
+         FROM (SELECT total FROM totales ORDER BY total DESC LIMIT {int(top)})) as total_top
+    FROM totales
+    """
+    return query, params
+
+
+def consulta_estadisticas_socio(fecha_inicio, fecha_fin, socio_codigo):
+    """Momentos de los ingresos diarios de un socio en el rango (una fila o ninguna)."""
+    return socios_mensual.consulta_estadisticas_socios(fecha_inicio, fecha_fin, socio_codigo)
+
+
+def consulta_buscar_socios(texto="", despues=None, limite=TAMANO_PAGINA):
+    """
+    Página del padrón de socios ordenado por nombre, filtrado por nombre o código.
+
+    `despues` es (nombre, codigo) de la última fila de la página anterior;
+    el orden coincide con idx_socios_nombre (nombre, rowid = codigo).
+    """
+    filtros, params = ["nombre IS NOT NULL"], []
+    # Se pliega igual que la clave (cxc.clave_nombre) para que calcen las tildes
+    texto = conceptos.plegar(texto or "")
+    if texto:
+        filtros.append("(clave LIKE ? OR CAST(codigo AS TEXT) LIKE ?)")
+        params.extend([f"%{texto}%", f"{texto}%"])
+    if despues is not None:
+        filtros.append("(nombre, codigo) > (?, ?)")
+        params.extend(despues)
+    query = f"""
+    SELECT codigo, nombre
+    FROM {cxc.TABLA_SOCIOS}
+    WHERE {' AND '.join(filtros)}
+    ORDER BY nombre, codigo
+    LIMIT {int(limite)}
+    """
+    return query, tuple(params)
+
+
+def consulta_buscar_movimientos(texto, fecha_inicio=None, fecha_fin=None, socio_codigo=None,
+                                despues=None, limite=TAMANO_PAGINA):
+    """
+    Página de movimientos de todas las tablas cuyo detalle calza con `texto`.
+
+    Ver qqa.busqueda; `despues` es (rango, id) de la última fila de la página anterior.
+    """
+    return busqueda.consulta_buscar_movimientos(texto, limite, fecha_inicio, fecha_fin,
+                                                socio_codigo, despues)
+
+
+def consulta_socios():
+    query = f"""
+    SELECT codigo, nombre
+    FROM {cxc.TABLA_SOCIOS}
+    WHERE nombre IS NOT NULL
+    ORDER BY nombre
+    """
+    return query, ()
+
+
+def _envolver(vista, query):
+    """Lleva el resultado de una vista a las columnas comunes (vista, c1..c4)."""
+    columnas = COLUMNAS[vista]
+    relleno = columnas + ["NULL"] * (4 - len(columnas))
+    # Sin alias, el UNION ALL tomaría los nombres de la primera vista
+    genericas = ", ".join(f"{c} as c{i}" for i, c in enumerate(relleno, 1))
+    return f"SELECT '{vista}' as vista, {genericas} FROM ({query})"
+
+
+def vista_socios(socio_codigo):
+    return "socios" if es_todos(socio_codigo) else "socio"
+
+
+def consulta_tablero(caja=None, egresos=None, socios=None):
+    """
+    Una sola sentencia con las vistas pedidas del tablero.
+
+    caja y egresos son (fecha_inicio, fecha_fin); socios es
+    (fecha_inicio, fecha_fin, socio_codigo). Los movimientos sueltos de los
+    meses incompletos que necesitan ambas vistas se leen una vez en la CTE
+    `movs` (los meses completos salen de los cubos mensuales); el resultado
+    trae la columna `vista` y las columnas genéricas c1..c4 (ver COLUMNAS).
+    """
+    rangos = []
+    if caja:
+        rangos.extend(rollup.partir_rango(*caja)[1])
+    if egresos:
+        rangos.extend(rollup.partir_rango(*egresos)[1])
+
+    partes, params = [], []
+    if rangos:
+        filtro = " OR ".join("fecha BETWEEN ? AND ?" for _ in rangos)
+        cte = f"""
+        WITH movs AS MATERIALIZED (
+            SELECT fecha, ingreso, egreso, concepto_id
+            FROM {ledger.TABLA_MOVIMIENTOS}
+            WHERE {filtro}
+        )
+        """
+        for rango in rangos:
+            params.extend(rango)
+    else:
+        cte = ""
+
+    if caja:
+        query, p = consulta_caja_mensual(*caja, movimientos="movs")
+        partes.append(_envolver("caja", query))
+        params.extend(p)
+    if egresos:
+        query, p = consulta_egresos_por_concepto(*egresos, movimientos="movs")
+        partes.append(_envolver("egresos", query))
+        params.extend(p)
+    if socios:
+        query, p = consulta_ingresos_socio(*socios)
+        partes.append(_envolver(vista_socios(socios[2]), query))
+        params.extend(p)
+
+    if not partes:
+        raise ValueError("consulta_tablero necesita al menos una vista")
+    return cte + "\nUNION ALL\n".join(partes), tuple(params)
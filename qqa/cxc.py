@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Cuentas por cobrar unificadas y dimensión de socios.
+
+cxc_movimientos reúne todas las tablas cxcYYYY con un mismo esquema
+(codigo_socio, fecha ISO, entrada, salida, saldo, detalle, concepto_id) e
+índices por (codigo_socio, fecha) y por fecha. socios consolida socios2020-socios2024:
+para cada código se queda el nombre del año más reciente.
+"""
+
+import re
+
+from . import conceptos, ledger
+
+TABLA_CXC = "cxc_movimientos"
+TABLA_SOCIOS = "socios"
+VERSION_CXC = 3
+VERSION_SOCIOS = 2
+
+PATRON_CXC = re.compile(r"^cxc(\d{4})$")
+PATRON_SOCIOS = re.compile(r"^socios(\d{4})$")
+
+# Nombres que ha tenido la columna del socio según el año
+COLUMNAS_SOCIO = ["codigo_socio", "codigo_cliente", "socio", "codigo"]
+COLUMNAS_NOMBRE = ["nombre", "socio"]
+
+
+def _tablas(conn, patron):
+    nombres = [fila[0] for fila in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+    )]
+    return sorted(n for n in nombres if patron.match(n))
+
+
+def fuentes_cxc(conn):
+    return _tablas(conn, PATRON_CXC)
+
+
+def fuentes_socios(conn):
+    return _tablas(conn, PATRON_SOCIOS)
+
+
+def clave_nombre(columna):
+    """
+    Nombre normalizado para cruzar socios que solo vienen por nombre.
+
+    Es conceptos.plegar (sin tildes ni mayúsculas) para que "ÁLVAREZ" y
+    "alvarez" den la misma clave; lower() de SQLite solo pliega ASCII.
+    """
+    return f"qqa_plegar({columna})"
+
+
+def expr_socio(columna):
+    """
+    Expresiones (código, nombre) de una columna de socio.
+
+    Algunos años (cxc2020) traen el nombre del socio en lugar del código:
+    el código se busca en socios por clave y el nombre se guarda para volver
+    a cruzarlo cuando cambie el padrón.
+    """
+    codigo = f"""CASE WHEN typeof({columna}) IN ('integer', 'real')
+            THEN CAST({columna} AS INTEGER)
+            ELSE (SELECT s.codigo FROM {TABLA_SOCIOS} s
+                  WHERE s.clave = {clave_nombre(columna)}) END"""
+    nombre = f"CASE WHEN typeof({columna}) = 'text' THEN {columna} END"
+    return codigo, nombre
+
+
+# ---------------------------------------------------------------------------
+# Dimensión de socios
+# ---------------------------------------------------------------------------
+
+def crear_socios(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLA_SOCIOS} (
+        codigo INTEGER PRIMARY KEY,
+        nombre TEXT,
+        clave TEXT,
+        anio INTEGER NOT NULL
+    )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_socios_clave ON {TABLA_SOCIOS} (clave)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_socios_nombre ON {TABLA_SOCIOS} (nombre)")
+
+
+def refrescar_socios(conn, tabla=None, meses=None):
+    """Reconstruye la dimensión completa; son pocas filas y cambian poco."""
+    conn.execute(f"DELETE FROM {TABLA_SOCIOS}")
+    for fuente in fuentes_socios(conn):
+        anio = int(PATRON_SOCIOS.match(fuente).group(1))
+        columnas = ledger.columnas_tabla(conn, fuente)
+        nombre = next((c for c in COLUMNAS_NOMBRE if c in columnas), None)
+        # socios2020 no trae códigos: sus nombres se cruzan por clave cuando
+        # el socio aparece en un año posterior
+        if nombre is None or "codigo" not in columnas:
+            continue
+        # Los años se recorren en orden, así gana el nombre más reciente
+        conn.execute(f"""
+        INSERT INTO {TABLA_SOCIOS} (codigo, nombre, clave, anio)
+        SELECT CAST(codigo AS INTEGER), {nombre}, {clave_nombre(nombre)}, {anio}
+        FROM "{fuente}"
+        WHERE codigo IS NOT NULL AND {nombre} IS NOT NULL
+        GROUP BY CAST(codigo AS INTEGER)
+        ON CONFLICT (codigo) DO UPDATE SET
+            nombre = excluded.nombre,
+            clave = excluded.clave,
+            anio = excluded.anio
+        """)
+
+
+# ---------------------------------------------------------------------------
+# Cuentas por cobrar
+# ---------------------------------------------------------------------------
+
+def crear_cxc(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLA_CXC} (
+        fuente TEXT NOT NULL,
+        anio INTEGER NOT NULL,
+        fila INTEGER NOT NULL,
+        codigo_socio INTEGER,
+        socio_nombre TEXT,
+        fecha TEXT,
+        entrada INTEGER NOT NULL DEFAULT 0,
+        salida INTEGER NOT NULL DEFAULT 0,
+        saldo INTEGER,
+        detalle TEXT,
+        concepto_id INTEGER,
+        PRIMARY KEY (fuente, fila)
+    )
+    """)
+    # Detalle de un socio: búsqueda por rango dentro del índice
+    conn.execute(f"""
+    CREATE INDEX IF NOT EXISTS idx_cxc_socio_fecha
+        ON {TABLA_CXC} (codigo_socio, fecha, entrada)
+    """)
+    # Todos los socios: filtro por fecha sin tocar la tabla
+    conn.execute(f"""
+    CREATE INDEX IF NOT EXISTS idx_cxc_fecha
+        ON {TABLA_CXC} (fecha, codigo_socio, entrada)
+    """)
+
+
+def select_fuente_cxc(conn, tabla):
+    """SELECT que normaliza una tabla cxcYYYY al esquema de cxc_movimientos."""
+    columnas = ledger.columnas_tabla(conn, tabla)
+    anio = int(PATRON_CXC.match(tabla).group(1))
+    socio = next((c for c in COLUMNAS_SOCIO if c in columnas), None)
+
+    codigo, nombre = ("NULL", "NULL") if socio is None else expr_socio(f'"{socio}"')
+    fecha = ledger.expr_fecha_iso() if "fecha" in columnas else "NULL"
+    entrada = 'COALESCE("entrada", 0)' if "entrada" in columnas else "0"
+    salida = 'COALESCE("salida", 0)' if "salida" in columnas else "0"
+    saldo = next((f'"{c}"' for c in ("saldo", "valor") if c in columnas), "NULL")
+    detalle = '"detalle"' if "detalle" in columnas else "NULL"
+    concepto = conceptos.expr_id(detalle) if "detalle" in columnas else "NULL"
+    return f"""
+    SELECT
+        '{tabla}' as fuente,
+        {anio} as anio,
+        rowid as fila,
+        {codigo} as codigo_socio,
+        {nombre} as socio_nombre,
+        {fecha} as fecha,
+        {entrada} as entrada,
+        {salida} as salida,
+        {saldo} as saldo,
+        {detalle} as detalle,
+        {concepto} as concepto_id
+    FROM "{tabla}"
+    """
+
+
+def refrescar_cxc(conn, tabla, meses=None):
+    """
+    Sincroniza en cxc_movimientos las filas de una tabla cxcYYYY.
+
+    Si la tabla es de socios, solo vuelve a resolver los códigos de las
+    filas que vienen identificadas por nombre.
+    """
+    if PATRON_SOCIOS.match(tabla):
+        conn.execute(f"""
+        UPDATE {TABLA_CXC}
+        SET codigo_socio = (
+            SELECT s.codigo FROM {TABLA_SOCIOS} s
+            WHERE s.clave = {clave_nombre(TABLA_CXC + '.socio_nombre')}
+        )
+        WHERE socio_nombre IS NOT NULL
+        """)
+        return
+
+    insert = (
+        f"INSERT INTO {TABLA_CXC} (fuente, anio, fila, codigo_socio, socio_nombre, "
+        f"fecha, entrada, salida, saldo, detalle, concepto_id) "
+    )
+    if meses is None:
+        conn.execute(f"DELETE FROM {TABLA_CXC} WHERE fuente = ?", (tabla,))
+        if ledger.tabla_existe(conn, tabla):
+            conn.execute(insert + select_fuente_cxc(conn, tabla))
+        return
+
+    for bloque in ledger.bloques(list(meses)):
+        marcas = ", ".join("?" * len(bloque))
+        conn.execute(
+            f"DELETE FROM {TABLA_CXC} "
+            f"WHERE fuente = ? AND COALESCE(substr(fecha, 1, 7), '') IN ({marcas})",
+            (tabla, *bloque),
+        )
+        conn.execute(
+            insert
+            + f"SELECT * FROM ({select_fuente_cxc(conn, tabla)}) "
+            f"WHERE COALESCE(substr(fecha, 1, 7), '') IN ({marcas})",
+            bloque,
+        )
+
+
+def fuentes_cxc_y_socios(conn):
+    return fuentes_cxc(conn) + fuentes_socios(conn)
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Consultas del tablero para una asociación, sin Streamlit.
+
+Datos arma la SQL (qqa.consultas, o qqa.columnar con QQA_BACKEND=parquet),
+la ejecuta en el pool de la asociación, pasa por su caché, registra la
+instrumentación y devuelve DataFrames. La usan caja_asociados_QQA.py y la
+API HTTP (qqa.api), y se puede importar para pruebas de carga sin levantar
+la interfaz. Los errores se propagan: cada cliente decide cómo mostrarlos.
+"""
+
+import os
+import time
+
+import pandas as pd
+
+from . import columnar, conciliacion, consultas, instrumentacion
+from .instrumentacion import INSTRUMENTACION, etapa
+
+BACKEND_PARQUET = os.environ.get("QQA_BACKEND", "sqlite") == "parquet"
+
+# Consulta de cada vista de consulta_tablero, para precargar la caché
+CONSTRUCTORES = {
+    "caja": consultas.consulta_caja_mensual,
+    "egresos": consultas.consulta_egresos_por_concepto,
+    "socios": consultas.consulta_ingresos_socio,
+}
+
+
+class Datos:
+    """Consultas de una asociación (registro qqa.asociaciones)."""
+
+    def __init__(self, asociacion, parquet=BACKEND_PARQUET):
+        self.asociacion = asociacion
+        self.parquet = parquet
+        # Las consultas analíticas van al backend elegido; el padrón siempre a SQLite
+        self.sql = columnar if parquet else consultas
+
+    def leer_sql(self, query, params=(), parquet=False):
+        if parquet:
+            with etapa("parquet"):
+                return self.asociacion.backend_parquet().leer(query, params)
+        filas, columnas = self._ejecutar(query, params)
+        with etapa("conversion"):
+            return pd.DataFrame.from_records(filas, columns=columnas, coerce_float=True)
+
+    def _ejecutar(self, query, params=()):
+        """Filas y nombres de columna de una consulta en SQLite."""
+        with self.asociacion.pool().conexion() as conn:  # vuelve al pool al terminar
+            if instrumentacion.ACTIVO:
+                INSTRUMENTACION.capturar_plan(conn, query, params)
+            with etapa("sql"):
+                cursor = conn.execute(query, params)
+                return cursor.fetchall(), [c[0] for c in cursor.description]
+
+    def consultar(self, query, params=(), parquet=False):
+        """Resultado de la consulta desde la caché de la asociación o la base."""
+        cache = self.asociacion.cache()
+        if not instrumentacion.ACTIVO:
+            return cache.obtener(query, params, lambda: self.leer_sql(query, params, parquet))
+        calculadas = []
+
+        def calcular():
+            calculadas.append(True)
+            return self.leer_sql(query, params, parquet)
+
+        inicio = time.perf_counter()
+        df = cache.obtener(query, params, calcular)
+        INSTRUMENTACION.registrar_consulta(query, params, len(df),
+                                           time.perf_counter() - inicio, not calculadas)
+        return df
+
+    def _analitica(self, consulta):
+        query, params = consulta
+        return self.consultar(query, params, parquet=self.parquet)
+
+    # Vistas del tablero -------------------------------------------------------
+
+    def caja_mensual(self, fecha_inicio, fecha_fin):
+        return self._analitica(self.sql.consulta_caja_mensual(fecha_inicio, fecha_fin))
+
+    def top_egresos(self, fecha_inicio, fecha_fin, k=consultas.TOP_EGRESOS):
+        """(DataFrame de los k conceptos con más egreso, total de "Otros")."""
+        df = self._analitica(self.sql.consulta_egresos_por_concepto(fecha_inicio, fecha_fin, k))
+        otros = df["otros"] == 1
+        top = df.loc[~otros, ["detalle", "total_egreso"]].reset_index(drop=True)
+        return top, int(df.loc[otros, "total_egreso"].sum())
+
+    def ingresos_socio(self, fecha_inicio, fecha_fin, socio_codigo=None, resolucion=None):
+        return self._analitica(
+            self.sql.consulta_ingresos_socio(fecha_inicio, fecha_fin, socio_codigo, resolucion)
+        )
+
+    def pagina_socios(self, fecha_inicio, fecha_fin, despues=None):
+        return self._analitica(self.sql.consulta_pagina_socios(fecha_inicio, fecha_fin, despues))
+
+    def resumen_socios(self, fecha_inicio, fecha_fin):
+        return self._analitica(self.sql.consulta_resumen_socios(fecha_inicio, fecha_fin))
+
+    def estadisticas_socio(self, fecha_inicio, fecha_fin, socio_codigo):
+        """Momentos diarios del socio en el rango (de socios_mensual, siempre en SQLite)."""
+        return self.consultar(*consultas.consulta_estadisticas_socio(fecha_inicio, fecha_fin, socio_codigo))
+
+    def buscar_socios(self, texto="", despues=None):
+        return self.consultar(*consultas.consulta_buscar_socios(texto, despues))
+
+    def buscar_movimientos(self, texto, fecha_inicio=None, fecha_fin=None, socio_codigo=None, despues=None):
+        return self.consultar(*consultas.consulta_buscar_movimientos(
+            texto, fecha_inicio, fecha_fin, socio_codigo, despues
+        ))
+
+    # Saldos y conciliación (siempre SQLite: la instantánea no trae saldos) -----
+
+    def saldos(self, cuenta, fecha_inicio, fecha_fin, socio_codigo=None):
+        return self.consultar(*conciliacion.consulta_saldos(cuenta, fecha_inicio, fecha_fin, socio_codigo))
+
+    def saldos_socios(self, cuenta, fecha_inicio, fecha_fin):
+        return self.consultar(*conciliacion.consulta_saldos_socios(cuenta, fecha_inicio, fecha_fin))
+
+    def saldos_corridos(self, cuenta, fecha_inicio, fecha_fin, socio_codigo=None):
+        return self.consultar(*conciliacion.consulta_saldos_corridos(cuenta, fecha_inicio, fecha_fin,
+                                                                     socio_codigo))
+
+    def discrepancias(self, cuenta=None):
+        return self.consultar(*conciliacion.consulta_discrepancias(cuenta))
+
+    # Sentencia conjunta ---------------------------------------------------------
+
+    def tablero(self, caja=None, egresos=None, socios=None):
+        """Las vistas pedidas en una sola sentencia de SQLite; {vista: DataFrame}."""
+        query, params = consultas.consulta_tablero(caja, egresos, socios)
+        filas, _ = self._ejecutar(query, params)
+        por_vista = {}
+        for fila in filas:
+            por_vista.setdefault(fila[0], []).append(fila[1:])
+        # Cada vista se arma con sus propias filas: separarlas de un solo
+        # DataFrame dejaría en float las columnas enteras que otra vista rellena con NULL
+        vistas = {}
+        with etapa("conversion"):
+            for vista, columnas in consultas.COLUMNAS.items():
+                registros = [fila[:len(columnas)] for fila in por_vista.get(vista, [])]
+                vistas[vista] = pd.DataFrame.from_records(registros, columns=columnas, coerce_float=True)
+        # El UNION ALL no garantiza el orden de cada vista; lo reponemos
+        vistas["caja"] = vistas["caja"].sort_values("mes", ignore_index=True)
+        vistas["egresos"] = vistas["egresos"].sort_values(["otros", "total_egreso", "detalle"],
+                                                          ascending=[True, False, True], ignore_index=True)
+        vistas["socios"] = vistas["socios"].sort_values(["total_ingresos", "codigo"], ascending=[False, True],
+                                                        ignore_index=True)
+        vistas["socio"] = vistas["socio"].sort_values("fecha", ignore_index=True)
+        return vistas
+
+    def precargar(self, pedidos):
+        """
+        Calcula juntas las vistas de `pedidos` que aún no están en caché.
+
+        pedidos es {"caja": (inicio, fin), "egresos": (inicio, fin),
+        "socios": (inicio, fin, socio)}; cada resultado queda en la caché con
+        la clave de su consulta individual. Devuelve las vistas calculadas.
+        """
+        if self.parquet:
+            return []  # la sentencia conjunta es solo de SQLite
+        cache = self.asociacion.cache()
+        pendientes = {
+            nombre: params for nombre, params in pedidos.items()
+            if not cache.contiene(*CONSTRUCTORES[nombre](*params))
+        }
+        if not pendientes:
+            return []
+        vistas = self.tablero(**pendientes)
+        for nombre, params in pendientes.items():
+            vista = consultas.vista_socios(params[2]) if nombre == "socios" else nombre
+            cache.guardar(*CONSTRUCTORES[nombre](*params), vistas[vista])
+        return list(pendientes)
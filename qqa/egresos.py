@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Top de egresos por concepto.
+
+egresos_mensuales guarda por mes, tabla fuente y concepto la suma de los
+egresos. Para un rango se suman esas filas en los meses completos y solo
+se leen movimientos sueltos en los meses de los extremos (igual que
+caja_mensual). La misma consulta numera los conceptos con ROW_NUMBER() y
+suma los que quedan fuera de los K mayores en una fila "Otros", así que
+devuelve a lo más K + 1 filas y los porcentajes son sobre el total de
+egresos del rango y no solo sobre los K conceptos mostrados.
+"""
+
+from . import conceptos, ledger, rollup
+
+TABLA_EGRESOS_MENSUALES = "egresos_mensuales"
+VERSION = 1
+ETIQUETA_OTROS = "Otros"
+# Los egresos sin detalle van al concepto 0, que no está en el diccionario
+ETIQUETA_SIN_DETALLE = "(sin detalle)"
+
+
+def crear_egresos_mensuales(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLA_EGRESOS_MENSUALES} (
+        mes TEXT NOT NULL,
+        fuente TEXT NOT NULL,
+        concepto_id INTEGER NOT NULL,
+        total_egreso INTEGER NOT NULL,
+        movimientos INTEGER NOT NULL,
+        PRIMARY KEY (mes, fuente, concepto_id)
+    )
+    """)
+
+
+def refrescar_egresos_mensuales(conn, tabla, meses=None):
+    """Recalcula desde movimientos_caja los meses de una fuente (todos con meses=None)."""
+    # Los egresos sin detalle van al concepto 0, que no está en el diccionario
+    agregado = f"""
+    INSERT INTO {TABLA_EGRESOS_MENSUALES} (mes, fuente, concepto_id, total_egreso, movimientos)
+    SELECT
+        substr(fecha, 1, 7) as mes,
+        fuente,
+        COALESCE(concepto_id, 0) as concepto,
+        SUM(egreso),
+        COUNT(*)
+    FROM {ledger.TABLA_MOVIMIENTOS}
+    WHERE fuente = ?
+        AND egreso > 0
+    """
+    if meses is None:
+        conn.execute(f"DELETE FROM {TABLA_EGRESOS_MENSUALES} WHERE fuente = ?", (tabla,))
+        conn.execute(agregado + " GROUP BY mes, concepto", (tabla,))
+        return
+
+    for bloque in ledger.bloques([m for m in meses if m]):
+        marcas = ", ".join("?" * len(bloque))
+        conn.execute(
+            f"DELETE FROM {TABLA_EGRESOS_MENSUALES} WHERE fuente = ? AND mes IN ({marcas})",
+            (tabla, *bloque),
+        )
+        conn.execute(
+            agregado + f" AND substr(fecha, 1, 7) IN ({marcas}) GROUP BY mes, concepto",
+            (tabla, *bloque),
+        )
+
+
+def consulta_egresos_por_concepto(fecha_inicio, fecha_fin, k, movimientos=ledger.TABLA_MOVIMIENTOS):
+    """SQL y parámetros de los k conceptos con más egreso en el rango y la fila "Otros"."""
+    meses, tramos = rollup.partir_rango(fecha_inicio, fecha_fin)
+    partes, params = [], []
+    if meses:
+        partes.append(f"""
+        SELECT concepto_id, total_egreso as egreso
+        FROM {TABLA_EGRESOS_MENSUALES}
+        WHERE mes BETWEEN ? AND ?
+        """)
+        params.extend(meses)
+    for desde, hasta in tramos:
+        partes.append(f"""
+        SELECT COALESCE(concepto_id, 0) as concepto_id, egreso
+        FROM {movimientos}
+        WHERE fecha BETWEEN ? AND ?
+            AND egreso > 0
+        """)
+        params.extend((desde, hasta))
+
+    totales = f"""
+        SELECT concepto_id, SUM(egreso) as total_egreso
+        FROM ({" UNION ALL ".join(partes)})
+        GROUP BY concepto_id
+    """
+    return top_con_otros(totales, k), tuple(params)
+
+
+def top_con_otros(totales, k):
+    """
+    Los k conceptos con más egreso y, si sobran, una fila con lo que suman los demás.
+
+    `totales` es un SELECT de (concepto_id, total_egreso); sirve igual en
+    SQLite y en DuckDB (qqa.columnar). Las columnas son detalle,
+    total_egreso y otros (1 en la fila "Otros"), de mayor a menor egreso
+    con "Otros" al final.
+    """
+    k = int(k)
+    # Cada concepto del top es su propio grupo; los demás caen juntos en el grupo NULL
+    return f"""
+    SELECT
+        CASE WHEN MIN(r.puesto) <= {k} THEN COALESCE(MAX(c.nombre), '{ETIQUETA_SIN_DETALLE}')
+             ELSE '{ETIQUETA_OTROS}' END as detalle,
+        CAST(SUM(r.total_egreso) AS BIGINT) as total_egreso,
+        CASE WHEN MIN(r.puesto) <= {k} THEN 0 ELSE 1 END as otros
+    FROM (
+        SELECT concepto_id, total_egreso,
+            ROW_NUMBER() OVER (ORDER BY total_egreso DESC, concepto_id) as puesto
+        FROM ({totales})
+    ) r
+    LEFT JOIN {conceptos.TABLA_CONCEPTOS} c ON c.id = r.concepto_id
+    GROUP BY CASE WHEN r.puesto <= {k} THEN r.puesto END
+    ORDER BY otros, total_egreso DESC, detalle
+    """
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Formato de las tablas del tablero.
+
+Las columnas se mantienen numéricas y el formato de moneda o porcentaje lo
+aplica st.dataframe en el navegador mediante column_config, en lugar de
+convertir cada celda a texto en Python con .apply(lambda ...).
+"""
+
+FORMATO_MONEDA = "dollar"
+FORMATO_PORCENTAJE = "%.1f%%"
+FORMATO_FECHA = "YYYY-MM-DD"
+
+
+def config_columnas(moneda=(), porcentaje=(), fecha=()):
+    """column_config para st.dataframe con los formatos de cada tipo de columna."""
+    import streamlit as st
+
+    config = {}
+    for columna in moneda:
+        config[columna] = st.column_config.NumberColumn(format=FORMATO_MONEDA)
+    for columna in porcentaje:
+        config[columna] = st.column_config.NumberColumn(format=FORMATO_PORCENTAJE)
+    for columna in fecha:
+        config[columna] = st.column_config.DateColumn(format=FORMATO_FECHA)
+    return config
+
+
+def con_porcentaje(df, columna, nombre="porcentaje", total=None):
+    """
+    Agrega la participación de cada fila (0-100) como columna numérica.
+
+    `total` permite calcularla sobre el total completo cuando df es una página.
+    """
+    total = df[columna].sum() if total is None else total
+    return df.assign(**{nombre: df[columna] / total * 100 if total else 0.0})
+
+
+def mostrar_tabla(df, moneda=(), porcentaje=(), fecha=()):
+    """st.dataframe con formato de moneda/porcentaje/fecha sin copiar los datos a texto."""
+    import streamlit as st
+
+    st.dataframe(
+        df,
+        column_config=config_columnas(moneda, porcentaje, fecha),
+        use_container_width=True,
+    )
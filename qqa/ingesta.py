@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+"""
+Carga de hojas contables (CSV o XLSX) a contabilidad.db.
+
+Cada archivo (u hoja de un libro XLSX) va a la tabla de su nombre, por
+ejemplo caja2025.csv -> caja2025, y sus columnas se llevan al esquema
+canónico de su tipo (caja, cxc, cxp, er, edr, socios): los encabezados se
+comparan sin mayúsculas ni espacios sobrantes contra los alias de ALIAS, y
+ingesta.json (o el archivo en QQA_INGESTA) fija por año lo que los alias no
+resuelven:
+    {
+        "caja2020": {"formato_fecha": "%d/%m/%Y"},
+        "cxp2022": {"columnas": {"codigo_socio": "codigo"}}
+    }
+Las columnas que no son del esquema se conservan con su nombre normalizado,
+y las tablas que no son de esos tipos (bancos2022, ...) se cargan tal cual
+salvo la fecha.
+
+Las fechas se guardan una sola vez como 'yyyy-mm-dd' y los montos como
+enteros. Los archivos se leen por lotes y se escriben con executemany, todos
+en una sola transacción: si algo falla no queda nada a medio cargar. Al
+terminar se sincronizan las tablas derivadas (qqa.sync).
+
+Uso desde la terminal:
+    python -m qqa.ingesta caja2025.csv cxc2025.csv --db contabilidad.db
+    python -m qqa.ingesta libro2024.xlsx --agregar
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import date, datetime
+from functools import lru_cache
+from itertools import islice
+
+from . import DB_PATH, conexiones, sync
+from .conceptos import plegar
+
+RUTA_MAPEOS = os.environ.get("QQA_INGESTA", "ingesta.json")
+TAMANO_LOTE = 5000
+
+PATRON_TABLA = re.compile(r"^(caja|cxc|cxp|er|edr|socios)(\d{4})$")
+
+# Esquema canónico de cada tipo de hoja, en el orden de la tabla
+CANONICAS = {
+    "caja": ["fecha", "codigo_socio", "categoria", "detalle", "entrada", "salida", "saldo"],
+    "cxc": ["codigo_socio", "fecha", "detalle", "entrada", "salida", "saldo"],
+    "cxp": ["codigo_socio", "fecha", "detalle", "entrada", "salida", "saldo"],
+    "er": ["fecha", "codigo_socio", "detalle", "entrada", "salida", "saldo"],
+    "edr": ["fecha", "categoria", "detalle", "entrada", "salida", "saldo"],
+    # socios2020 es una hoja de aportes: nombre, fecha, detalle y saldo
+    "socios": ["codigo", "nombre", "fecha", "detalle", "saldo"],
+}
+
+# Encabezados que ha tenido cada columna canónica; gana el primero presente
+ALIAS = {
+    "fecha": ["fecha"],
+    "codigo_socio": ["codigo_socio", "codigo_cliente", "socio", "codigo"],
+    "categoria": ["categoria"],
+    "detalle": ["detalle", "comentario", "concepto"],
+    "entrada": ["entrada", "abono", "ingreso"],
+    "salida": ["salida", "prestamo", "egreso"],
+    "saldo": ["saldo", "valor"],
+    "codigo": ["codigo"],
+    "nombre": ["nombre", "socio"],
+}
+
+TEXTO = {"fecha", "categoria", "detalle", "nombre"}
+
+PATRON_DDMMYYYY = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+
+
+class ErrorIngesta(ValueError):
+    """Archivo o valor que no se puede cargar; el mensaje indica dónde."""
+
+
+def cargar_mapeos(ruta=RUTA_MAPEOS):
+    """Reglas por tabla; sin archivo se usan solo los alias."""
+    try:
+        with open(ruta, encoding="utf-8") as archivo:
+            return json.load(archivo)
+    except FileNotFoundError:
+        return {}
+
+
+def normalizar_encabezado(nombre):
+    """'Entrada ' -> 'entrada', 'Cédula de ciudadanía' -> 'cedula_de_ciudadania'."""
+    return plegar(nombre).replace(" ", "_")
+
+
+@lru_cache(maxsize=65536)
+def _fecha_texto(texto, formato):
+    if formato:
+        return datetime.strptime(texto, formato).date().isoformat()
+    coincidencia = PATRON_DDMMYYYY.match(texto)
+    if coincidencia:
+        dia, mes, anio = (int(g) for g in coincidencia.groups())
+        return date(anio, mes, dia).isoformat()
+    return date.fromisoformat(texto[:10]).isoformat()
+
+
+def normalizar_fecha(valor, formato=None):
+    """Fecha 'yyyy-mm-dd' de un datetime, 'yyyy-mm-dd[ hh:mm:ss]' o 'dd/mm/yyyy'."""
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date().isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    texto = str(valor).strip()
+    if not texto:
+        return None
+    return _fecha_texto(texto, formato)
+
+
+def normalizar_monto(valor, decimal=","):
+    """Monto entero; acepta '$ 1.234.567' o '1.234,5' (o '1,234.5' con decimal='.')."""
+    if valor is None or isinstance(valor, int):
+        return valor
+    if isinstance(valor, float):
+        return round(valor)
+    try:
+        return int(valor)  # el caso común en un CSV: '1500'
+    except ValueError:
+        pass
+    texto = str(valor).strip().replace("$", "").replace(" ", "")
+    if not texto:
+        return None
+    miles = "." if decimal == "," else ","
+    entero, _, fraccion = texto.partition(decimal)
+    partes = entero.split(miles)
+    # '1.234.567' trae separadores de miles; '12.0' (como lo escribe Python) no
+    if len(partes) > 1 and all(len(p) == 3 for p in partes[1:]):
+        entero = "".join(partes)
+    return round(float(entero + "." + fraccion if fraccion else entero))
+
+
+def normalizar_texto(valor):
+    if valor is None:
+        return None
+    texto = str(valor).strip()
+    return texto or None
+
+
+def _crudo(valor):
+    """Columnas fuera del esquema: solo se recortan textos y se llevan fechas a ISO."""
+    if isinstance(valor, str):
+        return valor.strip() or None
+    if isinstance(valor, (date, datetime)):
+        return normalizar_fecha(valor)
+    return valor
+
+
+class Mapeo:
+    """Cómo llevar los encabezados de una hoja al esquema canónico de su tabla."""
+
+    def __init__(self, tabla, encabezados, reglas=None):
+        coincidencia = PATRON_TABLA.match(tabla)
+        reglas = reglas or {}
+        self.tabla = tabla
+        self.tipo = coincidencia.group(1) if coincidencia else None
+        self.formato_fecha = reglas.get("formato_fecha")
+        self.decimal = reglas.get("decimal", ",")
+
+        normalizados = [normalizar_encabezado(e) for e in encabezados]
+        fijas = {c: normalizar_encabezado(e) for c, e in reglas.get("columnas", {}).items()}
+        usados = set()
+        self.columnas = []  # (nombre en la tabla, posición en la hoja, tipo de valor)
+        # Las demás tablas (bancos2022, ...) solo normalizan la fecha, si la tienen
+        for canonica in CANONICAS.get(self.tipo, ["fecha"]):
+            candidatos = [fijas[canonica]] if canonica in fijas else ALIAS[canonica]
+            if canonica in fijas and fijas[canonica] not in normalizados:
+                raise ErrorIngesta(f"{tabla}: no hay columna '{fijas[canonica]}' para {canonica}")
+            for candidato in candidatos:
+                if candidato in normalizados and candidato not in usados:
+                    usados.add(candidato)
+                    self.columnas.append((canonica, normalizados.index(candidato), self._tipo(canonica)))
+                    break
+        # Lo que no está en el esquema se guarda tal cual, con el nombre normalizado
+        for posicion, nombre in enumerate(normalizados):
+            if nombre and nombre not in usados:
+                usados.add(nombre)
+                self.columnas.append((nombre, posicion, "crudo"))
+
+    @staticmethod
+    def _tipo(canonica):
+        if canonica == "fecha":
+            return "fecha"
+        return "texto" if canonica in TEXTO else "monto"
+
+    def crear_tabla(self, conn, reemplazar=True):
+        if reemplazar:
+            conn.execute(f'DROP TABLE IF EXISTS "{self.tabla}"')
+        tipos = {"fecha": "TEXT", "texto": "TEXT", "monto": "INTEGER", "crudo": ""}
+        columnas = ", ".join(f'"{nombre}" {tipos[tipo]}'.rstrip() for nombre, _, tipo in self.columnas)
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{self.tabla}" ({columnas})')
+
+    def insert(self):
+        nombres = ", ".join(f'"{nombre}"' for nombre, _, _ in self.columnas)
+        marcas = ", ".join("?" * len(self.columnas))
+        return f'INSERT INTO "{self.tabla}" ({nombres}) VALUES ({marcas})'
+
+    def _conversion(self, nombre, tipo):
+        """Función que normaliza un valor crudo de la columna."""
+        if tipo == "fecha":
+            return lambda valor: normalizar_fecha(valor, self.formato_fecha)
+        if tipo == "texto":
+            return normalizar_texto
+        if tipo == "monto" and nombre == "codigo_socio":
+            return self._codigo_socio
+        if tipo == "monto":
+            return lambda valor: normalizar_monto(valor, self.decimal)
+        return _crudo
+
+    def _codigo_socio(self, valor):
+        # cxc2020 trae el nombre del socio donde después va el código
+        if isinstance(valor, str) and not valor.strip().isdigit():
+            return normalizar_texto(valor)
+        return normalizar_monto(valor, self.decimal)
+
+    def filas(self, filas, origen):
+        """Convierte las filas crudas; omite las vacías. origen sirve para los errores."""
+        conversiones = [(posicion, self._conversion(nombre, tipo)) for nombre, posicion, tipo in self.columnas]
+        ancho = max((posicion for posicion, _ in conversiones), default=-1) + 1
+        for numero, fila in enumerate(filas, start=2):  # la 1 es el encabezado
+            if len(fila) < ancho:
+                fila = tuple(fila) + (None,) * (ancho - len(fila))
+            try:
+                salida = tuple(convertir(fila[posicion]) for posicion, convertir in conversiones)
+            except ValueError:
+                raise self._error(fila, origen, numero) from None
+            if any(v is not None for v in salida):
+                yield salida
+
+    def _error(self, fila, origen, numero):
+        """ErrorIngesta con la primera columna de la fila que no se pudo convertir."""
+        for nombre, posicion, tipo in self.columnas:
+            try:
+                self._conversion(nombre, tipo)(fila[posicion])
+            except ValueError:
+                return ErrorIngesta(f"{origen}, fila {numero}: '{fila[posicion]}' no es un valor válido de {nombre}")
+        return ErrorIngesta(f"{origen}, fila {numero}: fila inválida")
+
+
+# ---------------------------------------------------------------------------
+# Lectura por lotes
+# ---------------------------------------------------------------------------
+
+def hojas_csv(ruta, tabla=None, codificacion="utf-8-sig"):
+    """Una hoja (tabla, encabezados, filas) por archivo CSV; detecta el separador."""
+    archivo = open(ruta, newline="", encoding=codificacion)
+    try:
+        muestra = archivo.read(8192)
+        archivo.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t|")
+        except csv.Error:
+            dialecto = csv.excel
+        lector = csv.reader(archivo, dialecto)
+        encabezados = next(lector, [])
+        yield tabla or os.path.splitext(os.path.basename(ruta))[0].lower(), encabezados, lector
+    finally:
+        archivo.close()
+
+
+def _openpyxl():
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError("Leer XLSX requiere openpyxl: pip install openpyxl") from None
+    return openpyxl
+
+
+def hojas_xlsx(ruta, tabla=None):
+    """
+    Una hoja por pestaña del libro, en modo de solo lectura (sin cargarlo entero).
+
+    Cada pestaña va a la tabla de su nombre; con `tabla` solo se lee la primera.
+    """
+    libro = _openpyxl().load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        hojas = libro.worksheets[:1] if tabla else libro.worksheets
+        for hoja in hojas:
+            filas = hoja.iter_rows(values_only=True)
+            encabezados = [str(e) if e is not None else "" for e in next(filas, ())]
+            yield tabla or hoja.title.strip().lower(), encabezados, filas
+    finally:
+        libro.close()
+
+
+def hojas(ruta, tabla=None, codificacion="utf-8-sig"):
+    if ruta.lower().endswith((".xlsx", ".xlsm")):
+        return hojas_xlsx(ruta, tabla)
+    return hojas_csv(ruta, tabla, codificacion)
+
+
+def por_lotes(filas, tamano=TAMANO_LOTE):
+    iterador = iter(filas)
+    while True:
+        lote = list(islice(iterador, tamano))
+        if not lote:
+            return
+        yield lote
+
+
+# ---------------------------------------------------------------------------
+# Carga
+# ---------------------------------------------------------------------------
+
+def cargar(conn, rutas, tabla=None, reemplazar=True, mapeos=None, tamano=TAMANO_LOTE,
+           codificacion="utf-8-sig"):
+    """
+    Carga los archivos en una sola transacción y devuelve {tabla: filas}.
+
+    Con reemplazar=True cada tabla se vuelve a crear con el esquema canónico;
+    si no, las filas se agregan a la tabla existente.
+    """
+    mapeos = cargar_mapeos() if mapeos is None else mapeos
+    cargadas = {}
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        for ruta in rutas:
+            for nombre, encabezados, filas in hojas(ruta, tabla, codificacion):
+                mapeo = Mapeo(nombre, encabezados, mapeos.get(nombre))
+                # Una tabla que aparece en dos archivos se reemplaza solo la primera vez
+                mapeo.crear_tabla(conn, reemplazar and nombre not in cargadas)
+                insert = mapeo.insert()
+                total = cargadas.get(nombre, 0)
+                for lote in por_lotes(mapeo.filas(filas, f"{os.path.basename(ruta)} [{nombre}]"), tamano):
+                    conn.executemany(insert, lote)
+                    total += len(lote)
+                cargadas[nombre] = total
+    return cargadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga hojas contables CSV/XLSX a la base.")
+    parser.add_argument("archivos", nargs="+")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--tabla", help="tabla destino (por defecto, el nombre del archivo u hoja)")
+    parser.add_argument("--agregar", action="store_true", help="agregar filas en lugar de reemplazar la tabla")
+    parser.add_argument("--mapeos", default=RUTA_MAPEOS)
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE)
+    parser.add_argument("--codificacion", default="utf-8-sig")
+    parser.add_argument("--sin-sync", action="store_true", help="no sincronizar las tablas derivadas")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        conexiones.activar_wal(conn)
+        inicio = time.perf_counter()
+        try:
+            cargadas = cargar(conn, args.archivos, args.tabla, not args.agregar,
+                              cargar_mapeos(args.mapeos), args.lote, args.codificacion)
+        except ErrorIngesta as e:
+            raise SystemExit(f"No se cargó nada: {e}")
+        for nombre, filas in cargadas.items():
+            print(f"{nombre}: {filas} filas")
+        print(f"Carga: {time.perf_counter() - inicio:.2f} s")
+        if not args.sin_sync:
+            inicio = time.perf_counter()
+            cambios = sync.refrescar(conn)
+            print(f"Sincronización de derivadas ({len(cambios)} tablas): {time.perf_counter() - inicio:.2f} s")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
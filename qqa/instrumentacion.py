@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentación opcional del tablero.
+
+Se activa con la variable de entorno QQA_DIAGNOSTICO=1. Mide el tiempo de
+cada etapa de cada pestaña (SQL, conversión a DataFrame, tabla, gráfico
+y envío al navegador), guarda el EXPLAIN QUERY PLAN de cada sentencia y
+cuenta aciertos de caché y filas devueltas. Los datos se ven en un panel
+lateral oculto (?diagnostico=1 en la URL), salen como logs JSON en el
+logger "qqa.diagnostico" y, con QQA_METRICAS_PUERTO, en texto Prometheus
+en http://host:puerto/metrics.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("qqa.diagnostico")
+
+ACTIVO = os.environ.get("QQA_DIAGNOSTICO", "") not in ("", "0")
+MAX_CONSULTAS = 200
+
+
+class Instrumentacion:
+    """Acumula tiempos por etapa, consultas recientes y planes de ejecución."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.etapas = {}  # nombre -> [conteo, suma_s, max_s]
+        self.consultas = deque(maxlen=MAX_CONSULTAS)
+        self.planes = {}
+        self.aciertos = 0
+        self.fallos = 0
+        self.filas = 0
+
+    def iniciar_ejecucion(self):
+        """Empieza el registro de una ejecución del script en este hilo."""
+        self._local.ejecucion = []
+        return self._local.ejecucion
+
+    def ejecucion_actual(self):
+        return getattr(self._local, "ejecucion", [])
+
+    @contextmanager
+    def etapa(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_etapa(nombre, time.perf_counter() - inicio)
+
+    def registrar_etapa(self, nombre, segundos):
+        with self._lock:
+            conteo = self.etapas.setdefault(nombre, [0, 0.0, 0.0])
+            conteo[0] += 1
+            conteo[1] += segundos
+            conteo[2] = max(conteo[2], segundos)
+        self.ejecucion_actual().append({"etapa": nombre, "ms": round(segundos * 1000, 3)})
+        logger.info(json.dumps({"evento": "etapa", "etapa": nombre,
+                                "ms": round(segundos * 1000, 3)}))
+
+    def registrar_consulta(self, query, params, filas, segundos, acierto):
+        sentencia = " ".join(query.split())
+        evento = {
+            "evento": "consulta",
+            "sql": sentencia[:200],
+            "params": [str(p) for p in params],
+            "filas": filas,
+            "ms": round(segundos * 1000, 3),
+            "cache": "acierto" if acierto else "fallo",
+        }
+        with self._lock:
+            if acierto:
+                self.aciertos += 1
+            else:
+                self.fallos += 1
+            self.filas += filas
+            self.consultas.append(evento)
+        self.ejecucion_actual().append(evento)
+        logger.info(json.dumps(evento, ensure_ascii=False))
+
+    def capturar_plan(self, conn, query, params):
+        """Guarda el EXPLAIN QUERY PLAN de una sentencia (una vez por texto SQL)."""
+        sentencia = " ".join(query.split())
+        with self._lock:
+            if sentencia in self.planes:
+                return
+        try:
+            plan = [fila[3] for fila in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+        except Exception as e:
+            plan = [f"(sin plan: {e})"]
+        with self._lock:
+            self.planes[sentencia] = plan
+
+    def a_prometheus(self, cache=None):
+        """Métricas en el formato de texto de Prometheus."""
+        with self._lock:
+            lineas = [
+                "# HELP qqa_etapa_segundos Tiempo por etapa del tablero.",
+                "# TYPE qqa_etapa_segundos summary",
+            ]
+            for nombre, (conteo, suma, _) in sorted(self.etapas.items()):
+                lineas.append(f'qqa_etapa_segundos_sum{{etapa="{nombre}"}} {suma:.6f}')
+                lineas.append(f'qqa_etapa_segundos_count{{etapa="{nombre}"}} {conteo}')
+            lineas += [
+                "# HELP qqa_etapa_max_segundos Etapa más lenta observada.",
+                "# TYPE qqa_etapa_max_segundos gauge",
+            ]
+            for nombre, (_, _, maximo) in sorted(self.etapas.items()):
+                lineas.append(f'qqa_etapa_max_segundos{{etapa="{nombre}"}} {maximo:.6f}')
+            lineas += [
+                "# HELP qqa_consultas_total Consultas atendidas por resultado de caché.",
+                "# TYPE qqa_consultas_total counter",
+                f'qqa_consultas_total{{cache="acierto"}} {self.aciertos}',
+                f'qqa_consultas_total{{cache="fallo"}} {self.fallos}',
+                "# HELP qqa_filas_devueltas_total Filas devueltas por las consultas.",
+                "# TYPE qqa_filas_devueltas_total counter",
+                f"qqa_filas_devueltas_total {self.filas}",
+            ]
+        if cache is not None:
+            for clave, valor in cache.estadisticas().items():
+                lineas.append(f"# TYPE qqa_cache_{clave} gauge")
+                lineas.append(f"qqa_cache_{clave} {valor}")
+        return "\n".join(lineas) + "\n"
+
+
+INSTRUMENTACION = Instrumentacion()
+
+
+@contextmanager
+def etapa(nombre):
+    """Mide una etapa si la instrumentación está activa; si no, no hace nada."""
+    if not ACTIVO:
+        yield
+        return
+    with INSTRUMENTACION.etapa(nombre):
+        yield
+
+
+def iniciar_servidor_metricas(puerto, cache=None, instrumentacion=INSTRUMENTACION):
+    """Sirve /metrics en un hilo aparte y devuelve el servidor."""
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            cuerpo = instrumentacion.a_prometheus(cache).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, formato, *args):
+            logger.debug(formato, *args)
+
+    servidor = ThreadingHTTPServer(("0.0.0.0", puerto), Manejador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Libro de caja unificado.
+
+Materializamos todas las tablas cajaYYYY en una sola tabla normalizada
+(movimientos_caja) con fechas ISO, para que las consultas del tablero
+filtren por rango de fechas usando un índice en lugar de reconstruir la
+unión de todos los años en cada consulta.
+
+Uso desde la terminal:
+    python -m qqa.ledger contabilidad.db
+"""
+
+import re
+import sqlite3
+import sys
+
+from . import DB_PATH, conceptos
+
+TABLA_MOVIMIENTOS = "movimientos_caja"
+# Subimos la versión cuando cambia el esquema para forzar una reconstrucción
+VERSION = 2
+
+# Cada año la hoja de caja trae nombres de columna distintos, por eso
+# probamos las parejas (ingreso, egreso) conocidas en orden.
+COLUMNAS_INGRESO_EGRESO = [
+    ("entrada", "salida"),
+    ("abono", "prestamo"),
+]
+
+# Las demás hojas (cxc, cxp, er) suman esta pareja
+COLUMNAS_MONTOS = COLUMNAS_INGRESO_EGRESO + [("ingreso", "egreso")]
+
+PATRON_CAJA = re.compile(r"^caja(\d{4})$")
+
+
+def expr_fecha_iso(columna="fecha"):
+    """Expresión SQL que lleva una fecha 'dd/mm/yyyy' o 'yyyy-mm-dd ...' a 'yyyy-mm-dd'."""
+    return (
+        f"CASE WHEN {columna} LIKE '__/__/____' "
+        f"THEN date(substr({columna}, 7, 4) || '-' || substr({columna}, 4, 2) || '-' || substr({columna}, 1, 2)) "
+        f"ELSE date({columna}) END"
+    )
+
+
+def columnas_tabla(conn, tabla):
+    return [fila[1] for fila in conn.execute(f'PRAGMA table_info("{tabla}")')]
+
+
+def columna(columnas, nombre):
+    """Columna real cuyo nombre sin espacios es `nombre` ('entrada ' en cxp2024), o None."""
+    return next((c for c in columnas if c.strip() == nombre), None)
+
+
+def columnas_montos(columnas):
+    """Columnas reales (entrada, salida) de una hoja según COLUMNAS_MONTOS, o None."""
+    for entrada, salida in COLUMNAS_MONTOS:
+        reales = columna(columnas, entrada), columna(columnas, salida)
+        if all(reales):
+            return reales
+    return None
+
+
+def tabla_existe(conn, tabla):
+    fila = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)
+    ).fetchone()
+    return fila is not None
+
+
+def fuentes_caja(conn):
+    """Lista ordenada de las tablas cajaYYYY presentes en la base."""
+    nombres = [fila[0] for fila in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+    )]
+    return sorted(n for n in nombres if PATRON_CAJA.match(n))
+
+
+def columnas_caja(conn, tabla):
+    """Devuelve las columnas (ingreso, egreso) de una tabla de caja."""
+    columnas = set(columnas_tabla(conn, tabla))
+    for ingreso, egreso in COLUMNAS_INGRESO_EGRESO:
+        if ingreso in columnas and egreso in columnas:
+            return ingreso, egreso
+    raise ValueError(f"La tabla {tabla} no tiene columnas de ingreso/egreso reconocidas")
+
+
+def select_fuente_caja(conn, tabla):
+    """SELECT que normaliza una tabla cajaYYYY al esquema de movimientos_caja."""
+    ingreso, egreso = columnas_caja(conn, tabla)
+    anio = int(PATRON_CAJA.match(tabla).group(1))
+    return f"""
+    SELECT
+        '{tabla}' as fuente,
+        {anio} as anio,
+        rowid as fila,
+        {expr_fecha_iso()} as fecha,
+        COALESCE("{ingreso}", 0) as ingreso,
+        COALESCE("{egreso}", 0) as egreso,
+        detalle,
+        {conceptos.expr_id()} as concepto_id
+    FROM "{tabla}"
+    WHERE fecha IS NOT NULL
+    """
+
+
+def crear_movimientos_caja(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLA_MOVIMIENTOS} (
+        fuente TEXT NOT NULL,
+        anio INTEGER NOT NULL,
+        fila INTEGER NOT NULL,
+        fecha TEXT NOT NULL,
+        ingreso INTEGER NOT NULL DEFAULT 0,
+        egreso INTEGER NOT NULL DEFAULT 0,
+        detalle TEXT,
+        concepto_id INTEGER,
+        PRIMARY KEY (fuente, fila)
+    )
+    """)
+    # Índice de cobertura para el filtro por fechas y el top de egresos
+    conn.execute(f"""
+    CREATE INDEX IF NOT EXISTS idx_movimientos_caja_fecha
+        ON {TABLA_MOVIMIENTOS} (fecha, egreso, concepto_id)
+    """)
+
+
+def refrescar_movimientos_caja(conn, tabla, meses=None):
+    """
+    Sincroniza en movimientos_caja las filas de una tabla cajaYYYY.
+
+    Con meses=None se recarga la tabla completa; si no, solo los meses
+    ('yyyy-mm') indicados. Debe llamarse dentro de una transacción, con los
+    conceptos de la tabla ya cargados en el diccionario.
+    """
+    insert = (
+        f"INSERT INTO {TABLA_MOVIMIENTOS} "
+        f"(fuente, anio, fila, fecha, ingreso, egreso, detalle, concepto_id) "
+    )
+    if meses is None:
+        conn.execute(f"DELETE FROM {TABLA_MOVIMIENTOS} WHERE fuente = ?", (tabla,))
+        if tabla_existe(conn, tabla):
+            conn.execute(insert + select_fuente_caja(conn, tabla))
+        return
+
+    for bloque in bloques([m for m in meses if m]):
+        marcas = ", ".join("?" * len(bloque))
+        conn.execute(
+            f"DELETE FROM {TABLA_MOVIMIENTOS} "
+            f"WHERE fuente = ? AND substr(fecha, 1, 7) IN ({marcas})",
+            (tabla, *bloque),
+        )
+        conn.execute(
+            insert
+            + f"SELECT * FROM ({select_fuente_caja(conn, tabla)}) "
+            f"WHERE substr(fecha, 1, 7) IN ({marcas})",
+            bloque,
+        )
+
+
+def bloques(valores, tamano=500):
+    """Parte una lista para no pasar del límite de parámetros de SQLite."""
+    for i in range(0, len(valores), tamano):
+        yield valores[i:i + tamano]
+
+
+def construir_movimientos_caja(conn):
+    """Reconstruye movimientos_caja completa a partir de todas las tablas cajaYYYY."""
+    with conn:
+        conn.execute("BEGIN")
+        conn.execute(f"DROP TABLE IF EXISTS {TABLA_MOVIMIENTOS}")
+        conceptos.crear_conceptos(conn)
+        crear_movimientos_caja(conn)
+        for tabla in fuentes_caja(conn):
+            conceptos.refrescar_conceptos(conn, tabla)
+            refrescar_movimientos_caja(conn, tabla)
+    conn.execute(f"ANALYZE {TABLA_MOVIMIENTOS}")
+
+
+if __name__ == "__main__":
+    ruta = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    with sqlite3.connect(ruta) as conn:
+        construir_movimientos_caja(conn)
+        total = conn.execute(f"SELECT COUNT(*) FROM {TABLA_MOVIMIENTOS}").fetchone()[0]
+    print(f"{TABLA_MOVIMIENTOS}: {total} movimientos")
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+Lectura por bloques de consultas grandes.
+
+leer_por_bloques trae el resultado de una sentencia con fetchmany, de modo
+que en memoria nunca hay más de un bloque (la usa la exportación Parquet
+de qqa.columnar). No depende de pandas ni de streamlit.
+"""
+
+TAMANO_BLOQUE = 1000
+
+
+def leer_por_bloques(conn, query, params=(), tamano=TAMANO_BLOQUE):
+    """Genera (columnas, filas) de a `tamano` filas."""
+    cursor = conn.execute(query, params)
+    columnas = [c[0] for c in cursor.description]
+    try:
+        while True:
+            filas = cursor.fetchmany(tamano)
+            if not filas:
+                return
+            yield columnas, filas
+    finally:
+        cursor.close()
+
@@ -0,0 +1,461 @@
+# -*- coding: utf-8 -*-
+"""
+Estados de cuenta de todos los socios, en lote.
+
+    python -m qqa.reportes --mes 2025-03 --formatos html,xlsx,pdf
+
+Para el período (por defecto el mes anterior) arma el estado de cuenta de
+cada socio del padrón o con movimientos en cxc: ingresos del período y sus
+estadísticas por día (socios_mensual), saldo inicial y final de su cuenta
+por cobrar (qqa.conciliacion) y el detalle de movimientos. Los datos salen
+de consultas agrupadas por socio, no de una consulta por socio; los
+archivos se escriben en paralelo, un proceso por núcleo.
+
+En la carpeta de salida (reportes/<asociación>/<período>) queda
+manifiesto.json con la huella de los datos de cada socio ya generado y los
+que fallaron. Volver a ejecutar el mismo comando solo genera los que
+faltan, fallaron o cambiaron; --desde-cero los genera todos.
+
+HTML no necesita nada más; XLSX usa openpyxl y PDF reportlab
+(pip install openpyxl reportlab).
+"""
+
+import argparse
+import hashlib
+import html
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+
+from . import conciliacion, cxc, socios_mensual
+from .conceptos import plegar
+
+DESTINO = os.environ.get("QQA_REPORTES", "reportes")
+MANIFIESTO = "manifiesto.json"
+FORMATOS = ["html", "xlsx", "pdf"]
+TAMANO_LOTE = 50  # socios por tarea del pool
+
+
+# ---------------------------------------------------------------------------
+# Datos
+# ---------------------------------------------------------------------------
+
+def periodo_mes(mes):
+    """(inicio, fin) 'yyyy-mm-dd' de un mes 'yyyy-mm'."""
+    inicio = date.fromisoformat(mes + "-01")
+    siguiente = (inicio + timedelta(days=32)).replace(day=1)
+    return inicio.isoformat(), (siguiente - timedelta(days=1)).isoformat()
+
+
+def mes_anterior(hoy=None):
+    hoy = hoy or date.today()
+    return (hoy.replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+
+
+def estados_de_cuenta(conn, fecha_inicio, fecha_fin, socios=None):
+    """
+    Estado de cuenta de cada socio en el rango, como dicts listos para dibujar.
+
+    Son tres lecturas para todos los socios: los movimientos de cxc en el
+    rango ordenados por socio, los momentos de socios_mensual y los saldos
+    de cxc por socio. `socios` limita el lote a esos códigos.
+    """
+    elegidos = None if socios is None else set(socios)
+
+    nombres = dict(conn.execute(
+        f"SELECT codigo, nombre FROM {cxc.TABLA_SOCIOS} WHERE nombre IS NOT NULL"
+    ))
+    movimientos = {}
+    filas = conn.execute(f"""
+    SELECT codigo_socio, fecha, fuente, detalle, entrada, salida, saldo
+    FROM {cxc.TABLA_CXC}
+    WHERE fecha BETWEEN ? AND ? AND codigo_socio IS NOT NULL
+    ORDER BY codigo_socio, fecha, fuente, fila
+    """, (fecha_inicio, fecha_fin))
+    for codigo, grupo in itertools.groupby(filas, key=lambda f: f[0]):
+        movimientos[codigo] = [f[1:] for f in grupo]
+
+    estadisticas = {
+        fila[0]: fila[1:]
+        for fila in conn.execute(*socios_mensual.consulta_estadisticas_socios(fecha_inicio, fecha_fin))
+    }
+    saldos = {
+        fila[0]: fila[2:]
+        for fila in conn.execute(*conciliacion.consulta_saldos_socios("cxc", fecha_inicio, fecha_fin))
+    }
+
+    codigos = (set(nombres) | set(movimientos)) - {socios_mensual.SIN_CODIGO}
+    if elegidos is not None:
+        codigos &= elegidos
+    estados = []
+    for codigo in sorted(codigos):
+        dias, n_movimientos, total, suma_cuadrados, primera, ultima, _, _ = (
+            estadisticas.get(codigo) or (0, 0, 0, 0.0, None, None, None, None)
+        )
+        promedio, desviacion = socios_mensual.media_y_desviacion(dias, total, suma_cuadrados)
+        apertura, ajustes, entradas, salidas, cierre = saldos.get(codigo) or (0, 0, 0, 0, 0)
+        estados.append({
+            "codigo": codigo,
+            "nombre": nombres.get(codigo) or f"Socio {codigo}",
+            "desde": fecha_inicio,
+            "hasta": fecha_fin,
+            "ingresos": {
+                "total": total,
+                "dias": dias,
+                "movimientos": n_movimientos,
+                "promedio_dia": round(promedio, 2),
+                "desviacion_dia": round(desviacion, 2),
+                "primera_fecha": primera,
+                "ultima_fecha": ultima,
+            },
+            "saldo": {"apertura": apertura, "ajustes": ajustes, "entradas": entradas, "salidas": salidas,
+                      "cierre": cierre},
+            "movimientos": movimientos.get(codigo, []),
+        })
+    return estados
+
+
+def huella(estado):
+    """Hash del contenido de un estado: si no cambia, su archivo tampoco."""
+    texto = json.dumps(estado, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(texto.encode("utf-8"), digest_size=12).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Dibujo (corre en los procesos del pool)
+# ---------------------------------------------------------------------------
+
+def moneda(valor):
+    return f"${(valor or 0):,.0f}"
+
+
+def nombre_archivo(estado):
+    partes = plegar(estado["nombre"]).split()[:6]
+    return f"{estado['codigo']:05d}_{'-'.join(partes) or 'socio'}"
+
+
+def filas_resumen(estado):
+    """(etiqueta, valor en texto) del encabezado del estado de cuenta."""
+    ingresos, saldo = estado["ingresos"], estado["saldo"]
+    return [
+        ("Período", f"{estado['desde']} a {estado['hasta']}"),
+        ("Total ingresos", moneda(ingresos["total"])),
+        ("Días con ingresos", str(ingresos["dias"])),
+        ("Movimientos con ingreso", str(ingresos["movimientos"])),
+        ("Ingreso promedio por día", moneda(ingresos["promedio_dia"])),
+        ("Desviación por día", moneda(ingresos["desviacion_dia"])),
+        ("Saldo inicial CxC", moneda(saldo["apertura"])),
+        ("Ajuste de saldo inicial", moneda(saldo["ajustes"])),
+        ("Cargos (entradas)", moneda(saldo["entradas"])),
+        ("Abonos (salidas)", moneda(saldo["salidas"])),
+        ("Saldo final CxC", moneda(saldo["cierre"])),
+    ]
+
+
+COLUMNAS_MOVIMIENTOS = ["Fecha", "Hoja", "Detalle", "Entrada", "Salida", "Saldo hoja"]
+
+
+def escribir_html(estado, ruta, asociacion):
+    e = html.escape
+    resumen = "".join(f"<tr><th>{e(k)}</th><td>{e(v)}</td></tr>" for k, v in filas_resumen(estado))
+    movimientos = "".join(
+        "<tr>" + "".join(f"<td>{e(str(c))}</td>" for c in (
+            fecha, fuente, detalle or "", moneda(entrada), moneda(salida),
+            "" if saldo is None else moneda(saldo),
+        )) + "</tr>"
+        for fecha, fuente, detalle, entrada, salida, saldo in estado["movimientos"]
+    ) or f'<tr><td colspan="{len(COLUMNAS_MOVIMIENTOS)}">Sin movimientos en el período</td></tr>'
+    encabezado = "".join(f"<th>{c}</th>" for c in COLUMNAS_MOVIMIENTOS)
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        archivo.write(f"""<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8">
+<title>Estado de cuenta {estado['codigo']} - {e(estado['nombre'])}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; color: #222; }}
+table {{ border-collapse: collapse; margin-bottom: 1.5em; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 8px; text-align: left; }}
+td:nth-child(n+4) {{ text-align: right; }}
+</style></head><body>
+<h2>Asociación {e(asociacion)}</h2>
+<h1>Estado de cuenta - {estado['codigo']} {e(estado['nombre'])}</h1>
+<table>{resumen}</table>
+<h3>Movimientos de cuentas por cobrar</h3>
+<table><tr>{encabezado}</tr>{movimientos}</table>
+<p><small>Generado el {datetime.now():%Y-%m-%d %H:%M}</small></p>
+</body></html>
+""")
+
+
+def _openpyxl():
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError("El formato xlsx requiere openpyxl: pip install openpyxl") from None
+    return openpyxl
+
+
+def escribir_xlsx(estado, ruta, asociacion):
+    libro = _openpyxl().Workbook(write_only=True)
+    hoja = libro.create_sheet("Estado de cuenta")
+    hoja.append([f"Asociación {asociacion}"])
+    hoja.append([f"Estado de cuenta - {estado['codigo']} {estado['nombre']}"])
+    hoja.append([])
+    for etiqueta, valor in filas_resumen(estado):
+        hoja.append([etiqueta, valor])
+    hoja.append([])
+    hoja.append(COLUMNAS_MOVIMIENTOS)
+    for fila in estado["movimientos"]:
+        hoja.append(list(fila))
+    libro.save(ruta)
+
+
+def _reportlab():
+    try:
+        from reportlab.lib.pagesizes import letter
+        from reportlab.pdfgen import canvas
+    except ImportError:
+        raise ImportError("El formato pdf requiere reportlab: pip install reportlab") from None
+    return canvas, letter
+
+
+def escribir_pdf(estado, ruta, asociacion):
+    canvas, pagina = _reportlab()
+    alto = pagina[1]
+    hoja = canvas.Canvas(ruta, pagesize=pagina)
+    y = alto - 50
+
+    def escribir(x, texto, fuente="Helvetica", tamano=9):
+        hoja.setFont(fuente, tamano)
+        hoja.drawString(x, y, str(texto))
+
+    def bajar(salto):
+        nonlocal y
+        y -= salto
+        if y < 50:
+            hoja.showPage()
+            y = alto - 50
+
+    escribir(40, f"Asociación {asociacion}", "Helvetica-Bold", 11)
+    bajar(15)
+    escribir(40, f"Estado de cuenta - {estado['codigo']} {estado['nombre']}", "Helvetica-Bold", 13)
+    bajar(22)
+    for etiqueta, valor in filas_resumen(estado):
+        escribir(40, f"{etiqueta}: {valor}")
+        bajar(13)
+    bajar(10)
+    escribir(40, "Movimientos de cuentas por cobrar", "Helvetica-Bold", 11)
+    bajar(16)
+    columnas = [40, 105, 160, 390, 460, 530]
+    for x, titulo in zip(columnas, COLUMNAS_MOVIMIENTOS):
+        escribir(x, titulo, "Helvetica-Bold", 8)
+    bajar(12)
+    for fecha, fuente, detalle, entrada, salida, saldo in estado["movimientos"]:
+        valores = [fecha, fuente, (detalle or "")[:45], moneda(entrada), moneda(salida),
+                   "" if saldo is None else moneda(saldo)]
+        for x, valor in zip(columnas, valores):
+            escribir(x, valor, tamano=8)
+        bajar(12)
+    hoja.save()
+
+
+ESCRITORES = {"html": escribir_html, "xlsx": escribir_xlsx, "pdf": escribir_pdf}
+
+
+def escribir_estado(estado, formatos, carpeta, asociacion):
+    """Escribe los archivos de un socio; devuelve sus nombres."""
+    base = nombre_archivo(estado)
+    archivos = []
+    for formato in formatos:
+        nombre = f"{base}.{formato}"
+        temporal = os.path.join(carpeta, f".{nombre}.tmp")
+        try:
+            ESCRITORES[formato](estado, temporal, asociacion)
+        except Exception:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        # Un archivo a medias nunca queda con el nombre final
+        os.replace(temporal, os.path.join(carpeta, nombre))
+        archivos.append(nombre)
+    return archivos
+
+
+def escribir_lote(estados, formatos, carpeta, asociacion):
+    """
+    Tarea del pool: escribe un lote de socios.
+
+    Devuelve (codigo, huella, archivos, error) por socio; el error de un
+    socio no detiene a los demás del lote.
+    """
+    resultados = []
+    for estado in estados:
+        try:
+            archivos = escribir_estado(estado, formatos, carpeta, asociacion)
+            resultados.append((estado["codigo"], huella(estado), archivos, None))
+        except Exception as e:
+            resultados.append((estado["codigo"], None, [], f"{type(e).__name__}: {e}"))
+    return resultados
+
+
+# ---------------------------------------------------------------------------
+# Corrida
+# ---------------------------------------------------------------------------
+
+def leer_manifiesto(carpeta):
+    try:
+        with open(os.path.join(carpeta, MANIFIESTO), encoding="utf-8") as archivo:
+            return json.load(archivo)
+    except FileNotFoundError:
+        return {"socios": {}, "errores": {}}
+
+
+def guardar_manifiesto(carpeta, manifiesto):
+    ruta = os.path.join(carpeta, MANIFIESTO)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def pendientes(estados, formatos, carpeta, manifiesto):
+    """Estados sin archivos al día: nuevos, con error, con datos distintos o con algún archivo faltante."""
+    faltan = []
+    for estado in estados:
+        hecho = manifiesto["socios"].get(str(estado["codigo"]))
+        base = nombre_archivo(estado)
+        if (hecho is None or hecho["huella"] != huella(estado)
+                or not all(os.path.exists(os.path.join(carpeta, f"{base}.{f}")) for f in formatos)):
+            faltan.append(estado)
+    return faltan
+
+
+class Progreso:
+    """Avance de la corrida en una línea, a lo sumo una vez por segundo."""
+
+    def __init__(self, total, salida=sys.stderr):
+        self.total = total
+        self.hechos = 0
+        self.errores = 0
+        self.salida = salida
+        self.inicio = time.perf_counter()
+        self._ultimo = 0.0
+
+    def avanzar(self, hechos, errores):
+        self.hechos += hechos
+        self.errores += errores
+        ahora = time.perf_counter()
+        if ahora - self._ultimo >= 1 or self.hechos == self.total:
+            self._ultimo = ahora
+            porcentaje = self.hechos / self.total * 100 if self.total else 100
+            print(f"  {self.hechos}/{self.total} socios ({porcentaje:.0f}%), {self.errores} con error, "
+                  f"{ahora - self.inicio:.1f} s", file=self.salida, flush=True)
+
+
+def generar(estados, formatos, carpeta, asociacion, procesos=None, desde_cero=False, lote=TAMANO_LOTE):
+    """
+    Escribe los estados de cuenta que falten en `carpeta`, en paralelo.
+
+    Actualiza el manifiesto después de cada lote, así una corrida cortada se
+    retoma donde quedó. Devuelve el manifiesto final.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    manifiesto = {"socios": {}, "errores": {}} if desde_cero else leer_manifiesto(carpeta)
+    faltan = pendientes(estados, formatos, carpeta, manifiesto)
+    print(f"{len(estados)} socios, {len(estados) - len(faltan)} ya generados, {len(faltan)} por generar",
+          file=sys.stderr)
+    progreso = Progreso(len(faltan))
+    lotes = [faltan[i:i + lote] for i in range(0, len(faltan), lote)]
+
+    def registrar(resultados):
+        errores = 0
+        for codigo, firma, archivos, error in resultados:
+            if error is None:
+                manifiesto["socios"][str(codigo)] = {"huella": firma, "archivos": archivos}
+                manifiesto["errores"].pop(str(codigo), None)
+            else:
+                manifiesto["socios"].pop(str(codigo), None)
+                manifiesto["errores"][str(codigo)] = error
+                errores += 1
+        manifiesto["actualizado"] = datetime.now().isoformat(timespec="seconds")
+        guardar_manifiesto(carpeta, manifiesto)
+        progreso.avanzar(len(resultados), errores)
+
+    if procesos == 1 or len(lotes) <= 1:
+        for estados_lote in lotes:
+            registrar(escribir_lote(estados_lote, formatos, carpeta, asociacion))
+        return manifiesto
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = {pool.submit(escribir_lote, l, formatos, carpeta, asociacion): l for l in lotes}
+        for futuro in as_completed(futuros):
+            try:
+                resultados = futuro.result()
+            except BrokenProcessPool as e:
+                # Un proceso murió (memoria, señal): su lote queda para la próxima corrida
+                resultados = [(estado["codigo"], None, [], f"{type(e).__name__}: {e}")
+                              for estado in futuros[futuro]]
+            registrar(resultados)
+    return manifiesto
+
+
+def main():
+    from .asociaciones import Registro
+
+    parser = argparse.ArgumentParser(description="Estados de cuenta de todos los socios.")
+    parser.add_argument("--asociacion", help="id del registro de asociaciones (por defecto, la primera)")
+    parser.add_argument("--mes", help="mes AAAA-MM (por defecto, el anterior)")
+    parser.add_argument("--desde", help="inicio del período AAAA-MM-DD (en lugar de --mes)")
+    parser.add_argument("--hasta", help="fin del período AAAA-MM-DD")
+    parser.add_argument("--formatos", default="html", help=f"separados por coma: {', '.join(FORMATOS)}")
+    parser.add_argument("--socio", type=int, action="append", help="solo este código (se puede repetir)")
+    parser.add_argument("--destino", default=DESTINO)
+    parser.add_argument("--procesos", type=int, help="procesos del pool (por defecto, uno por núcleo)")
+    parser.add_argument("--desde-cero", action="store_true", help="ignorar el manifiesto y generar todo")
+    args = parser.parse_args()
+
+    formatos = [f.strip() for f in args.formatos.split(",") if f.strip()]
+    desconocidos = set(formatos) - set(FORMATOS)
+    if desconocidos:
+        parser.error(f"Formatos desconocidos: {', '.join(sorted(desconocidos))}")
+    try:
+        # Antes de leer datos: que falte una dependencia se sabe enseguida
+        if "xlsx" in formatos:
+            _openpyxl()
+        if "pdf" in formatos:
+            _reportlab()
+    except ImportError as e:
+        raise SystemExit(str(e))
+    if bool(args.desde) != bool(args.hasta):
+        parser.error("--desde y --hasta van juntos")
+    if args.desde:
+        fecha_inicio, fecha_fin, periodo = args.desde, args.hasta, f"{args.desde}_{args.hasta}"
+    else:
+        periodo = args.mes or mes_anterior()
+        fecha_inicio, fecha_fin = periodo_mes(periodo)
+
+    registro = Registro.cargar()
+    asociacion = registro[args.asociacion or registro.ids()[0]]
+    try:
+        inicio = time.perf_counter()
+        asociacion.preparar(verificar_contenido=True)
+        with asociacion.pool().conexion() as conn:
+            estados = estados_de_cuenta(conn, fecha_inicio, fecha_fin, args.socio)
+        print(f"Datos de {len(estados)} socios: {time.perf_counter() - inicio:.2f} s", file=sys.stderr)
+    finally:
+        registro.cerrar()
+
+    carpeta = os.path.join(args.destino, asociacion.id, periodo)
+    manifiesto = generar(estados, formatos, carpeta, asociacion.nombre, args.procesos, args.desde_cero)
+    print(f"Estados de cuenta en {carpeta}")
+    if manifiesto["errores"]:
+        for codigo, error in sorted(manifiesto["errores"].items()):
+            print(f"  socio {codigo}: {error}", file=sys.stderr)
+        raise SystemExit(f"{len(manifiesto['errores'])} socios con error; vuelva a ejecutar para reintentarlos")
+
+
+if __name__ == "__main__":
+    main()
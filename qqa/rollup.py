@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Cubo mensual de caja.
+
+caja_mensual guarda por mes y tabla fuente los totales de ingresos y
+egresos. La pestaña "Caja mensual" suma estas filas para los meses
+completos del rango y solo lee movimientos sueltos en los meses de los
+extremos cuando el rango no empieza el día 1 o no termina el último día.
+"""
+
+import calendar
+from datetime import date, timedelta
+
+from . import ledger
+
+TABLA_CAJA_MENSUAL = "caja_mensual"
+VERSION = 1
+
+
+def crear_caja_mensual(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLA_CAJA_MENSUAL} (
+        mes TEXT NOT NULL,
+        fuente TEXT NOT NULL,
+        total_ingresos INTEGER NOT NULL,
+        total_egresos INTEGER NOT NULL,
+        movimientos INTEGER NOT NULL,
+        PRIMARY KEY (mes, fuente)
+    )
+    """)
+
+
+def refrescar_caja_mensual(conn, tabla, meses=None):
+    """Recalcula desde movimientos_caja los meses de una fuente (todos con meses=None)."""
+    agregado = f"""
+    INSERT INTO {TABLA_CAJA_MENSUAL} (mes, fuente, total_ingresos, total_egresos, movimientos)
+    SELECT
+        substr(fecha, 1, 7) as mes,
+        fuente,
+        SUM(ingreso),
+        SUM(egreso),
+        COUNT(*)
+    FROM {ledger.TABLA_MOVIMIENTOS}
+    WHERE fuente = ?
+    """
+    if meses is None:
+        conn.execute(f"DELETE FROM {TABLA_CAJA_MENSUAL} WHERE fuente = ?", (tabla,))
+        conn.execute(agregado + " GROUP BY mes", (tabla,))
+        return
+
+    for bloque in ledger.bloques([m for m in meses if m]):
+        marcas = ", ".join("?" * len(bloque))
+        conn.execute(
+            f"DELETE FROM {TABLA_CAJA_MENSUAL} WHERE fuente = ? AND mes IN ({marcas})",
+            (tabla, *bloque),
+        )
+        conn.execute(
+            agregado + f" AND substr(fecha, 1, 7) IN ({marcas}) GROUP BY mes",
+            (tabla, *bloque),
+        )
+
+
+def partir_rango(fecha_inicio, fecha_fin):
+    """
+    Divide un rango 'yyyy-mm-dd' en meses completos y tramos sueltos.
+
+    Devuelve (meses, tramos): meses es (mes_desde, mes_hasta) o None, y
+    tramos es la lista de rangos de fechas que hay que leer fila a fila.
+    """
+    inicio = date.fromisoformat(fecha_inicio)
+    fin = date.fromisoformat(fecha_fin)
+    tramos = []
+
+    # Primer mes completo: el del inicio si arranca el día 1
+    primero = inicio.replace(day=1)
+    if inicio.day != 1:
+        fin_mes = primero.replace(day=calendar.monthrange(primero.year, primero.month)[1])
+        tramos.append((inicio, min(fin, fin_mes)))
+        primero = fin_mes + timedelta(days=1)
+
+    # Último mes completo: el del fin si termina el último día
+    ultimo = fin.replace(day=1)
+    if fin.day != calendar.monthrange(fin.year, fin.month)[1]:
+        if ultimo >= primero:
+            tramos.append((ultimo, fin))
+        ultimo = ultimo - timedelta(days=1)
+
+    meses = None
+    if primero <= ultimo:
+        meses = (primero.strftime("%Y-%m"), ultimo.strftime("%Y-%m"))
+    tramos = [(a.isoformat(), b.isoformat()) for a, b in tramos]
+    return meses, tramos
+
+
+def consulta_caja_mensual(fecha_inicio, fecha_fin, movimientos=ledger.TABLA_MOVIMIENTOS):
+    """SQL y parámetros de la caja mensual usando el cubo y los tramos sueltos."""
+    meses, tramos = partir_rango(fecha_inicio, fecha_fin)
+    partes, params = [], []
+    if meses:
+        partes.append(f"""
+        SELECT mes, total_ingresos as ingreso, total_egresos as egreso
+        FROM {TABLA_CAJA_MENSUAL}
+        WHERE mes BETWEEN ? AND ?
+        """)
+        params.extend(meses)
+    for desde, hasta in tramos:
+        partes.append(f"""
+        SELECT substr(fecha, 1, 7) as mes, ingreso, egreso
+        FROM {movimientos}
+        WHERE fecha BETWEEN ? AND ?
+        """)
+        params.extend((desde, hasta))
+
+    query = f"""
+    SELECT
+        mes,
+        SUM(ingreso) as total_ingresos,
+        SUM(egreso) as total_egresos,
+        SUM(ingreso - egreso) as neto
+    FROM ({" UNION ALL ".join(partes)})
+    GROUP BY mes
+    ORDER BY mes
+    """
+    return query, tuple(params)
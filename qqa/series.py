@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Series de tiempo del tablero con un número acotado de puntos.
+
+La serie de un socio se agrupa en SQL por día, semana o mes según el largo
+del rango y el ancho del gráfico (elegir_resolucion), y si aun así quedan
+más puntos de los que caben se reduce con LTTB (Largest-Triangle-Three-
+Buckets), que conserva la forma de la curva: picos y caídas se mantienen.
+"""
+
+from datetime import date
+
+ANCHO_GRAFICO = 900  # px aproximados del gráfico de la pestaña de socios
+PX_POR_PUNTO = 4
+
+RESOLUCIONES = ["dia", "semana", "mes"]
+DIAS_POR_PUNTO = {"dia": 1, "semana": 7, "mes": 30}
+# Adjetivo para las métricas ("Promedio Diario") y sustantivo para los títulos
+ETIQUETAS = {"dia": "Diario", "semana": "Semanal", "mes": "Mensual"}
+PERIODOS = {"dia": "Día", "semana": "Semana", "mes": "Mes"}
+
+
+def max_puntos(ancho_px=ANCHO_GRAFICO):
+    return max(2, ancho_px // PX_POR_PUNTO)
+
+
+def _fecha(valor):
+    return valor if isinstance(valor, date) else date.fromisoformat(str(valor)[:10])
+
+
+def elegir_resolucion(fecha_inicio, fecha_fin, ancho_px=ANCHO_GRAFICO):
+    """La resolución más fina cuyo número de puntos cabe en el ancho del gráfico."""
+    dias = (_fecha(fecha_fin) - _fecha(fecha_inicio)).days + 1
+    limite = max_puntos(ancho_px)
+    for resolucion in RESOLUCIONES:
+        if dias / DIAS_POR_PUNTO[resolucion] <= limite:
+            return resolucion
+    return RESOLUCIONES[-1]
+
+
+def expr_periodo(resolucion, columna="fecha"):
+    """Fecha ISO del inicio del periodo (día, lunes de la semana o día 1 del mes)."""
+    if resolucion == "dia":
+        return columna
+    if resolucion == "semana":
+        # 'weekday 0' avanza al domingo (o se queda si ya lo es); 6 días antes es lunes
+        return f"date({columna}, 'weekday 0', '-6 days')"
+    if resolucion == "mes":
+        return f"substr({columna}, 1, 7) || '-01'"
+    raise ValueError(f"resolución desconocida: {resolucion}")
+
+
+def lttb(xs, ys, umbral):
+    """
+    Índices de los puntos que conserva LTTB para dejar `umbral` puntos.
+
+    xs debe ser numérico y creciente. Siempre se conservan el primero y el
+    último; de cada tramo intermedio se queda el punto que forma el
+    triángulo más grande con el elegido antes y el promedio del tramo
+    siguiente.
+    """
+    n = len(xs)
+    if umbral >= n or umbral < 3:
+        return list(range(n))
+
+    indices = [0]
+    tamano = (n - 2) / (umbral - 2)
+    a = 0
+    for i in range(umbral - 2):
+        inicio = int(i * tamano) + 1
+        fin = int((i + 1) * tamano) + 1
+        # Promedio del tramo siguiente (el último punto si ya no hay más)
+        sig_inicio, sig_fin = fin, min(int((i + 2) * tamano) + 1, n)
+        if sig_inicio >= sig_fin:
+            sig_inicio, sig_fin = n - 1, n
+        cuenta = sig_fin - sig_inicio
+        x_prom = sum(xs[sig_inicio:sig_fin]) / cuenta
+        y_prom = sum(ys[sig_inicio:sig_fin]) / cuenta
+
+        xa, ya = xs[a], ys[a]
+        mejor, area_max = inicio, -1.0
+        for j in range(inicio, fin):
+            area = abs((xa - x_prom) * (ys[j] - ya) - (xa - xs[j]) * (y_prom - ya))
+            if area > area_max:
+                mejor, area_max = j, area
+        indices.append(mejor)
+        a = mejor
+    indices.append(n - 1)
+    return indices
+
+
+def reducir(df, x, y, umbral=None):
+    """Filas de df que conserva LTTB sobre las columnas x (fechas) e y."""
+    umbral = umbral or max_puntos()
+    if len(df) <= umbral:
+        return df
+    xs = [v.timestamp() if hasattr(v, "timestamp") else float(v) for v in df[x]]
+    ys = [float(v) for v in df[y]]
+    return df.iloc[lttb(xs, ys, umbral)]
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Estadísticas mensuales de ingresos por socio.
+
+socios_mensual guarda por mes y socio los momentos de sus ingresos diarios
+de cxc_movimientos: días con ingresos, movimientos, suma, suma de cuadrados
+y el primer y el último día con su ingreso. Son sumables: para un rango se
+combinan las filas de los meses completos con las de los tramos sueltos de
+los extremos (igual que caja_mensual) y de ahí salen total, promedio y
+desviación por día, frecuencia y tendencia sin traer filas diarias a Python.
+"""
+
+import math
+
+from . import cxc, ledger, rollup
+
+TABLA_SOCIOS_MENSUAL = "socios_mensual"
+VERSION = 2
+
+# Socios sin código (filas de cxc que no se pudieron cruzar)
+SIN_CODIGO = -1
+
+
+def crear_socios_mensual(conn):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {TABLA_SOCIOS_MENSUAL} (
+        mes TEXT NOT NULL,
+        codigo_socio INTEGER NOT NULL,
+        dias INTEGER NOT NULL,
+        movimientos INTEGER NOT NULL,
+        total INTEGER NOT NULL,
+        suma_cuadrados REAL NOT NULL,
+        primera_fecha TEXT NOT NULL,
+        ultima_fecha TEXT NOT NULL,
+        primer_ingreso INTEGER NOT NULL,
+        ultimo_ingreso INTEGER NOT NULL,
+        PRIMARY KEY (mes, codigo_socio)
+    )
+    """)
+    # Estadísticas de un socio: búsqueda por rango de meses
+    conn.execute(f"""
+    CREATE INDEX IF NOT EXISTS idx_socios_mensual_socio
+        ON {TABLA_SOCIOS_MENSUAL} (codigo_socio, mes)
+    """)
+
+
+def select_momentos(filtro, movimientos=cxc.TABLA_CXC):
+    """
+    SELECT con los momentos por mes y socio de las filas que cumplen `filtro`.
+
+    Primero suma los ingresos de cada día y luego agrega los días del mes;
+    la suma de cuadrados es REAL para no desbordar enteros de 64 bits.
+    """
+    return f"""
+    SELECT
+        mes,
+        codigo_socio,
+        COUNT(*) as dias,
+        SUM(movimientos) as movimientos,
+        SUM(total) as total,
+        SUM(CAST(total AS REAL) * total) as suma_cuadrados,
+        MIN(fecha) as primera_fecha,
+        MAX(fecha) as ultima_fecha,
+        MAX(primer_ingreso) as primer_ingreso,
+        MAX(ultimo_ingreso) as ultimo_ingreso
+    FROM (
+        SELECT
+            *,
+            FIRST_VALUE(total) OVER (PARTITION BY mes, codigo_socio ORDER BY fecha) as primer_ingreso,
+            FIRST_VALUE(total) OVER (PARTITION BY mes, codigo_socio ORDER BY fecha DESC) as ultimo_ingreso
+        FROM (
+            SELECT
+                substr(fecha, 1, 7) as mes,
+                COALESCE(codigo_socio, {SIN_CODIGO}) as codigo_socio,
+                fecha,
+                COUNT(*) as movimientos,
+                SUM(entrada) as total
+            FROM {movimientos}
+            WHERE entrada > 0
+                AND fecha IS NOT NULL
+                AND {filtro}
+            GROUP BY 2, fecha
+        )
+    )
+    GROUP BY mes, codigo_socio
+    """
+
+
+def refrescar_socios_mensual(conn, tabla, meses=None):
+    """
+    Recalcula los meses indicados para todos los socios.
+
+    Las filas no llevan la tabla fuente: un mes se recalcula completo desde
+    cxc_movimientos, así los días que aparecen en dos tablas cxc se cuentan
+    una vez. Con meses=None, o si cambió una tabla de socios (cambian los
+    códigos), se reconstruye toda la tabla.
+    """
+    insert = f"INSERT INTO {TABLA_SOCIOS_MENSUAL} "
+    if meses is None or cxc.PATRON_SOCIOS.match(tabla):
+        conn.execute(f"DELETE FROM {TABLA_SOCIOS_MENSUAL}")
+        conn.execute(insert + select_momentos("1"))
+        return
+
+    for bloque in ledger.bloques([m for m in meses if m]):
+        marcas = ", ".join("?" * len(bloque))
+        conn.execute(f"DELETE FROM {TABLA_SOCIOS_MENSUAL} WHERE mes IN ({marcas})", bloque)
+        conn.execute(insert + select_momentos(f"substr(fecha, 1, 7) IN ({marcas})"), bloque)
+
+
+def consulta_estadisticas_socios(fecha_inicio, fecha_fin, socio_codigo=None):
+    """
+    SQL y parámetros de los momentos de cada socio en el rango (o de uno solo).
+
+    Devuelve una fila por socio con codigo_socio, dias, movimientos, total,
+    suma_cuadrados, primera_fecha, ultima_fecha, primer_ingreso y ultimo_ingreso.
+    """
+    meses, tramos = rollup.partir_rango(fecha_inicio, fecha_fin)
+    partes, params = [], []
+    filtro_socio = ""
+    if socio_codigo is not None:
+        filtro_socio = " AND codigo_socio = ?"
+    if meses:
+        partes.append(f"""
+        SELECT *
+        FROM {TABLA_SOCIOS_MENSUAL}
+        WHERE mes BETWEEN ? AND ?{filtro_socio}
+        """)
+        params.extend(meses)
+        if socio_codigo is not None:
+            params.append(socio_codigo)
+    for desde, hasta in tramos:
+        partes.append(select_momentos("fecha BETWEEN ? AND ?" + filtro_socio))
+        params.extend((desde, hasta))
+        if socio_codigo is not None:
+            params.append(socio_codigo)
+
+    # Los tramos y los meses no se solapan: los días y las sumas se suman
+    query = f"""
+    SELECT
+        codigo_socio,
+        SUM(dias) as dias,
+        SUM(movimientos) as movimientos,
+        SUM(total) as total,
+        SUM(suma_cuadrados) as suma_cuadrados,
+        MIN(primera_fecha) as primera_fecha,
+        MAX(ultima_fecha) as ultima_fecha,
+        MAX(primero) as primer_ingreso,
+        MAX(ultimo) as ultimo_ingreso
+    FROM (
+        SELECT
+            *,
+            FIRST_VALUE(primer_ingreso) OVER (PARTITION BY codigo_socio ORDER BY primera_fecha) as primero,
+            FIRST_VALUE(ultimo_ingreso) OVER (PARTITION BY codigo_socio ORDER BY ultima_fecha DESC) as ultimo
+        FROM ({" UNION ALL ".join(partes)})
+    )
+    GROUP BY codigo_socio
+    """
+    return query, tuple(params)
+
+
+def media_y_desviacion(n, suma, suma_cuadrados):
+    """
+    Media y desviación estándar muestral (como pandas) a partir de los momentos.
+
+    La desviación es 0 con un solo dato y nunca negativa por redondeo.
+    """
+    if not n:
+        return 0.0, 0.0
+    media = suma / n
+    if n < 2:
+        return media, 0.0
+    varianza = (suma_cuadrados - n * media * media) / (n - 1)
+    return media, math.sqrt(max(varianza, 0.0))
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+Sincronización incremental de las tablas derivadas.
+
+Para cada tabla fuente (caja2025, cxc2025, ...) guardamos una marca de agua:
+máximo rowid, número de filas y un hash del contenido, además de un hash
+por mes. Al refrescar solo se recalculan en las tablas derivadas los meses
+cuyo hash cambió, de modo que agregar filas a 2025 no obliga a recalcular
+2020-2024 y una corrección en un año viejo solo toca ese mes.
+
+Uso desde la terminal:
+    python -m qqa.sync contabilidad.db
+"""
+
+import hashlib
+import sqlite3
+import sys
+from datetime import datetime
+
+from . import DB_PATH, busqueda, conceptos, conciliacion, cxc, egresos, ledger, rollup, socios_mensual
+
+
+class Derivado:
+    """
+    Tabla derivada que se mantiene a partir de tablas fuente.
+
+    fuentes(conn) -> lista de tablas fuente.
+    crear(conn) -> crea la tabla (y sus índices) si no existe.
+    refrescar(conn, tabla, meses) -> recalcula las filas que vienen de
+        `tabla` para los meses 'yyyy-mm' indicados, o todas con meses=None.
+    """
+
+    def __init__(self, nombre, version, fuentes, crear, refrescar, tablas=None):
+        self.nombre = nombre
+        self.version = version
+        self.fuentes = fuentes
+        self.crear = crear
+        self.refrescar = refrescar
+        self.tablas = tablas or [nombre]
+
+
+DERIVADOS = [
+    # Los demás derivados buscan aquí el id de cada detalle; los que guardan
+    # ids usan conceptos.version() para reconstruirse si cambian las reglas
+    Derivado(
+        conceptos.TABLA_CONCEPTOS,
+        conceptos.version(),
+        conceptos.fuentes,
+        conceptos.crear_conceptos,
+        conceptos.refrescar_conceptos,
+        tablas=[conceptos.TABLA_CONCEPTOS, conceptos.TABLA_VARIANTES],
+    ),
+    Derivado(
+        ledger.TABLA_MOVIMIENTOS,
+        conceptos.version(ledger.VERSION),
+        ledger.fuentes_caja,
+        ledger.crear_movimientos_caja,
+        ledger.refrescar_movimientos_caja,
+    ),
+    # Se alimenta de movimientos_caja, por eso va después en la lista
+    Derivado(
+        rollup.TABLA_CAJA_MENSUAL,
+        rollup.VERSION,
+        ledger.fuentes_caja,
+        rollup.crear_caja_mensual,
+        rollup.refrescar_caja_mensual,
+    ),
+    Derivado(
+        egresos.TABLA_EGRESOS_MENSUALES,
+        conceptos.version(egresos.VERSION),
+        ledger.fuentes_caja,
+        egresos.crear_egresos_mensuales,
+        egresos.refrescar_egresos_mensuales,
+    ),
+    Derivado(
+        cxc.TABLA_SOCIOS,
+        cxc.VERSION_SOCIOS,
+        cxc.fuentes_socios,
+        cxc.crear_socios,
+        cxc.refrescar_socios,
+    ),
+    # Depende de socios para resolver los códigos de cxc2020
+    Derivado(
+        cxc.TABLA_CXC,
+        conceptos.version(cxc.VERSION_CXC),
+        cxc.fuentes_cxc_y_socios,
+        cxc.crear_cxc,
+        cxc.refrescar_cxc,
+    ),
+    # Se alimenta de cxc_movimientos; recalcula meses completos de todos los socios
+    Derivado(
+        socios_mensual.TABLA_SOCIOS_MENSUAL,
+        socios_mensual.VERSION,
+        cxc.fuentes_cxc_y_socios,
+        socios_mensual.crear_socios_mensual,
+        socios_mensual.refrescar_socios_mensual,
+    ),
+    # Después de socios: resuelve los códigos de los movimientos por nombre
+    Derivado(
+        busqueda.TABLA_DOCUMENTOS,
+        busqueda.VERSION,
+        busqueda.fuentes,
+        busqueda.crear_busqueda,
+        busqueda.refrescar_busqueda,
+        tablas=[busqueda.TABLA_DOCUMENTOS, busqueda.TABLA_FTS],
+    ),
+    # Cortes mensuales de saldo por cuenta y socio; también depende de socios
+    Derivado(
+        conciliacion.TABLA_SALDOS_MOVIMIENTOS,
+        conciliacion.VERSION,
+        conciliacion.fuentes,
+        conciliacion.crear_saldos,
+        conciliacion.refrescar_saldos,
+        tablas=[conciliacion.TABLA_SALDOS_MOVIMIENTOS, conciliacion.TABLA_SALDOS_MENSUALES],
+    ),
+]
+
+
+class _HashFilas:
+    """Agregado SQL con hash independiente del orden de las filas."""
+
+    def __init__(self):
+        self.total = 0
+
+    def step(self, *valores):
+        digest = hashlib.blake2b(repr(valores).encode("utf-8"), digest_size=8).digest()
+        self.total = (self.total + int.from_bytes(digest, "big")) % (1 << 64)
+
+    def finalize(self):
+        return f"{self.total:016x}"
+
+
+def crear_tablas_sync(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sync_derivados (
+        nombre TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sync_watermarks (
+        tabla TEXT PRIMARY KEY,
+        max_rowid INTEGER,
+        filas INTEGER NOT NULL,
+        hash TEXT NOT NULL,
+        actualizado TEXT NOT NULL
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS sync_meses (
+        tabla TEXT NOT NULL,
+        mes TEXT NOT NULL,
+        filas INTEGER NOT NULL,
+        hash TEXT NOT NULL,
+        PRIMARY KEY (tabla, mes)
+    )
+    """)
+
+
+def expr_mes(conn, tabla):
+    """Mes 'yyyy-mm' de cada fila; '' si la tabla o la fila no tienen fecha."""
+    if "fecha" not in ledger.columnas_tabla(conn, tabla):
+        return "''"
+    return f"COALESCE(substr({ledger.expr_fecha_iso()}, 1, 7), '')"
+
+
+def hashes_por_mes(conn, tabla):
+    """Devuelve {mes: (filas, hash)} leyendo la tabla fuente una sola vez."""
+    columnas = ", ".join(f'"{c}"' for c in ledger.columnas_tabla(conn, tabla))
+    consulta = f"""
+    SELECT {expr_mes(conn, tabla)} as mes, COUNT(*), qqa_hash(rowid, {columnas})
+    FROM "{tabla}"
+    GROUP BY mes
+    """
+    return {mes: (filas, h) for mes, filas, h in conn.execute(consulta)}
+
+
+def marca_rapida(conn, tabla):
+    return conn.execute(f'SELECT MAX(rowid), COUNT(*) FROM "{tabla}"').fetchone()
+
+
+def combinar_hashes(meses):
+    total = sum(int(h, 16) for _, h in meses.values()) % (1 << 64)
+    return f"{total:016x}"
+
+
+def _reconstruir_si_cambio(conn, derivado):
+    """Recrea el derivado si no existe o si cambió su versión. Devuelve True si lo recreó."""
+    fila = conn.execute(
+        "SELECT version FROM sync_derivados WHERE nombre = ?", (derivado.nombre,)
+    ).fetchone()
+    vigente = fila is not None and fila[0] == derivado.version
+    if vigente and all(ledger.tabla_existe(conn, t) for t in derivado.tablas):
+        return False
+    for tabla in derivado.tablas:
+        conn.execute(f'DROP TABLE IF EXISTS "{tabla}"')
+    derivado.crear(conn)
+    conn.execute(
+        "INSERT OR REPLACE INTO sync_derivados (nombre, version) VALUES (?, ?)",
+        (derivado.nombre, derivado.version),
+    )
+    return True
+
+
+def refrescar(conn, derivados=None, verificar_contenido=True):
+    """
+    Lleva las tablas derivadas al día con las tablas fuente.
+
+    Con verificar_contenido=False se omiten las tablas cuyo máximo rowid y
+    número de filas no cambiaron (no detecta ediciones, pero no lee la
+    tabla). Devuelve {tabla: meses recalculados} (None = tabla completa).
+    """
+    derivados = DERIVADOS if derivados is None else derivados
+    conn.create_aggregate("qqa_hash", -1, _HashFilas)
+    conn.create_function("qqa_plegar", 1, conceptos.plegar_sql, deterministic=True)
+    cambios = {}
+
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        crear_tablas_sync(conn)
+        nuevos = {d.nombre for d in derivados if _reconstruir_si_cambio(conn, d)}
+
+        fuentes = {}
+        for derivado in derivados:
+            for tabla in derivado.fuentes(conn):
+                fuentes.setdefault(tabla, []).append(derivado)
+        registradas = {fila[0] for fila in conn.execute("SELECT tabla FROM sync_watermarks")}
+
+        # Tablas que desaparecieron: borramos lo que aportaban
+        for tabla in sorted(registradas - set(fuentes)):
+            for derivado in derivados:
+                derivado.refrescar(conn, tabla, None)
+            conn.execute("DELETE FROM sync_watermarks WHERE tabla = ?", (tabla,))
+            conn.execute("DELETE FROM sync_meses WHERE tabla = ?", (tabla,))
+            cambios[tabla] = None
+
+        for tabla, dependientes in sorted(fuentes.items()):
+            cambios_tabla = _refrescar_tabla(
+                conn, tabla, dependientes, nuevos, verificar_contenido
+            )
+            if cambios_tabla is None or cambios_tabla:
+                cambios[tabla] = cambios_tabla
+
+    for derivado in derivados:
+        if derivado.nombre in nuevos or any(
+            derivado in fuentes.get(t, []) for t in cambios
+        ):
+            conn.execute(f'ANALYZE "{derivado.nombre}"')
+    return cambios
+
+
+def _refrescar_tabla(conn, tabla, dependientes, nuevos, verificar_contenido):
+    max_rowid, filas = marca_rapida(conn, tabla)
+    anterior = conn.execute(
+        "SELECT max_rowid, filas, hash FROM sync_watermarks WHERE tabla = ?", (tabla,)
+    ).fetchone()
+
+    pendientes = [d for d in dependientes if d.nombre in nuevos]
+    if (not pendientes and not verificar_contenido and anterior is not None
+            and anterior[:2] == (max_rowid, filas)):
+        return []
+
+    actuales = hashes_por_mes(conn, tabla)
+    guardados = {
+        mes: (n, h) for mes, n, h in conn.execute(
+            "SELECT mes, filas, hash FROM sync_meses WHERE tabla = ?", (tabla,)
+        )
+    }
+    meses = sorted(
+        mes for mes in set(actuales) | set(guardados)
+        if actuales.get(mes) != guardados.get(mes)
+    )
+
+    for derivado in dependientes:
+        if derivado.nombre in nuevos:
+            derivado.refrescar(conn, tabla, None)
+        elif anterior is None:
+            derivado.refrescar(conn, tabla, None)
+        elif meses:
+            derivado.refrescar(conn, tabla, meses)
+
+    if meses or anterior is None:
+        conn.execute("DELETE FROM sync_meses WHERE tabla = ?", (tabla,))
+        conn.executemany(
+            "INSERT INTO sync_meses (tabla, mes, filas, hash) VALUES (?, ?, ?, ?)",
+            [(tabla, mes, n, h) for mes, (n, h) in actuales.items()],
+        )
+    marca = (max_rowid, filas, combinar_hashes(actuales))
+    if anterior is not None and tuple(anterior) == marca and not meses:
+        # Nada cambió: no escribimos para no alterar la versión del archivo
+        return None if pendientes else []
+    conn.execute(
+        "INSERT OR REPLACE INTO sync_watermarks "
+        "(tabla, max_rowid, filas, hash, actualizado) VALUES (?, ?, ?, ?, ?)",
+        (tabla, *marca, datetime.now().isoformat(timespec="seconds")),
+    )
+
+    if anterior is None or pendientes:
+        return None
+    return meses
+
+
+if __name__ == "__main__":
+    ruta = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    with sqlite3.connect(ruta) as conn:
+        cambios = refrescar(conn)
+    if not cambios:
+        print("Sin cambios")
+    for tabla, meses in cambios.items():
+        print(f"{tabla}: {'completa' if meses is None else ', '.join(meses)}")
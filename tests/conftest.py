@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Fixtures comunes: cada prueba trabaja sobre una copia de contabilidad.db."""
+
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Ruta de una copia de la base; las reglas (conceptos.json, ingesta.json) se leen de la raíz."""
+    monkeypatch.chdir(RAIZ)
+    ruta = str(tmp_path / "contabilidad.db")
+    shutil.copyfile(os.path.join(RAIZ, "contabilidad.db"), ruta)
+    return ruta
+
+
+@pytest.fixture
+def conn(db):
+    """Conexión a la copia con las tablas derivadas al día."""
+    from qqa import sync
+
+    conexion = sqlite3.connect(db)
+    sync.refrescar(conexion)
+    yield conexion
+    conexion.close()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""La API responde JSON estricto y no se desincroniza con cuerpos en keep-alive."""
+
+import asyncio
+import json
+
+import pytest
+
+from qqa import api
+from qqa.asociaciones import Asociacion, Registro
+
+
+def _json_estricto(datos):
+    """json.loads que rechaza NaN e Infinity, como los parsers de los clientes."""
+    def rechazar(constante):
+        raise ValueError(f"{constante} no es JSON válido")
+    return json.loads(datos, parse_constant=rechazar)
+
+
+async def _servidor(db, tmp_path):
+    registro = Registro([Asociacion("prueba", db, parquet=str(tmp_path / "parquet"))])
+    servidor = await asyncio.start_server(api.ServidorAPI(registro, parquet=False).atender,
+                                          "127.0.0.1", 0)
+    return servidor, servidor.sockets[0].getsockname()[1]
+
+
+async def _leer_respuesta(lector):
+    """(estado, cabeceras, cuerpo) de una respuesta con Content-Length."""
+    estado = int((await lector.readline()).split()[1])
+    cabeceras = {}
+    while (linea := await lector.readline()) not in (b"\r\n", b""):
+        nombre, _, valor = linea.decode("latin-1").partition(":")
+        cabeceras[nombre.strip().lower()] = valor.strip()
+    cuerpo = await lector.readexactly(int(cabeceras.get("content-length", 0)))
+    return estado, cabeceras, cuerpo
+
+
+def _peticion(destino, metodo="GET", extra=""):
+    return f"{metodo} {destino} HTTP/1.1\r\nHost: prueba\r\n{extra}\r\n".encode("latin-1")
+
+
+def _conversar(db, tmp_path, *mensajes):
+    """Envía los mensajes por una misma conexión y devuelve las respuestas."""
+    async def correr():
+        servidor, puerto = await _servidor(db, tmp_path)
+        async with servidor:
+            lector, escritor = await asyncio.open_connection("127.0.0.1", puerto)
+            respuestas = []
+            for mensaje, esperadas in mensajes:
+                escritor.write(mensaje)
+                await escritor.drain()
+                for _ in range(esperadas):
+                    respuestas.append(await _leer_respuesta(lector))
+            escritor.close()
+            return respuestas
+    return asyncio.run(correr())
+
+
+@pytest.mark.parametrize("destino", [
+    "/busqueda?texto=saldo",
+    "/conciliacion?cuenta=cxc",
+])
+def test_respuestas_sin_nan(db, tmp_path, destino):
+    (estado, _, cuerpo), = _conversar(db, tmp_path, (_peticion(destino), 1))
+    assert estado == 200
+    respuesta = _json_estricto(cuerpo.decode("utf-8"))
+    assert respuesta["filas"]
+
+
+def test_registros_pasa_nan_a_null():
+    import pandas as pd
+
+    df = pd.DataFrame({"a": [1.5, float("nan")], "b": ["x", None]})
+    assert api._registros(df) == [{"a": 1.5, "b": "x"}, {"a": None, "b": None}]
+
+
+def test_cuerpo_descartado_en_keep_alive(db, tmp_path):
+    cuerpo = b'{"texto": "saldo"}'
+    con_cuerpo = _peticion("/salud", "POST", f"Content-Length: {len(cuerpo)}\r\n") + cuerpo
+    respuestas = _conversar(db, tmp_path, (con_cuerpo + _peticion("/salud"), 2))
+    assert [estado for estado, _, _ in respuestas] == [405, 200]
+    assert _json_estricto(respuestas[1][2].decode("utf-8"))["estado"] == "ok"
+
+
+def test_rechaza_transfer_encoding(db, tmp_path):
+    chunked = _peticion("/salud", "POST", "Transfer-Encoding: chunked\r\n") + b"5\r\nhola!\r\n0\r\n\r\n"
+    (estado, cabeceras, _), = _conversar(db, tmp_path, (chunked, 1))
+    assert estado == 411
+    assert cabeceras["connection"] == "close"
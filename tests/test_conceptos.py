@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Nombres de conceptos sin los números de recibo o factura de una sola fila."""
+
+import re
+
+from qqa import conceptos
+
+
+def test_nombre_concepto_quita_numeros():
+    textos = ["Rbo de caja 154 Yamile Vera", "Rbo de caja 164 Yamile Vera", "Rbo de caja # 169 Yamile Vera"]
+    assert conceptos.nombre_concepto(textos) == "Rbo de caja Yamile Vera"
+
+
+def test_nombre_concepto_no_depende_del_orden():
+    textos = ["pago luz", "Pago luz", "Pago luz fra 12", "pago  luz"]
+    assert conceptos.nombre_concepto(textos) == conceptos.nombre_concepto(textos[::-1]) == "pago luz"
+
+
+def test_conceptos_de_la_base_sin_numeros(conn):
+    nombres = [fila[0] for fila in conn.execute(f"SELECT nombre FROM {conceptos.TABLA_CONCEPTOS}")]
+    assert nombres
+    assert not [n for n in nombres if re.search(r"\d", n)]
+    # El concepto de los recibos de Yamile Vera agrupa varios números de recibo
+    recibos = conn.execute(f"""
+    SELECT c.nombre, COUNT(*) FROM {conceptos.TABLA_CONCEPTOS} c
+    JOIN {conceptos.TABLA_VARIANTES} v ON v.concepto_id = c.id
+    WHERE c.clave = 'recibo de caja yamile vera'
+    """).fetchone()
+    assert recibos == ("rbo de caja yamile vera", recibos[1]) and recibos[1] > 1
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Saldos por rango y reporte de discrepancias de la conciliación."""
+
+from datetime import date, timedelta
+
+import pytest
+
+from qqa import conciliacion, sync
+
+RANGOS = [
+    ("2024-03-15", "2024-09-20"),  # empieza y termina a mitad de mes
+    ("2022-06-10", "2025-02-14"),  # varios años
+    ("2020-01-01", "2025-12-31"),
+    ("2024-12-31", "2025-01-01"),  # cruza el cambio de año
+]
+
+
+def _filas(conn, query, params):
+    cursor = conn.execute(query, params)
+    columnas = [c[0] for c in cursor.description]
+    return [dict(zip(columnas, fila)) for fila in cursor]
+
+
+def _cuadra(fila):
+    return fila["apertura"] + fila["ajustes"] + fila["entradas"] - fila["salidas"] == fila["cierre"]
+
+
+@pytest.mark.parametrize("desde, hasta", RANGOS)
+@pytest.mark.parametrize("cuenta", conciliacion.CUENTAS)
+def test_saldos_cuadran(conn, cuenta, desde, hasta):
+    fila, = _filas(conn, *conciliacion.consulta_saldos(cuenta, desde, hasta))
+    assert _cuadra(fila)
+
+    # Entradas y salidas son las de las filas del rango, aunque el rango corte meses
+    entradas, salidas = conn.execute(f"""
+    SELECT COALESCE(SUM(entrada), 0), COALESCE(SUM(salida), 0)
+    FROM {conciliacion.TABLA_SALDOS_MOVIMIENTOS}
+    WHERE cuenta = ? AND fecha BETWEEN ? AND ?
+    """, (cuenta, desde, hasta)).fetchone()
+    assert (fila["entradas"], fila["salidas"]) == (entradas, salidas)
+
+    # El cierre de un rango es la apertura del día siguiente
+    siguiente = (date.fromisoformat(hasta) + timedelta(days=1)).isoformat()
+    despues, = _filas(conn, *conciliacion.consulta_saldos(cuenta, siguiente, siguiente))
+    assert despues["apertura"] == fila["cierre"]
+
+
+@pytest.mark.parametrize("desde, hasta", RANGOS)
+@pytest.mark.parametrize("cuenta", conciliacion.CUENTAS_POR_SOCIO)
+def test_saldos_por_socio_cuadran(conn, cuenta, desde, hasta):
+    filas = _filas(conn, *conciliacion.consulta_saldos_socios(cuenta, desde, hasta))
+    assert all(_cuadra(fila) for fila in filas)
+    for fila in filas:
+        solo, = _filas(conn, *conciliacion.consulta_saldos(cuenta, desde, hasta, fila["codigo_socio"]))
+        assert solo == fila
+
+
+def test_discrepancia_de_saldo_alterado(conn):
+    def reporte():
+        return {(f["fuente"], f["fila"]): f for f in _filas(conn, *conciliacion.consulta_discrepancias("caja"))}
+
+    antes = reporte()
+    filas = [r[0] for r in conn.execute("SELECT rowid FROM caja2024 WHERE saldo IS NOT NULL ORDER BY rowid")]
+    # Dos filas seguidas que cuadran en la hoja original
+    fila, siguiente = next(
+        (a, b) for a, b in zip(filas, filas[1:])
+        if ("caja2024", a) not in antes and ("caja2024", b) not in antes
+    )
+    conn.execute("UPDATE caja2024 SET saldo = saldo + 12345 WHERE rowid = ?", (fila,))
+    conn.commit()
+    sync.refrescar(conn)
+
+    despues = reporte()
+    assert set(despues) - set(antes) == {("caja2024", fila), ("caja2024", siguiente)}
+    alterada = despues[("caja2024", fila)]
+    assert (alterada["diferencia"], alterada["tipo"]) == (12345, "fila")
+    # La fila siguiente parte del saldo alterado, así que descuadra al revés
+    assert despues[("caja2024", siguiente)]["diferencia"] == -12345
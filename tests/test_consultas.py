@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Búsqueda en el padrón de socios sin importar tildes ni mayúsculas."""
+
+import pytest
+
+from qqa import consultas, cxc, sync
+
+
+@pytest.fixture
+def padron(conn):
+    conn.execute("INSERT INTO socios2024 (codigo, nombre) VALUES (901, 'ÁLVAREZ Núñez')")
+    conn.execute("INSERT INTO cxc2020 (socio, valor) VALUES ('alvarez nunez', 5000)")
+    conn.commit()
+    sync.refrescar(conn)
+    return conn
+
+
+def _buscar(conn, texto):
+    return conn.execute(*consultas.consulta_buscar_socios(texto)).fetchall()
+
+
+@pytest.mark.parametrize("texto", ["alvarez", "ÁLVAREZ", "Álvarez", "NUNEZ", "núñez", "901"])
+def test_buscar_socios_pliega_tildes(padron, texto):
+    assert (901, "ÁLVAREZ Núñez") in _buscar(padron, texto)
+
+
+def test_buscar_socios_sin_texto_ni_comodines(padron):
+    todos = _buscar(padron, "")
+    assert todos == _buscar(padron, "%")
+    assert len(todos) == min(consultas.TAMANO_PAGINA,
+                             padron.execute(f"SELECT COUNT(*) FROM {cxc.TABLA_SOCIOS} WHERE nombre IS NOT NULL").fetchone()[0])
+
+
+def test_nombre_sin_tildes_cruza_con_el_padron(padron):
+    codigos = padron.execute(
+        f"SELECT codigo_socio FROM {cxc.TABLA_CXC} WHERE socio_nombre = 'alvarez nunez'"
+    ).fetchall()
+    assert codigos == [(901,)]
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Top de egresos: K conceptos más la fila "Otros" con el resto del rango."""
+
+from collections import defaultdict
+
+import pytest
+
+from qqa import conceptos, consultas, egresos, ledger, sync
+
+
+def _top(conn, desde, hasta, k):
+    query, params = consultas.consulta_egresos_por_concepto(desde, hasta, k)
+    return conn.execute(query, params).fetchall()
+
+
+def _totales(conn, desde, hasta):
+    """Egreso por concepto del rango leído de los movimientos, sin la tabla mensual."""
+    totales = defaultdict(int)
+    for concepto, egreso in conn.execute(f"""
+    SELECT COALESCE(concepto_id, 0), egreso FROM {ledger.TABLA_MOVIMIENTOS}
+    WHERE fecha BETWEEN ? AND ? AND egreso > 0
+    """, (desde, hasta)):
+        totales[concepto] += egreso
+    return totales
+
+
+@pytest.mark.parametrize("desde, hasta, k", [
+    ("2022-03-15", "2025-06-20", 5),
+    ("2024-02-10", "2024-11-05", 3),
+])
+def test_top_con_otros(conn, desde, hasta, k):
+    totales = _totales(conn, desde, hasta)
+    assert len(totales) > k
+    filas = _top(conn, desde, hasta, k)
+    assert len(filas) == k + 1
+
+    *top, otros = filas
+    assert otros[0] == egresos.ETIQUETA_OTROS and otros[2] == 1
+    assert all(fila[2] == 0 for fila in top)
+    esperados = sorted(totales.items(), key=lambda t: (-t[1], t[0]))[:k]
+    assert [fila[1] for fila in top] == [total for _, total in esperados]
+    assert otros[1] == sum(totales.values()) - sum(total for _, total in esperados)
+
+    nombres = dict(conn.execute(f"SELECT id, nombre FROM {conceptos.TABLA_CONCEPTOS}"))
+    assert sorted(fila[0] for fila in top) == sorted(nombres[id] for id, _ in esperados)
+
+
+def test_sin_otros_si_caben_todos(conn):
+    totales = _totales(conn, "2024-01-01", "2024-12-31")
+    filas = _top(conn, "2024-01-01", "2024-12-31", len(totales))
+    assert len(filas) == len(totales)
+    assert sum(fila[1] for fila in filas) == sum(totales.values())
+
+
+def test_egreso_sin_detalle(conn):
+    conn.execute(
+        "INSERT INTO caja2024 (socio, fecha, detalle, entrada, salida, saldo) VALUES (0, ?, NULL, 0, ?, 0)",
+        ("2024-05-10 00:00:00", 10_000_000),
+    )
+    conn.commit()
+    sync.refrescar(conn)
+    primera = _top(conn, "2024-01-01", "2024-12-31", 3)[0]
+    assert primera == (egresos.ETIQUETA_SIN_DETALLE, 10_000_000, 0)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+La sincronización incremental deja las derivadas igual que una reconstrucción.
+
+Cada caso modifica las tablas fuente de una copia ya sincronizada, llama a
+sync.refrescar y compara todas las tablas derivadas con las de otra copia
+reconstruida desde cero.
+"""
+
+import hashlib
+import sqlite3
+
+import pytest
+
+from qqa import busqueda, cache, conceptos, sync
+
+# Tablas cuyas filas guardan ids de concepto: se comparan por clave, porque
+# el orden en que se asignan los ids depende del orden en que llegaron los textos
+CON_CONCEPTO = "concepto_id"
+# El id de los documentos es autonumérico; se comparan por (fuente, fila)
+SIN_COLUMNA = {busqueda.TABLA_DOCUMENTOS: "id"}
+
+
+def _volcado(conn):
+    """{tabla derivada: filas ordenadas} comparable entre dos bases."""
+    claves = dict(conn.execute(f"SELECT id, clave FROM {conceptos.TABLA_CONCEPTOS}"))
+    volcado = {}
+    for derivado in sync.DERIVADOS:
+        for tabla in derivado.tablas:
+            if tabla in (conceptos.TABLA_CONCEPTOS, conceptos.TABLA_VARIANTES, busqueda.TABLA_FTS):
+                continue
+            cursor = conn.execute(f'SELECT * FROM "{tabla}"')
+            columnas = [c[0] for c in cursor.description]
+            filas = []
+            for fila in cursor:
+                fila = dict(zip(columnas, fila))
+                fila.pop(SIN_COLUMNA.get(tabla), None)
+                if CON_CONCEPTO in fila:
+                    fila[CON_CONCEPTO] = claves.get(fila[CON_CONCEPTO])
+                filas.append(tuple(sorted(fila.items(), key=lambda c: c[0])))
+            volcado[tabla] = sorted(filas, key=repr)
+    return volcado
+
+
+def _diccionario(conn):
+    return set(conn.execute(f"""
+    SELECT v.texto, c.clave FROM {conceptos.TABLA_VARIANTES} v
+    LEFT JOIN {conceptos.TABLA_CONCEPTOS} c ON c.id = v.concepto_id
+    """))
+
+
+def _reconstruida(conn, ruta):
+    """Copia de la base sin el estado de sincronización, reconstruida desde cero."""
+    conn.commit()
+    copia = sqlite3.connect(ruta)
+    conn.backup(copia)
+    for tabla in ("sync_derivados", "sync_watermarks", "sync_meses"):
+        copia.execute(f"DROP TABLE {tabla}")
+    copia.commit()
+    sync.refrescar(copia)
+    return copia
+
+
+def _comparar(conn, tmp_path):
+    copia = _reconstruida(conn, str(tmp_path / "reconstruida.db"))
+    try:
+        assert _volcado(conn) == _volcado(copia)
+        # El diccionario nunca borra ids: lo incremental puede tener textos de más
+        assert _diccionario(copia) <= _diccionario(conn)
+        conn.execute(f"INSERT INTO {busqueda.TABLA_FTS} ({busqueda.TABLA_FTS}) VALUES ('integrity-check')")
+    finally:
+        copia.close()
+
+
+def _agregar(conn):
+    conn.execute("""
+    INSERT INTO caja2025 (codigo_cliente, fecha, categoria, detalle, prestamo, abono, saldo)
+    VALUES (3, '2025-11-20 00:00:00', 'gasto', 'compra de abono organico', 0, 250000, 0)
+    """)
+    conn.execute("INSERT INTO cxc2025 (codigo_cliente, fecha, detalle, entrada, salida, saldo) "
+                 "VALUES (3, '2025-11-21 00:00:00', 'abono credito', 0, 40000, 10000)")
+
+
+def _editar(conn):
+    conn.execute("UPDATE caja2024 SET salida = salida + 1000, detalle = 'fra 77 papeleria nueva' "
+                 "WHERE rowid = (SELECT MIN(rowid) FROM caja2024 WHERE salida > 0)")
+
+
+def _mover_de_mes(conn):
+    conn.execute("UPDATE caja2024 SET fecha = '2024-12-15 00:00:00' "
+                 "WHERE rowid = (SELECT MIN(rowid) FROM caja2024 WHERE fecha LIKE '2024-03%')")
+
+
+def _borrar(conn):
+    conn.execute("DELETE FROM caja2023 WHERE rowid IN (SELECT rowid FROM caja2023 LIMIT 3)")
+    conn.execute("DELETE FROM cxc2024 WHERE rowid = (SELECT MAX(rowid) FROM cxc2024)")
+
+
+def _quitar_tabla(conn):
+    conn.execute("DROP TABLE caja2022")
+    conn.execute("DROP TABLE cxp2022")
+
+
+def _renombrar_socio(conn):
+    # amanda murillas también aparece por nombre en cxc2020
+    conn.execute("UPDATE socios2024 SET nombre = 'Amanda Murillas Peña' WHERE codigo = 3")
+
+
+CASOS = [_agregar, _editar, _mover_de_mes, _borrar, _quitar_tabla, _renombrar_socio]
+
+
+@pytest.mark.parametrize("caso", CASOS, ids=lambda c: c.__name__.strip("_"))
+def test_incremental_igual_a_reconstruir(conn, tmp_path, caso):
+    caso(conn)
+    conn.commit()
+    assert sync.refrescar(conn)
+    _comparar(conn, tmp_path)
+
+
+def test_casos_seguidos(conn, tmp_path):
+    for caso in CASOS:
+        caso(conn)
+        conn.commit()
+        sync.refrescar(conn)
+    _comparar(conn, tmp_path)
+
+
+def test_cambio_de_version(conn, tmp_path, monkeypatch):
+    _editar(conn)
+    conn.commit()
+    derivado = next(d for d in sync.DERIVADOS if d.nombre == "egresos_mensuales")
+    monkeypatch.setattr(derivado, "version", derivado.version + 1)
+    # Sin verificar el contenido igual se reconstruye el derivado nuevo
+    cambios = sync.refrescar(conn, verificar_contenido=False)
+    assert cambios and all(meses is None for meses in cambios.values())
+    assert conn.execute("SELECT version FROM sync_derivados WHERE nombre = ?",
+                        (derivado.nombre,)).fetchone() == (derivado.version,)
+    _comparar(conn, tmp_path)
+
+
+def test_sin_verificar_omite_tablas_con_la_misma_marca(conn, tmp_path):
+    antes = _volcado(conn)
+    # Una edición no cambia ni el máximo rowid ni el número de filas
+    _editar(conn)
+    conn.commit()
+    assert sync.refrescar(conn, verificar_contenido=False) == {}
+    assert _volcado(conn) == antes
+
+    # Una fila nueva sí cambia la marca, y esa tabla se relee entera (con la edición)
+    _agregar(conn)
+    conn.commit()
+    cambios = sync.refrescar(conn, verificar_contenido=False)
+    assert set(cambios) == {"caja2025", "cxc2025"}
+    assert "caja2024" not in cambios
+
+    # Al verificar el contenido aparece la edición pendiente
+    assert set(sync.refrescar(conn)) == {"caja2024"}
+    _comparar(conn, tmp_path)
+
+
+def _huella(ruta):
+    partes = []
+    for archivo in (ruta, ruta + "-wal"):
+        try:
+            with open(archivo, "rb") as f:
+                partes.append(hashlib.sha256(f.read()).hexdigest())
+        except FileNotFoundError:
+            partes.append(None)
+    return partes
+
+
+@pytest.mark.parametrize("wal", [False, True], ids=["rollback", "wal"])
+@pytest.mark.parametrize("verificar", [True, False], ids=["verificar", "rapida"])
+def test_sin_cambios_no_escribe(db, wal, verificar):
+    conn = sqlite3.connect(db)
+    try:
+        if wal:
+            conn.execute("PRAGMA journal_mode=WAL")
+        sync.refrescar(conn)
+        version, huella = cache.version_base(db), _huella(db)
+        assert sync.refrescar(conn, verificar_contenido=verificar) == {}
+        assert cache.version_base(db) == version
+        assert _huella(db) == huella
+    finally:
+        conn.close()
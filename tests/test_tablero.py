@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Cada vista de la sentencia conjunta del tablero es igual a su consulta suelta."""
+
+import pandas as pd
+import pytest
+
+from qqa import consultas, datos
+from qqa.asociaciones import Asociacion
+
+
+@pytest.fixture
+def d(conn, db, tmp_path):
+    asociacion = Asociacion("prueba", db, parquet=str(tmp_path / "parquet"))
+    yield datos.Datos(asociacion, parquet=False)
+    asociacion.cerrar()
+
+
+RANGOS = [
+    ("2024-03-15", "2024-09-20"),
+    ("2022-06-10", "2025-02-14"),
+    ("2024-06-01", "2024-06-30"),
+]
+
+
+@pytest.mark.parametrize("desde, hasta", RANGOS)
+@pytest.mark.parametrize("socio", ["Todos", 9])
+def test_vistas_iguales_a_sus_consultas(d, desde, hasta, socio):
+    vistas = d.tablero(caja=(desde, hasta), egresos=(desde, hasta), socios=(desde, hasta, socio))
+    sueltas = {
+        "caja": consultas.consulta_caja_mensual(desde, hasta),
+        "egresos": consultas.consulta_egresos_por_concepto(desde, hasta),
+        consultas.vista_socios(socio): consultas.consulta_ingresos_socio(desde, hasta, socio),
+    }
+    for vista, (query, params) in sueltas.items():
+        pd.testing.assert_frame_equal(vistas[vista], d.leer_sql(query, params), obj=vista)
+
+
+def test_vista_sola(d):
+    vistas = d.tablero(egresos=RANGOS[1])
+    assert vistas["caja"].empty and vistas["socios"].empty
+    pd.testing.assert_frame_equal(vistas["egresos"],
+                                  d.leer_sql(*consultas.consulta_egresos_por_concepto(*RANGOS[1])))
+
+
+def test_precargar_guarda_las_consultas_sueltas(d):
+    desde, hasta = RANGOS[0]
+    pedidos = {"caja": (desde, hasta), "egresos": (desde, hasta), "socios": (desde, hasta, "Todos")}
+    assert sorted(d.precargar(pedidos)) == sorted(pedidos)
+    assert d.precargar(pedidos) == []
+    for nombre, params in pedidos.items():
+        query, p = datos.CONSTRUCTORES[nombre](*params)
+        pd.testing.assert_frame_equal(d.consultar(query, p), d.leer_sql(query, p), obj=nombre)